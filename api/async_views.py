@@ -0,0 +1,165 @@
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from .auth import StatelessJWTAuthentication, get_revocation_cache
+from .cache import async_cache_response, average_rating_tags, movie_tags
+from .models import Movie, Rating, Review
+from .pagination import KeysetPagination
+from .renderers import dumps_json
+from .serializers import MovieSerializer, RatingSerializer, ReviewSerializer, fieldset_queryset
+from .views import MovieViewSet, RatingViewSet, ReviewViewSet
+
+
+class JSONResponse(HttpResponse):
+    """A compact JSON response that keeps its payload as ``.data``, like DRF's Response."""
+
+    def __init__(self, data=None, status=status.HTTP_200_OK, **kwargs):
+        self.data = data
+        content = b'' if data is None else dumps_json(data)
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(content, status=status, **kwargs)
+
+
+def wants_msgpack(request):
+    # The async views only render JSON; DRF negotiates the other formats.
+    return request.GET.get('format') == 'msgpack' or 'application/msgpack' in request.headers.get('Accept', '')
+
+
+def error_response(exc):
+    detail = exc.detail if isinstance(exc.detail, (dict, list)) else {'detail': exc.detail}
+    return JSONResponse(detail, status=exc.status_code)
+
+
+class AsyncReadView(View):
+    """
+    Serves GET (and HEAD) on the event loop and hands every other method,
+    and MessagePack reads, to ``sync_view``, the DRF view for the same URL.
+
+    Only public, read-only endpoints use it, so the DRF permission checks
+    reduce to authentication: a bearer token, when sent, must be valid.
+    Token validation is pure CPU, and so is building the user from its
+    claims; only tokens without claims need a lookup through the executor.
+    """
+    action = None
+    sync_view = None
+    authentication = StatelessJWTAuthentication()
+    # dispatch() is a coroutine even in a subclass without a get() handler,
+    # where Django's 405 response must then be awaited too.
+    view_is_async = True
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        if request.method in ('GET', 'HEAD') and not wants_msgpack(request):
+            try:
+                user = await self.authenticate(request)
+            except APIException as exc:
+                response = error_response(exc)
+                if exc.status_code == status.HTTP_401_UNAUTHORIZED:
+                    response['WWW-Authenticate'] = self.authentication.authenticate_header(request)
+                return response
+            if user is not None:
+                # For api.routing, which keeps users who have just written on the primary.
+                request.user = user
+            return await super().dispatch(request, *args, **kwargs)
+        return await sync_to_async(self.sync_view)(request, *args, **kwargs)
+
+    async def authenticate(self, request):
+        header = self.authentication.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.authentication.get_raw_token(header)
+        if raw_token is None:
+            return None
+        revocations = get_revocation_cache()
+        if revocations.sync_due():
+            await sync_to_async(revocations.sync)()
+        token = self.authentication.get_validated_token(raw_token)
+        return self.authentication.user_from_claims(token) or await sync_to_async(self.authentication.get_user)(token)
+
+    def not_found(self, model):
+        return JSONResponse(
+            {'detail': f'No {model._meta.object_name} matches the given query.'},
+            status=status.HTTP_404_NOT_FOUND,
+        )
+
+    async def paginated(self, request, queryset, serializer_class):
+        paginator = KeysetPagination()
+        try:
+            # The paginator reads DRF's request.query_params.
+            rows = await paginator.apaginate_queryset(queryset, Request(request))
+        except APIException as exc:
+            return error_response(exc)
+        return JSONResponse(paginator.get_paginated_data(
+            serializer_class(rows, many=True, context={'request': request}).data
+        ))
+
+
+class MovieListView(AsyncReadView):
+    action = 'list'
+    sync_view = staticmethod(MovieViewSet.as_view({'get': 'list', 'post': 'create'}))
+
+    @async_cache_response(movie_tags, JSONResponse)
+    async def get(self, request):
+        movies = fieldset_queryset(Movie.objects.all(), MovieSerializer, request)
+        return await self.paginated(request, movies, MovieSerializer)
+
+
+class MovieDetailView(AsyncReadView):
+    action = 'retrieve'
+    sync_view = staticmethod(MovieViewSet.as_view({
+        'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy',
+    }))
+
+    @async_cache_response(movie_tags, JSONResponse)
+    async def get(self, request, pk):
+        try:
+            movie = await fieldset_queryset(Movie.objects.all(), MovieSerializer, request).aget(pk=pk)
+        except Movie.DoesNotExist:
+            return self.not_found(Movie)
+        return JSONResponse(MovieSerializer(movie, context={'request': request}).data)
+
+
+class MovieAverageRatingView(AsyncReadView):
+    action = 'average_rating'
+    sync_view = staticmethod(MovieViewSet.as_view({'get': 'average_rating'}))
+
+    @async_cache_response(average_rating_tags, JSONResponse)
+    async def get(self, request, pk):
+        try:
+            movie = await Movie.objects.aget(pk=pk)
+        except Movie.DoesNotExist:
+            return self.not_found(Movie)
+        return JSONResponse({
+            'average_rating': movie.average_rating,
+            'rating_count': movie.rating_count,
+            'rating_histogram': movie.rating_histogram,
+        })
+
+
+class ReviewListView(AsyncReadView):
+    action = 'list'
+    sync_view = staticmethod(ReviewViewSet.as_view({'get': 'list', 'post': 'create'}))
+
+    async def get(self, request):
+        reviews = fieldset_queryset(Review.objects.all(), ReviewSerializer, request)
+        # Same semantics as the DRF view's filterset_fields: exact match, blank ignored.
+        sentiment = request.GET.get('sentiment')
+        if sentiment:
+            reviews = reviews.filter(sentiment=sentiment)
+        return await self.paginated(request, reviews, ReviewSerializer)
+
+
+class MovieRatingsView(AsyncReadView):
+    action = 'movie_ratings'
+    sync_view = staticmethod(RatingViewSet.as_view({'get': 'movie_ratings'}))
+
+    async def get(self, request, movie_id):
+        ratings = fieldset_queryset(Rating.objects.filter(movie_id=movie_id), RatingSerializer, request)
+        return await self.paginated(request, ratings, RatingSerializer)
@@ -0,0 +1,170 @@
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from .models import RevokedToken
+from .utils import in_event_loop
+
+# User fields copied into tokens at issue time, so requests can be authorized from the claims alone.
+USER_CLAIMS = ('is_staff',)
+
+
+class RevocationCache:
+    """
+    The ids (jti) of revoked tokens that have not expired yet.
+
+    Checks are served from memory. Revocations are stored in the
+    RevokedToken table as well, and each process picks up the ones made by
+    other workers with one query every ``sync_interval`` seconds at most, so
+    logging out takes effect everywhere within that delay. Each query reads
+    back ``sync_margin`` seconds before the previous one: a revocation may
+    commit a while after its revoked_at, and workers' clocks differ.
+    """
+
+    def __init__(self, sync_interval=5.0, sync_margin=60.0):
+        self.sync_interval = sync_interval
+        self.sync_margin = sync_margin
+        self._revoked = {}
+        self._synced_at = None
+        self._next_sync = 0.0
+        self._lock = threading.Lock()
+
+    def revoke(self, jti, expires):
+        """Revoke token ``jti`` until its ``expires`` timestamp."""
+        with self._lock:
+            self._revoked[jti] = expires
+        expires_at = datetime.fromtimestamp(expires, tz=dt_timezone.utc)
+        RevokedToken.objects.bulk_create([RevokedToken(jti=jti, expires_at=expires_at)], ignore_conflicts=True)
+        RevokedToken.objects.filter(expires_at__lte=datetime.now(tz=dt_timezone.utc)).delete()
+
+    def is_revoked(self, jti):
+        # The sync never runs on an event loop, where the ORM is off limits;
+        # async callers await sync() themselves when sync_due().
+        if self.sync_due() and not in_event_loop():
+            self.sync()
+        return jti in self._revoked
+
+    def sync_due(self):
+        return time.time() >= self._next_sync
+
+    def sync(self):
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            now = time.time()
+            rows = RevokedToken.objects.filter(expires_at__gt=datetime.fromtimestamp(now, tz=dt_timezone.utc))
+            if self._synced_at is not None:
+                since = self._synced_at - self.sync_margin
+                rows = rows.filter(revoked_at__gte=datetime.fromtimestamp(since, tz=dt_timezone.utc))
+            # Rows seen by the previous sync come back; keyed by jti, they are counted once.
+            for jti, expires_at in rows.values_list('jti', 'expires_at'):
+                self._revoked[jti] = expires_at.timestamp()
+            self._synced_at = now
+            for jti in [jti for jti, expires in self._revoked.items() if expires <= now]:
+                del self._revoked[jti]
+            self._next_sync = now + self.sync_interval
+        finally:
+            self._lock.release()
+
+
+_revocations = None
+_revocations_lock = threading.Lock()
+
+
+def get_revocation_cache():
+    global _revocations
+    if _revocations is None:
+        with _revocations_lock:
+            if _revocations is None:
+                _revocations = RevocationCache(
+                    settings.JWT_REVOCATION_SYNC_SECONDS, settings.JWT_REVOCATION_SYNC_MARGIN_SECONDS,
+                )
+    return _revocations
+
+
+@receiver(setting_changed)
+def reset_revocation_cache(setting, **kwargs):
+    global _revocations
+    if setting in ('JWT_REVOCATION_SYNC_SECONDS', 'JWT_REVOCATION_SYNC_MARGIN_SECONDS'):
+        _revocations = None
+
+
+def revoke_token(token):
+    get_revocation_cache().revoke(token[api_settings.JTI_CLAIM], token['exp'])
+
+
+class RevocationMixin:
+    def verify(self):
+        super().verify()
+        if get_revocation_cache().is_revoked(self[api_settings.JTI_CLAIM]):
+            raise TokenError('Token has been revoked')
+
+
+class ClaimsAccessToken(RevocationMixin, AccessToken):
+    pass
+
+
+class ClaimsRefreshToken(RevocationMixin, RefreshToken):
+    """Refresh token carrying USER_CLAIMS; access tokens made from it copy them."""
+    access_token_class = ClaimsAccessToken
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        for claim in USER_CLAIMS:
+            token[claim] = getattr(user, claim)
+        return token
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = ClaimsRefreshToken
+
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    """Refresh access tokens with the user's current claims (e.g. after losing staff status)."""
+    token_class = ClaimsRefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        user = User.objects.filter(**{api_settings.USER_ID_FIELD: refresh[api_settings.USER_ID_CLAIM]}).first()
+        if user is None or not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+        for claim in USER_CLAIMS:
+            refresh[claim] = getattr(user, claim)
+        return {'access': str(refresh.access_token)}
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that trusts the token's claims instead of loading the user.
+
+    request.user is a User instance holding only the id and USER_CLAIMS;
+    any other field is fetched from the database the first time it is read.
+    Tokens issued without the claims fall back to the regular user lookup.
+    A change to a user's staff status or active flag reaches their access
+    tokens at the next refresh, which reloads the user.
+    """
+
+    def get_user(self, validated_token):
+        return self.user_from_claims(validated_token) or super().get_user(validated_token)
+
+    def user_from_claims(self, validated_token):
+        if any(claim not in validated_token for claim in USER_CLAIMS):
+            return None
+        claims = {claim: validated_token[claim] for claim in USER_CLAIMS}
+        claims[api_settings.USER_ID_FIELD] = validated_token[api_settings.USER_ID_CLAIM]
+        claims['is_active'] = True
+        fields = [field for field in User._meta.concrete_fields if field.attname in claims]
+        # Fields left out of from_db() are deferred and load on first access.
+        return User.from_db(
+            None, [field.attname for field in fields], [field.to_python(claims[field.attname]) for field in fields]
+        )
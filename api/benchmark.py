@@ -0,0 +1,259 @@
+import asyncio
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client
+from .auth import ClaimsRefreshToken
+from .models import Movie, Sentiment
+
+
+class Scenario:
+    """One endpoint exercised by the benchmark; ``make_request(client, rng)`` issues a single call."""
+
+    def __init__(self, name, make_request):
+        self.name = name
+        self.make_request = make_request
+
+
+def build_scenarios(password=None, hot_movies=500):
+    """
+    Scenarios over the real URLconf, targeting existing rows.
+
+    Movie ids are drawn from the ``hot_movies`` most rated movies, so traffic
+    is as skewed as the seeded data. Login is only included when the
+    seeded users' ``password`` is known.
+    """
+    movie_ids = list(Movie.objects.order_by('-rating_count').values_list('id', flat=True)[:hot_movies])
+    if not movie_ids:
+        raise ValueError('No movies to benchmark; seed data first (manage.py seed_data).')
+    user = User.objects.filter(username__startswith='seed-').order_by('id').first() or User.objects.first()
+    sentiments = [Sentiment.POSITIVE.value, Sentiment.NEGATIVE.value, Sentiment.NEUTRAL.value]
+    refresh = str(ClaimsRefreshToken.for_user(user)) if user else None
+
+    scenarios = [
+        Scenario('movies list', lambda client, rng: client.get('/api/movies/')),
+        Scenario('movie detail', lambda client, rng: client.get(f'/api/movies/{rng.choice(movie_ids)}/')),
+        Scenario('reviews by sentiment', lambda client, rng: client.get(
+            '/api/reviews/', {'sentiment': rng.choice(sentiments)}
+        )),
+        Scenario('average rating', lambda client, rng: client.get(
+            f'/api/movies/{rng.choice(movie_ids)}/average-rating/'
+        )),
+        Scenario('movie ratings', lambda client, rng: client.get(
+            f'/api/ratings/movie/{rng.choice(movie_ids)}/ratings/'
+        )),
+        Scenario('auth register', lambda client, rng: client.post('/api/auth/register/', {
+            'username': f'bench-{uuid.uuid4().hex[:20]}',
+            'email': 'bench@example.com',
+            'password': 'bench-password',
+        }, content_type='application/json')),
+    ]
+    if refresh:
+        scenarios.append(Scenario('auth refresh', lambda client, rng: client.post(
+            '/api/auth/refresh/', {'refresh': refresh}, content_type='application/json'
+        )))
+    if user and password:
+        scenarios.append(Scenario('auth login', lambda client, rng: client.post(
+            '/api/auth/login/', {'username': user.username, 'password': password},
+            content_type='application/json',
+        )))
+    return scenarios
+
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of an ascending list."""
+    if not ordered:
+        return 0.0
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def run_scenario(scenario, concurrency, requests, warmup=0, seed=0):
+    """Issue ``requests`` calls from ``concurrency`` threads and summarize latency, throughput and queries."""
+    host = next((host for host in settings.ALLOWED_HOSTS if host != '*'), 'localhost')
+    latencies, query_counts = [], []
+    errors = []
+    lock = threading.Lock()
+    per_thread = [requests // concurrency + (index < requests % concurrency) for index in range(concurrency)]
+
+    def worker(index, count, start):
+        client = Client(SERVER_NAME=host)
+        rng = random.Random(seed * 1000 + index)
+        queries = [0]
+
+        def count_queries(execute, sql, params, many, context):
+            queries[0] += 1
+            return execute(sql, params, many, context)
+
+        local_latencies, local_queries, local_errors = [], [], []
+        start.wait()
+        try:
+            with connection.execute_wrapper(count_queries):
+                for _ in range(count):
+                    queries[0] = 0
+                    started = time.perf_counter()
+                    response = scenario.make_request(client, rng)
+                    local_latencies.append((time.perf_counter() - started) * 1000)
+                    local_queries.append(queries[0])
+                    if response.status_code >= 400:
+                        local_errors.append(response.status_code)
+        finally:
+            connection.close()
+            with lock:
+                latencies.extend(local_latencies)
+                query_counts.extend(local_queries)
+                errors.extend(local_errors)
+
+    if warmup:
+        client, rng = Client(SERVER_NAME=host), random.Random(seed)
+        for _ in range(warmup):
+            scenario.make_request(client, rng)
+    start = threading.Barrier(min(concurrency, requests) + 1)
+    threads = [
+        threading.Thread(target=worker, args=(index, count, start))
+        for index, count in enumerate(per_thread) if count
+    ]
+    for thread in threads:
+        thread.start()
+    start.wait()
+    began = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - began
+
+    return summarize(latencies, errors, elapsed, query_counts)
+
+
+def summarize(latencies, errors, elapsed, query_counts=None):
+    latencies = sorted(latencies)
+    summary = {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'error_statuses': sorted(set(errors)),
+        'throughput_rps': round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        'mean_ms': round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+        'p50_ms': round(percentile(latencies, 0.50), 3),
+        'p95_ms': round(percentile(latencies, 0.95), 3),
+        'p99_ms': round(percentile(latencies, 0.99), 3),
+    }
+    if query_counts is not None:
+        summary['queries_per_request'] = round(sum(query_counts) / len(query_counts), 2) if query_counts else 0.0
+    return summary
+
+
+def read_paths(hot_movies=500):
+    """URLs of the read endpoints served by api.async_views, over the most rated movies."""
+    movie_ids = list(Movie.objects.order_by('-rating_count').values_list('id', flat=True)[:hot_movies])
+    if not movie_ids:
+        raise ValueError('No movies to benchmark; seed data first (manage.py seed_data).')
+    paths = ['/api/movies/']
+    paths.extend(f'/api/reviews/?sentiment={sentiment.value}' for sentiment in (
+        Sentiment.POSITIVE, Sentiment.NEGATIVE, Sentiment.NEUTRAL,
+    ))
+    for movie_id in movie_ids:
+        paths.extend([
+            f'/api/movies/{movie_id}/',
+            f'/api/movies/{movie_id}/average-rating/',
+            f'/api/ratings/movie/{movie_id}/ratings/',
+        ])
+    return paths
+
+
+async def http_get(host, port, path, client_delay=0.0):
+    """
+    GET ``path`` over a fresh connection and return the response status.
+
+    With ``client_delay`` the request headers are sent in two parts that
+    many seconds apart, like a client on a slow network. A server that
+    reads requests on a worker thread keeps that thread blocked meanwhile.
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write(f'GET {path} HTTP/1.1\r\nHost: {host}\r\n'.encode())
+        await writer.drain()
+        if client_delay:
+            await asyncio.sleep(client_delay)
+        writer.write(b'Connection: close\r\n\r\n')
+        await writer.drain()
+        response = await reader.read()
+    finally:
+        writer.close()
+    return int(response.split(b' ', 2)[1])
+
+
+async def http_request(host, port, method, path, body=b'', headers=()):
+    """Send one request over a fresh connection and return the response status and body."""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        head = [f'{method} {path} HTTP/1.1', f'Host: {host}', f'Content-Length: {len(body)}', 'Connection: close']
+        head.extend(f'{name}: {value}' for name, value in headers)
+        writer.write('\r\n'.join(head).encode() + b'\r\n\r\n' + body)
+        await writer.drain()
+        response = await reader.read()
+    finally:
+        writer.close()
+    return int(response.split(b' ', 2)[1]), response.partition(b'\r\n\r\n')[2]
+
+
+async def run_http_load(host, port, paths, concurrency, requests, client_delay=0.0, seed=0):
+    """
+    Issue ``requests`` GETs over random ``paths`` from ``concurrency`` concurrent clients,
+    each pausing for ``client_delay`` seconds on average in the middle of its requests.
+    """
+    latencies, errors = [], []
+    remaining = iter(range(requests))
+
+    async def client(index):
+        rng = random.Random(seed * 1000 + index)
+        for _ in remaining:
+            started = time.perf_counter()
+            try:
+                # Jittered, so the slow clients do not all stall in lockstep.
+                status = await http_get(host, port, rng.choice(paths), rng.uniform(0, 2 * client_delay))
+            except (OSError, IndexError, ValueError):
+                status = 0
+            latencies.append((time.perf_counter() - started) * 1000)
+            if not 200 <= status < 400:
+                errors.append(status)
+
+    began = time.perf_counter()
+    await asyncio.gather(*(client(index) for index in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - began)
+
+
+def compare_to_baseline(current, baseline, tolerance=0.2, min_delta_ms=1.0):
+    """
+    List the regressions of ``current`` against ``baseline`` results.
+
+    A scenario regresses when its p50 or p95 latency grows by more than
+    ``tolerance`` (and by at least ``min_delta_ms``, to ignore jitter on
+    fast endpoints), its throughput drops by more than ``tolerance``, or it
+    runs more queries per request.
+    """
+    regressions = []
+    for name, result in current['scenarios'].items():
+        before = baseline.get('scenarios', {}).get(name)
+        if before is None:
+            continue
+        for metric in ('p50_ms', 'p95_ms'):
+            if result[metric] > before[metric] * (1 + tolerance) and result[metric] - before[metric] >= min_delta_ms:
+                regressions.append(f'{name}: {metric} {before[metric]} -> {result[metric]}')
+        if result['throughput_rps'] < before['throughput_rps'] / (1 + tolerance):
+            regressions.append(
+                f'{name}: throughput_rps {before["throughput_rps"]} -> {result["throughput_rps"]}'
+            )
+        if result['queries_per_request'] > before['queries_per_request']:
+            regressions.append(
+                f'{name}: queries_per_request {before["queries_per_request"]} -> {result["queries_per_request"]}'
+            )
+    return regressions
+
+
+def load_results(path):
+    with open(path) as handle:
+        return json.load(handle)
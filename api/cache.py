@@ -0,0 +1,417 @@
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from functools import wraps
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.dispatch import receiver
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from django.utils.module_loading import import_string
+from rest_framework import status
+from rest_framework.response import Response
+from .routing import read_from_replica
+
+
+class CacheStats:
+    fields = ('hits', 'misses', 'stale', 'stores', 'evictions', 'invalidations')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counts = dict.fromkeys(self.fields, 0)
+
+    def incr(self, field, amount=1):
+        with self._lock:
+            self.counts[field] += amount
+
+    def as_dict(self):
+        with self._lock:
+            return dict(self.counts)
+
+
+class LRUCacheBackend:
+    """In-process cache bounded to ``max_entries``, evicting the least recently used key."""
+
+    def __init__(self, stats, max_entries=1000, **options):
+        self.stats = stats
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def get_many(self, keys):
+        return {key: value for key in keys if (value := self.get(key)) is not None}
+
+    def set(self, key, value):
+        evicted = 0
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                evicted += 1
+        if evicted:
+            self.stats.incr('evictions', evicted)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class FileSystemCacheBackend:
+    """
+    Cache stored as one pickle file per key under ``location``.
+
+    Files are written atomically, so several worker processes can share a
+    directory. Once the number of files exceeds ``max_entries``, the least
+    recently written files are culled.
+    """
+
+    def __init__(self, stats, location=None, max_entries=10000, **options):
+        self.stats = stats
+        self.location = location or os.path.join(tempfile.gettempdir(), 'movie_api_response_cache')
+        self.max_entries = max_entries
+        self._writes = 0
+        os.makedirs(self.location, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.location, hashlib.sha1(key.encode()).hexdigest() + '.cache')
+
+    def get(self, key):
+        try:
+            with open(self._path(key), 'rb') as handle:
+                return pickle.load(handle)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def get_many(self, keys):
+        return {key: value for key in keys if (value := self.get(key)) is not None}
+
+    def set(self, key, value):
+        fd, tmp_path = tempfile.mkstemp(dir=self.location, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as handle:
+            pickle.dump(value, handle, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self._path(key))
+        self._writes += 1
+        if self._writes % 100 == 0:
+            self._cull()
+
+    def _cull(self):
+        entries = []
+        with os.scandir(self.location) as listing:
+            for entry in listing:
+                if entry.name.endswith('.cache'):
+                    try:
+                        entries.append((entry.stat().st_mtime, entry.path))
+                    except OSError:
+                        pass
+        excess = len(entries) - self.max_entries
+        if excess <= 0:
+            return
+        entries.sort()
+        for _, path in entries[:excess]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self.stats.incr('evictions', excess)
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def clear(self):
+        with os.scandir(self.location) as listing:
+            for entry in listing:
+                if entry.name.endswith('.cache'):
+                    try:
+                        os.remove(entry.path)
+                    except OSError:
+                        pass
+
+
+class ResponseCache:
+    """
+    Caches serialized view data together with the tags it depends on.
+
+    Every tag (``movie:12``, ``genres``...) has a version token stored in
+    the backend. An entry records the tokens of its tags when it is stored
+    and is only served while they are unchanged, so invalidating a tag just
+    replaces its token. That drops every response built from it without
+    scanning the cache, and works the same for any backend. A token records
+    when its tag was invalidated, so data read before a write is not cached
+    under the new tokens.
+    """
+
+    def __init__(self, backend, timeout=300, enabled=True):
+        self.stats = CacheStats()
+        self.backend = backend(self.stats) if callable(backend) else backend
+        self.timeout = timeout
+        self.enabled = enabled
+
+    def _tag_key(self, tag):
+        return f'tag:{tag}'
+
+    def _tokens(self, tags, create=False):
+        keys = {tag: self._tag_key(tag) for tag in tags}
+        found = self.backend.get_many(keys.values())
+        tokens = {}
+        for tag, key in keys.items():
+            token = found.get(key)
+            if token is None and create:
+                token = uuid.uuid4().hex
+                self.backend.set(key, token)
+            tokens[tag] = token
+        return tokens
+
+    def _invalidated_at(self, token):
+        return float(token.partition('@')[2] or 0) if token else 0.0
+
+    def lookup(self, key):
+        entry = self.backend.get(key)
+        if entry is None:
+            self.stats.incr('misses')
+            return None
+        if entry['expires'] < time.time() or self._tokens(entry['tags']) != entry['tags']:
+            self.backend.delete(key)
+            self.stats.incr('stale')
+            self.stats.incr('misses')
+            return None
+        self.stats.incr('hits')
+        return entry
+
+    def store(self, key, data, tags, read_at=None):
+        """
+        Cache ``data`` under ``key`` and return the entry. With ``read_at``,
+        the time the data was read, nothing is stored and None is returned
+        when one of the ``tags`` was invalidated since then: the data may
+        predate that write.
+        """
+        now = time.time()
+        tokens = self._tokens(set(tags), create=True)
+        if read_at is not None and any(self._invalidated_at(token) >= read_at for token in tokens.values()):
+            return None
+        payload = json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True).encode()
+        entry = {
+            'data': data,
+            'etag': quote_etag(hashlib.sha1(payload).hexdigest()),
+            'last_modified': int(now),
+            'expires': now + self.timeout,
+            'tags': tokens,
+        }
+        self.backend.set(key, entry)
+        self.stats.incr('stores')
+        return entry
+
+    def invalidate(self, *tags):
+        for tag in set(tags):
+            self.backend.set(self._tag_key(tag), f'{uuid.uuid4().hex}@{time.time()}')
+        self.stats.incr('invalidations', len(set(tags)))
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats_dict(self):
+        return {'backend': type(self.backend).__name__, **self.stats.as_dict()}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                config = settings.RESPONSE_CACHE
+                backend = import_string(config['BACKEND'])
+                options = config.get('OPTIONS', {})
+                _cache = ResponseCache(
+                    lambda stats: backend(stats, **options),
+                    timeout=config.get('TIMEOUT', 300),
+                    enabled=config.get('ENABLED', True),
+                )
+    return _cache
+
+
+@receiver(setting_changed)
+def reset_response_cache(setting, **kwargs):
+    global _cache
+    if setting == 'RESPONSE_CACHE':
+        _cache = None
+
+
+def invalidate_on_commit(*tags):
+    """
+    Invalidate ``tags`` now and again once the current transaction commits.
+
+    The second pass drops anything a concurrent reader cached from the
+    pre-commit state in between.
+    """
+    if not tags:
+        return
+    cache = get_response_cache()
+    cache.invalidate(*tags)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: cache.invalidate(*tags))
+
+
+def _not_modified(request, entry):
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match is not None:
+        candidates = {tag.strip() for tag in if_none_match.split(',')}
+        return '*' in candidates or entry['etag'] in candidates or f'W/{entry["etag"]}' in candidates
+    since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+    return since is not None and entry['last_modified'] <= since
+
+
+def _cache_key(request):
+    return f'response:{request.build_absolute_uri()}'
+
+
+def _cached_response(request, entry, response_class):
+    if _not_modified(request, entry):
+        response = response_class(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = response_class(entry['data'])
+        response['X-Cache'] = 'HIT'
+    return _add_validators(response, entry)
+
+
+def _store_response(cache, key, view, request, response, get_tags, started):
+    if response.status_code != status.HTTP_200_OK:
+        return response
+    # The view may have read the data before a write that committed while it
+    # ran; a replica may also lag behind the writes that came just before.
+    read_at = started - (settings.DB_REPLICA_PIN_SECONDS if read_from_replica(request) else 0)
+    entry = cache.store(key, response.data, get_tags(view, response.data), read_at)
+    response['X-Cache'] = 'MISS'
+    return _add_validators(response, entry) if entry else response
+
+
+def _add_validators(response, entry):
+    response['ETag'] = entry['etag']
+    response['Last-Modified'] = http_date(entry['last_modified'])
+    return response
+
+
+def cache_response(get_tags):
+    """
+    Cache a DRF view method's successful response data.
+
+    ``get_tags(view, data)`` returns the tags the response depends on. Cached
+    responses carry ETag and Last-Modified headers and answer conditional
+    requests with 304 Not Modified.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(view, request, *args, **kwargs):
+            cache = get_response_cache()
+            if not cache.enabled:
+                return method(view, request, *args, **kwargs)
+            key = _cache_key(request)
+            entry = cache.lookup(key)
+            if entry is not None:
+                return _cached_response(request, entry, Response)
+            started = time.time()
+            response = method(view, request, *args, **kwargs)
+            return _store_response(cache, key, view, request, response, get_tags, started)
+        return wrapper
+    return decorator
+
+
+def async_cache_response(get_tags, response_class):
+    """
+    cache_response() for async view methods.
+
+    The method must return a ``response_class`` instance exposing the
+    unrendered payload as ``.data``; hits are rebuilt with
+    ``response_class(data)``. Entries are shared with the sync views, since
+    both cache the same serializer data under the same URL.
+    """
+    def decorator(method):
+        @wraps(method)
+        async def wrapper(view, request, *args, **kwargs):
+            cache = get_response_cache()
+            if not cache.enabled:
+                return await method(view, request, *args, **kwargs)
+            key = _cache_key(request)
+            entry = cache.lookup(key)
+            if entry is not None:
+                return _cached_response(request, entry, response_class)
+            started = time.time()
+            response = await method(view, request, *args, **kwargs)
+            return _store_response(cache, key, view, request, response, get_tags, started)
+        return wrapper
+    return decorator
+
+
+def results_of(data):
+    return data['results'] if isinstance(data, dict) and 'results' in data else data
+
+
+def movie_tags(view, data):
+    movies = results_of(data)
+    if isinstance(movies, dict):
+        movies = [movies]
+    tags = ['movies'] if view.action == 'list' else []
+    for movie in movies:
+        tags.append(f'movie:{movie["id"]}')
+        tags.extend(f'genre:{genre["id"]}' for genre in movie.get('genres', ()))
+    return tags
+
+
+def movie_batch_tags(view, data):
+    # Movies created later would fill in the missing ids.
+    return movie_tags(view, data) + (['movies'] if data['missing'] else [])
+
+
+def average_rating_tags(view, data):
+    return [f'movie:{view.kwargs["pk"]}']
+
+
+def genre_tags(view, data):
+    genres = results_of(data)
+    if isinstance(genres, dict):
+        genres = [genres]
+    return ['genres', *(f'genre:{genre["id"]}' for genre in genres)]
+
+
+def analytics_tags(view, data):
+    key = 'movie' if 'movie' in data else 'genre'
+    return ['analytics', f'{key}:{data[key]}']
+
+
+def similar_movie_tags(view, data):
+    return ['similar-movies', f'movie:{view.kwargs["pk"]}', *(f'movie:{movie["id"]}' for movie in data['results'])]
+
+
+def leaderboard_tags(view, data):
+    return ['leaderboards', *(f'movie:{entry["id"]}' for entry in data['results'])]
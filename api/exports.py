@@ -0,0 +1,116 @@
+import csv
+import io
+from django.conf import settings
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+from .models import Movie, MovieGenre, Rating, Review
+from .renderers import NDJSONRenderer
+from .utils import chunked
+
+EXPORT_FIELDS = {
+    'movies': ['id', 'title', 'release_year', 'description', 'poster_url', 'created_at', 'rating_count', 'rating_sum'],
+    'reviews': ['id', 'movie_id', 'user_id', 'review_text', 'sentiment', 'created_at'],
+    'ratings': ['id', 'movie_id', 'user_id', 'stars', 'created_at'],
+}
+
+
+def _parse_int(params, name):
+    value = params.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValidationError({name: 'A valid integer is required.'})
+
+
+def _parse_moment(params, name):
+    value = params.get(name)
+    if value in (None, ''):
+        return None
+    moment = parse_datetime(value) or parse_date(value)
+    if moment is None:
+        raise ValidationError({name: 'Use an ISO 8601 date or datetime.'})
+    return moment
+
+
+def export_queryset(resource, params):
+    """
+    Build the ordered, filtered queryset for an export.
+
+    ``after_id`` is the resume checkpoint: pass the last ``id`` received to
+    continue an interrupted export from the next row.
+    """
+    if resource == 'movies':
+        queryset = Movie.objects.all()
+        genre_lookup = 'moviegenre__genre_id'
+    elif resource == 'reviews':
+        queryset = Review.objects.all()
+        genre_lookup = 'movie__moviegenre__genre_id'
+    else:
+        queryset = Rating.objects.all()
+        genre_lookup = 'movie__moviegenre__genre_id'
+
+    filters = {}
+    after_id = _parse_int(params, 'after_id')
+    if after_id is not None:
+        filters['id__gt'] = after_id
+    genre = _parse_int(params, 'genre')
+    if genre is not None:
+        filters[genre_lookup] = genre
+    movie = _parse_int(params, 'movie')
+    if movie is not None:
+        filters['id' if resource == 'movies' else 'movie_id'] = movie
+    created_after = _parse_moment(params, 'created_after')
+    if created_after is not None:
+        filters['created_at__gte'] = created_after
+    created_before = _parse_moment(params, 'created_before')
+    if created_before is not None:
+        filters['created_at__lt'] = created_before
+    sentiment = params.get('sentiment')
+    if sentiment and resource == 'reviews':
+        filters['sentiment'] = sentiment
+    return queryset.filter(**filters).order_by('id')
+
+
+def export_rows(resource, queryset, chunk_size=None):
+    """Yield export rows as dicts, reading through a server-side cursor in chunks."""
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    fields = EXPORT_FIELDS[resource]
+    rows = queryset.values_list(*fields).iterator(chunk_size=chunk_size)
+    for chunk in chunked(rows, chunk_size):
+        records = [dict(zip(fields, row)) for row in chunk]
+        if resource == 'movies':
+            genres = {}
+            for movie_id, genre_id in (
+                MovieGenre.objects.filter(movie_id__in=[record['id'] for record in records])
+                .order_by('genre_id')
+                .values_list('movie_id', 'genre_id')
+            ):
+                genres.setdefault(movie_id, []).append(genre_id)
+            for record in records:
+                record['genres'] = genres.get(record['id'], [])
+        yield records
+
+
+def stream_ndjson(chunks):
+    for records in chunks:
+        yield ''.join(NDJSONRenderer.encode_row(record) for record in records)
+
+
+def stream_csv(resource, chunks):
+    header = EXPORT_FIELDS[resource] + (['genres'] if resource == 'movies' else [])
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    for records in chunks:
+        for record in records:
+            if resource == 'movies':
+                record['genres'] = ' '.join(map(str, record['genres']))
+            writer.writerow([record[field] for field in header])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # Emit the header even for an empty export.
+    if buffer.tell():
+        yield buffer.getvalue()
@@ -0,0 +1,76 @@
+import hashlib
+import json
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from .models import IdempotencyRecord
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = IdempotencyRecord._meta.get_field('key').max_length
+
+
+def request_fingerprint(request):
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(f'{request.method} {request.path}\n{body}'.encode()).hexdigest()
+
+
+def _replay(record, fingerprint):
+    if record.fingerprint != fingerprint:
+        return Response(
+            {'detail': f'This {HEADER} was already used for a different request.'},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    response = Response(record.response, status=record.status_code)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent_response(request, handler, then=None):
+    """
+    Respond with ``handler()``, a (status code, data) pair, at most once per
+    Idempotency-Key header and user.
+
+    The response is stored in the handler's transaction, so a retry sees
+    either no effect at all or the stored response, never a partial one.
+    Concurrent retries wait on the key's unique index and then replay.
+    Reusing a key for a different request is refused with 422. ``then()``
+    runs last in that transaction, after the response is stored: the place
+    for updates of contended rows, whose locks are then held until commit
+    only.
+    """
+    then = then or (lambda: None)
+    key = request.headers.get(HEADER)
+    if key is None:
+        with transaction.atomic():
+            status_code, data = handler()
+            then()
+        return Response(data, status=status_code)
+    if not key or len(key) > MAX_KEY_LENGTH:
+        return Response(
+            {'detail': f'{HEADER} must be 1 to {MAX_KEY_LENGTH} characters.'},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    fingerprint = request_fingerprint(request)
+    expired = timezone.now() - timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS)
+    records = IdempotencyRecord.objects.filter(user_id=request.user.id)
+    record = records.filter(key=key, created_at__gt=expired).first()
+    if record is not None:
+        return _replay(record, fingerprint)
+    try:
+        with transaction.atomic():
+            records.filter(created_at__lte=expired).delete()
+            status_code, data = handler()
+            IdempotencyRecord.objects.create(
+                user_id=request.user.id, key=key, fingerprint=fingerprint, status_code=status_code, response=data,
+            )
+            then()
+    except IntegrityError:
+        # Another request with this key committed first.
+        record = records.filter(key=key).first()
+        if record is None:
+            raise
+        return _replay(record, fingerprint)
+    return Response(data, status=status_code)
@@ -0,0 +1,152 @@
+from django.conf import settings
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+from .models import Movie, Rating, Review, Sentiment
+from .search import index_documents
+from .sentiment import classify_many
+from .serializers import RatingBulkRowSerializer, ReviewBulkRowSerializer
+from .utils import chunked
+
+INVALID_ROW = {'non_field_errors': ['Expected a JSON object.']}
+
+
+def _validate(rows, serializer_class):
+    """Validate a chunk of (index, row) pairs, resolving all movie ids in one query."""
+    valid, results = [], []
+    # One serializer instance validates every row, so its fields are built once per chunk.
+    serializer = serializer_class()
+    for index, row in rows:
+        if not isinstance(row, dict):
+            results.append({'index': index, 'status': 'error', 'errors': INVALID_ROW})
+            continue
+        try:
+            valid.append((index, serializer.run_validation(row)))
+        except ValidationError as exc:
+            results.append({'index': index, 'status': 'error', 'errors': exc.detail})
+    movie_ids = {data['movie'] for _, data in valid}
+    known = set(Movie.objects.filter(id__in=movie_ids).values_list('id', flat=True))
+    accepted = []
+    for index, data in valid:
+        if data['movie'] in known:
+            accepted.append((index, data))
+        else:
+            results.append({
+                'index': index,
+                'status': 'error',
+                'errors': {'movie': [f'Invalid pk "{data["movie"]}" - object does not exist.']},
+            })
+    return accepted, results
+
+
+def ingest_reviews(user, rows, batch_size=None):
+    """Create reviews for ``user`` from an iterable of row dicts; returns one result per row."""
+    batch_size = batch_size or settings.BULK_INGEST_BATCH_SIZE
+    results = []
+    for chunk in chunked(enumerate(rows), batch_size):
+        accepted, chunk_results = _validate(chunk, ReviewBulkRowSerializer)
+        texts = [data['review_text'] for _, data in accepted]
+        if settings.SENTIMENT_ASYNC:
+            labels = [Sentiment.PENDING.value] * len(texts)
+        else:
+            labels = classify_many(texts)
+        reviews = [
+            Review(movie_id=data['movie'], user_id=user.id, review_text=data['review_text'], sentiment=label)
+            for (_, data), label in zip(accepted, labels)
+        ]
+        with transaction.atomic():
+            Review.objects.bulk_create(reviews)
+            Movie.apply_review_changes([(review.movie_id, review.sentiment, 1) for review in reviews])
+        index_documents('reviews', [review.id for review in reviews])
+        chunk_results.extend(
+            {'index': index, 'status': 'created', 'id': review.id}
+            for (index, _), review in zip(accepted, reviews)
+        )
+        results.extend(sorted(chunk_results, key=lambda result: result['index']))
+    return results
+
+
+def ingest_ratings(user, rows, batch_size=None):
+    """
+    Upsert ratings for ``user`` on the (movie, user) unique constraint.
+
+    Within a chunk the last row for a movie wins and earlier rows are
+    reported as superseded. Movie rating aggregates are adjusted in the same
+    transaction as the upsert. The user's row is locked first, so whether a
+    rating is created or updated is decided against every committed insert.
+    """
+    batch_size = batch_size or settings.BULK_INGEST_BATCH_SIZE
+    results = []
+    for chunk in chunked(enumerate(rows), batch_size):
+        accepted, chunk_results = _validate(chunk, RatingBulkRowSerializer)
+        latest = {}
+        for index, data in accepted:
+            if data['movie'] in latest:
+                chunk_results.append({'index': latest[data['movie']][0], 'status': 'superseded'})
+            latest[data['movie']] = (index, data)
+        with transaction.atomic():
+            Rating.lock_user(user.id)
+            previous = dict(
+                Rating.objects.select_for_update()
+                .filter(user_id=user.id, movie_id__in=latest)
+                .values_list('movie_id', 'stars')
+            )
+            ratings = [
+                Rating(movie_id=movie_id, user_id=user.id, stars=data['stars'])
+                for movie_id, (_, data) in latest.items()
+            ]
+            Rating.objects.bulk_create(
+                ratings, update_conflicts=True, unique_fields=['movie', 'user'], update_fields=['stars']
+            )
+            changes = []
+            for rating in ratings:
+                changes.append((rating.movie_id, rating.stars, 1))
+                if rating.movie_id in previous:
+                    changes.append((rating.movie_id, previous[rating.movie_id], -1))
+            Movie.apply_rating_changes(changes)
+        if any(rating.pk is None for rating in ratings):
+            ids = dict(
+                Rating.objects.filter(user_id=user.id, movie_id__in=latest).values_list('movie_id', 'id')
+            )
+            for rating in ratings:
+                rating.pk = ids.get(rating.movie_id)
+        chunk_results.extend(
+            {
+                'index': latest[rating.movie_id][0],
+                'status': 'updated' if rating.movie_id in previous else 'created',
+                'id': rating.pk,
+            }
+            for rating in ratings
+        )
+        results.extend(sorted(chunk_results, key=lambda result: result['index']))
+    return results
+
+
+def upsert_rating(user, movie_id, stars, changes=None):
+    """
+    Create or update ``user``'s rating of a movie; returns (rating, created).
+
+    Only the user's own rows are locked, so raters of the same movie never
+    wait on each other for them. The movie's aggregates are adjusted by a
+    single UPDATE as the last statement, holding its row lock only until
+    commit; re-sending the same stars does not touch the movie at all. With
+    a ``changes`` list, the aggregate changes are added to it instead, for
+    the caller to apply with Movie.apply_rating_changes() after its own
+    writes, in the same transaction.
+    """
+    deferred = changes is not None
+    changes = [] if changes is None else changes
+    with transaction.atomic():
+        Rating.lock_user(user.id)
+        rating = Rating.objects.filter(user_id=user.id, movie_id=movie_id).first()
+        created = rating is None
+        if created:
+            # Not Rating.save(), which would update the movie right away.
+            rating, = Rating.objects.bulk_create([Rating(user_id=user.id, movie_id=movie_id, stars=stars)])
+            changes.append((movie_id, stars, 1))
+        elif rating.stars != stars:
+            Rating.objects.filter(pk=rating.pk).update(stars=stars)
+            changes.extend([(movie_id, stars, 1), (movie_id, rating.stars, -1)])
+            rating.stars = stars
+        if not deferred:
+            Movie.apply_rating_changes(changes)
+    return rating, created
@@ -0,0 +1,28 @@
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from api.rollups import backfill_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the daily rating and review rollups per movie and genre from the raw tables, '
+        'a few days per transaction. Run it once after migrating, and for any days whose ratings '
+        'or reviews were deleted or edited.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=date.fromisoformat, help='First day (YYYY-MM-DD). Default: the oldest row.')
+        parser.add_argument('--end', type=date.fromisoformat, help='Last day (YYYY-MM-DD). Default: today.')
+        parser.add_argument('--chunk-days', type=int, default=7, help='Days rebuilt per transaction.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if options['chunk_days'] < 1:
+            raise CommandError('--chunk-days must be positive.')
+        totals = backfill_rollups(
+            start=options['start'], end=options['end'], chunk_days=options['chunk_days'],
+            batch_size=options['batch_size'], log=self.stdout.write,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Rolled up {totals['ratings']} ratings and {totals['reviews']} reviews."
+        ))
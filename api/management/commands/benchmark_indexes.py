@@ -0,0 +1,112 @@
+import json
+import statistics
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Max, Min
+from api.models import Genre, Movie, MovieGenre, Rating, Review
+from api.seeding import seed_dataset
+
+TRIGRAM_INDEXES = ['movie_title_trgm', 'movie_title_upper_trgm']
+
+
+class Command(BaseCommand):
+    help = (
+        'Show EXPLAIN plans and timings of the API access paths with and without the '
+        'query indexes. Indexes are dropped inside a transaction that is rolled back; '
+        'run it against a benchmark database, not production.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed-reviews', type=int, default=0,
+                            help='Seed this many reviews first (e.g. 1000000).')
+        parser.add_argument('--seed-movies', type=int, default=5000)
+        parser.add_argument('--seed-users', type=int, default=20000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--plans', action='store_true', help='Print full EXPLAIN output.')
+        parser.add_argument('--output', help='Write the results as JSON to this file.')
+
+    def handle(self, *args, **options):
+        if options['seed_reviews']:
+            seed_dataset(
+                movies=options['seed_movies'],
+                users=options['seed_users'],
+                reviews=options['seed_reviews'],
+                ratings=options['seed_reviews'],
+                log=self.stdout.write,
+            )
+        if not Review.objects.exists():
+            self.stderr.write('No reviews to benchmark; pass --seed-reviews.')
+            return
+
+        queries = self.build_queries()
+        with_indexes = self.run(queries, options, 'with indexes')
+        with transaction.atomic():
+            self.drop_indexes()
+            without_indexes = self.run(queries, options, 'without indexes')
+            transaction.set_rollback(True)
+
+        results = []
+        for name in queries:
+            after, before = with_indexes[name], without_indexes[name]
+            results.append({'query': name, 'without_indexes': before, 'with_indexes': after})
+            speedup = before['median_ms'] / after['median_ms'] if after['median_ms'] else float('inf')
+            self.stdout.write(
+                f"{name:<32} without {before['median_ms']:9.2f} ms   with {after['median_ms']:9.2f} ms   "
+                f'x{speedup:.1f}'
+            )
+            if options['plans']:
+                self.stdout.write(f"  -- without indexes:\n{before['plan']}\n  -- with indexes:\n{after['plan']}\n")
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                json.dump({'vendor': connection.vendor, 'results': results}, handle, indent=2)
+
+    def build_queries(self):
+        bounds = Review.objects.aggregate(low=Min('id'), high=Max('id'), first=Min('created_at'))
+        middle_id = (bounds['low'] + bounds['high']) // 2
+        movie_id = Review.objects.filter(id__gte=middle_id).values_list('movie_id', flat=True).first()
+        genre_id = MovieGenre.objects.values_list('genre_id', flat=True).first() or Genre.objects.values_list('id', flat=True).first()
+        start = bounds['first'] + timedelta(days=30)
+        return {
+            'reviews by sentiment (page)': Review.objects.filter(sentiment='Negative', id__gt=middle_id).order_by('id')[:50],
+            'reviews of movie (page)': Review.objects.filter(movie_id=movie_id).order_by('id')[:50],
+            'reviews of movie by sentiment': Review.objects.filter(movie_id=movie_id, sentiment='Positive').order_by('id')[:50],
+            'reviews in created_at range': Review.objects.filter(created_at__gte=start, created_at__lt=start + timedelta(days=1)).order_by('created_at')[:500],
+            'pending sentiment queue': Review.objects.filter(sentiment='Pending').order_by('id')[:200],
+            'ratings of movie (page)': Rating.objects.filter(movie_id=movie_id).order_by('id')[:50],
+            'movies in genre (page)': Movie.objects.filter(moviegenre__genre_id=genre_id).order_by('id')[:50],
+            'movie title search': Movie.objects.filter(title__icontains='ovie 12')[:50],
+        }
+
+    def run(self, queries, options, phase):
+        results = {}
+        for name, queryset in queries.items():
+            timings = []
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                list(queryset.all())
+                timings.append((time.perf_counter() - started) * 1000)
+            results[name] = {
+                'median_ms': statistics.median(timings),
+                'plan': self.explain(queryset, phase),
+            }
+        return results
+
+    def explain(self, queryset, phase):
+        # Not QuerySet.explain(): SQLite's statement cache would replay the plan
+        # prepared before the indexes were dropped, so tag the SQL per phase.
+        options = {'analyze': True} if connection.vendor == 'postgresql' else {}
+        prefix = connection.ops.explain_query_prefix(**options)
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'{prefix} {sql} -- {phase}', params)
+            return '\n'.join(' '.join(str(value) for value in row) for row in cursor.fetchall())
+
+    def drop_indexes(self):
+        names = [index.name for model in (Movie, MovieGenre, Review, Rating) for index in model._meta.indexes]
+        if connection.vendor == 'postgresql':
+            names += TRIGRAM_INDEXES
+        with connection.cursor() as cursor:
+            for name in names:
+                cursor.execute(f'DROP INDEX IF EXISTS {connection.ops.quote_name(name)}')
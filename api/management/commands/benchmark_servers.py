@@ -0,0 +1,115 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from api.benchmark import http_get, read_paths, run_http_load
+
+HOST = '127.0.0.1'
+
+# name -> (command line, API_ASYNC_READS)
+SERVERS = {
+    'asgi': (['uvicorn', 'movie_api.asgi:application', '--no-access-log'], 'True'),
+    'asgi-sync': (['uvicorn', 'movie_api.asgi:application', '--no-access-log'], 'False'),
+    'wsgi': (['gunicorn', 'movie_api.wsgi:application'], 'False'),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Start the API under uvicorn (ASGI, with and without the async read views) and gunicorn '
+        '(WSGI), drive the read endpoints over HTTP with many concurrent slow clients, and '
+        'compare latency and throughput.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--server', action='append', dest='servers', choices=sorted(SERVERS),
+                            help='Only benchmark this server (repeatable). Default: all.')
+        parser.add_argument('--concurrency', type=int, default=64, help='Concurrent HTTP clients.')
+        parser.add_argument('--requests', type=int, default=1000, help='Requests per server.')
+        parser.add_argument('--client-delay-ms', type=float, default=50,
+                            help='Pause between the halves of each request, simulating slow clients.')
+        parser.add_argument('--workers', type=int, default=1, help='Server worker processes.')
+        parser.add_argument('--threads', type=int, default=4, help='Threads per gunicorn worker.')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--output', help='Write the results as JSON to this file.')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1 or options['requests'] < 1:
+            raise CommandError('--concurrency and --requests must be positive.')
+        try:
+            paths = read_paths()
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        results = {
+            'meta': {
+                'created_at': timezone.now().isoformat(),
+                'debug': settings.DEBUG,
+                'concurrency': options['concurrency'],
+                'requests': options['requests'],
+                'client_delay_ms': options['client_delay_ms'],
+                'workers': options['workers'],
+                'threads': options['threads'],
+            },
+            'servers': {},
+        }
+        for name in options['servers'] or sorted(SERVERS):
+            if self.answers(options['port']):
+                raise CommandError(f'Port {options["port"]} is already in use; pick another with --port.')
+            server = self.start_server(name, options)
+            try:
+                self.wait_until_ready(server, options['port'])
+                result = asyncio.run(run_http_load(
+                    HOST, options['port'], paths, options['concurrency'], options['requests'],
+                    client_delay=options['client_delay_ms'] / 1000, seed=options['seed'],
+                ))
+            finally:
+                server.terminate()
+                server.wait(timeout=30)
+            results['servers'][name] = result
+            self.stdout.write(
+                f"{name:<10} p50 {result['p50_ms']:8.2f} ms  p95 {result['p95_ms']:8.2f} ms  "
+                f"p99 {result['p99_ms']:8.2f} ms  {result['throughput_rps']:8.1f} req/s  {result['errors']} errors"
+            )
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                json.dump(results, handle, indent=2)
+
+    def start_server(self, name, options, env=None):
+        command, async_reads = SERVERS[name]
+        address = ['--host', HOST, '--port', str(options['port'])] if command[0] == 'uvicorn' else [
+            '--bind', f'{HOST}:{options["port"]}', '--threads', str(options['threads']),
+        ]
+        env = {
+            **os.environ,
+            'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'movie_api.settings'),
+            'API_ASYNC_READS': async_reads,
+            **(env or {}),
+        }
+        return subprocess.Popen(
+            [sys.executable, '-m', *command, *address, '--workers', str(options['workers']),
+             '--log-level', 'warning'],
+            cwd=settings.BASE_DIR, env=env,
+        )
+
+    def wait_until_ready(self, server, port, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f'Server exited with status {server.returncode}.')
+            if self.answers(port):
+                return
+            time.sleep(0.2)
+        raise CommandError(f'Server did not answer on port {port} within {timeout}s.')
+
+    def answers(self, port):
+        try:
+            asyncio.run(http_get(HOST, port, '/'))
+        except OSError:
+            return False
+        return True
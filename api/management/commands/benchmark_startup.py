@@ -0,0 +1,128 @@
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import CommandError
+from django.utils import timezone
+from api.auth import ClaimsRefreshToken
+from api.benchmark import http_request
+from api.models import Movie, Review
+from .benchmark_servers import HOST, SERVERS, Command as BenchmarkServersCommand
+
+
+class Command(BenchmarkServersCommand):
+    help = (
+        'Measure how fast a new API process becomes useful under gunicorn (WSGI) and uvicorn (ASGI), '
+        'with and without the worker warm-up: the import time of the entry point, the time from '
+        'starting the server to its first API response, and the latency of its first review, which '
+        'is scored by the sentiment analyzer.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--server', action='append', dest='servers', choices=sorted(SERVERS),
+                            help='Only benchmark this server (repeatable). Default: wsgi and asgi.')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per measurement; the median is reported.')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--output', help='Write the results as JSON to this file.')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be positive.')
+        movie = Movie.objects.order_by('id').first()
+        user = User.objects.filter(is_active=True).order_by('id').first()
+        if movie is None or user is None:
+            raise CommandError('No movies or users to benchmark; seed data first (manage.py seed_data).')
+        self.movie, self.token = movie, str(ClaimsRefreshToken.for_user(user).access_token)
+        self.review_ids = []
+        # One single-threaded worker, so every request lands in the process being measured.
+        options.update(workers=1, threads=1)
+        results = {
+            'meta': {'created_at': timezone.now().isoformat(), 'debug': settings.DEBUG, 'repeat': options['repeat']},
+            'servers': {},
+        }
+        try:
+            for name in options['servers'] or ['asgi', 'wsgi']:
+                for warmup in ('True', 'False'):
+                    runs = [self.measure(name, warmup, options) for _ in range(options['repeat'])]
+                    result = {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+                    label = f"{name} warm-up {'on' if warmup == 'True' else 'off'}"
+                    results['servers'][label] = result
+                    self.stdout.write(
+                        f"{label:<20} import {result['import_ms']:7.0f} ms  "
+                        f"first response {result['first_response_ms']:7.0f} ms  "
+                        f"first review {result['first_review_ms']:7.1f} ms  "
+                        f"next review {result['next_review_ms']:6.1f} ms"
+                    )
+        finally:
+            # Deleted one by one so the movie's review counts follow.
+            for review in Review.objects.filter(id__in=self.review_ids):
+                review.delete()
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                json.dump(results, handle, indent=2)
+
+    def measure(self, name, warmup, options):
+        env = {'API_WARMUP': warmup}
+        module = SERVERS[name][0][1].split(':')[0]
+        script = f'import time; started = time.perf_counter(); import {module}; print(time.perf_counter() - started)'
+        imported = subprocess.run(
+            [sys.executable, '-c', script], cwd=settings.BASE_DIR, env=self.server_env(env),
+            capture_output=True, text=True, check=True,
+        )
+        result = {'import_ms': float(imported.stdout.split()[-1]) * 1000}
+
+        if self.answers(options['port']):
+            raise CommandError(f'Port {options["port"]} is already in use; pick another with --port.')
+        started = time.perf_counter()
+        server = self.start_server(name, options, env)
+        try:
+            self.wait_for_response(server, options['port'], f'/api/movies/{self.movie.id}/')
+            result['first_response_ms'] = (time.perf_counter() - started) * 1000
+            result['first_review_ms'], result['next_review_ms'] = (
+                self.post_review(options['port']) for _ in range(2)
+            )
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+        return result
+
+    def server_env(self, env):
+        return {
+            **os.environ,
+            'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'movie_api.settings'),
+            **env,
+        }
+
+    def wait_for_response(self, server, port, path, timeout=60):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f'Server exited with status {server.returncode}.')
+            try:
+                status, _ = asyncio.run(http_request(HOST, port, 'GET', path))
+            except (OSError, IndexError, ValueError):
+                # Not listening yet, or a worker that is still booting dropped the connection.
+                time.sleep(0.01)
+                continue
+            if status != 200:
+                raise CommandError(f'GET {path} answered {status}.')
+            return
+        raise CommandError(f'Server did not answer on port {port} within {timeout}s.')
+
+    def post_review(self, port):
+        body = json.dumps({'movie': self.movie.id, 'review_text': 'A surprisingly good film.'}).encode()
+        started = time.perf_counter()
+        status, content = asyncio.run(http_request(
+            HOST, port, 'POST', '/api/reviews/', body,
+            [('Content-Type', 'application/json'), ('Authorization', f'Bearer {self.token}')],
+        ))
+        elapsed = (time.perf_counter() - started) * 1000
+        if status != 201:
+            raise CommandError(f'POST /api/reviews/ answered {status}: {content[:200]!r}')
+        self.review_ids.append(json.loads(content)['id'])
+        return elapsed
@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from api.workers import SentimentWorkerPool, run_worker
+
+
+class Command(BaseCommand):
+    help = 'Score reviews left in the Pending sentiment state (SENTIMENT_ASYNC=True).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1)
+        parser.add_argument('--batch-size', type=int, default=settings.SENTIMENT_BATCH_SIZE)
+        parser.add_argument('--poll-interval', type=float, default=1.0)
+        parser.add_argument('--drain', action='store_true', help='Exit once the queue is empty.')
+
+    def handle(self, *args, **options):
+        if options['workers'] <= 1:
+            try:
+                scored = run_worker(options['batch_size'], options['poll_interval'], drain=options['drain'])
+            except KeyboardInterrupt:
+                return
+            self.stdout.write(self.style.SUCCESS(f'Scored {scored} reviews.'))
+            return
+
+        pool = SentimentWorkerPool(
+            workers=options['workers'],
+            batch_size=options['batch_size'],
+            poll_interval=options['poll_interval'],
+            drain=options['drain'],
+        )
+        pool.start()
+        try:
+            pool.join()
+        except KeyboardInterrupt:
+            pool.stop()
+        self.stdout.write(self.style.SUCCESS('Sentiment workers stopped.'))
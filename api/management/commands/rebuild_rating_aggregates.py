@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from api.models import REVIEW_COUNT_FIELDS, Movie, Rating, Review
+
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized rating aggregates and review sentiment counts on Movie.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        histogram = {
+            f'stars_{stars}_count': Count('id', filter=Q(stars=stars))
+            for stars in range(1, 6)
+        }
+        sentiments = {
+            field: Count('id', filter=Q(sentiment=sentiment)) for sentiment, field in REVIEW_COUNT_FIELDS.items()
+        }
+        fields = ['rating_count', 'rating_sum', *histogram, *sentiments]
+        movie_ids = list(Movie.objects.order_by('id').values_list('id', flat=True))
+        updated = 0
+        for start in range(0, len(movie_ids), batch_size):
+            chunk = movie_ids[start:start + batch_size]
+            # Locking the movie rows makes concurrent Rating and Review writers wait
+            # for the recount, so their incremental deltas land on top of it.
+            with transaction.atomic():
+                movies = list(Movie.objects.select_for_update().filter(id__in=chunk).only('id'))
+                stats = {
+                    row['movie_id']: row
+                    for row in Rating.objects.filter(movie_id__in=chunk)
+                    .values('movie_id')
+                    .annotate(rating_count=Count('id'), rating_sum=Sum('stars'), **histogram)
+                }
+                for row in Review.objects.filter(movie_id__in=chunk).values('movie_id').annotate(**sentiments):
+                    stats.setdefault(row['movie_id'], {}).update(row)
+                for movie in movies:
+                    row = stats.get(movie.id, {})
+                    for field in fields:
+                        setattr(movie, field, row.get(field) or 0)
+                Movie.objects.bulk_update(movies, fields)
+            updated += len(movies)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt rating aggregates and review counts for {updated} movies.'))
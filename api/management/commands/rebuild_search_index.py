@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from api.search import SEARCH_MODELS, get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index for movies and reviews.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.SEARCH_INDEX_BATCH_SIZE)
+        parser.add_argument('--only', choices=sorted(SEARCH_MODELS), help='Rebuild a single kind.')
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        kinds = [options['only']] if options['only'] else sorted(SEARCH_MODELS)
+        for kind in kinds:
+            model = SEARCH_MODELS[kind]
+            last_id, indexed = 0, 0
+            # Walk the table by id so memory stays flat however many rows there are.
+            while ids := list(
+                model.objects.filter(id__gt=last_id).order_by('id')
+                .values_list('id', flat=True)[:options['batch_size']]
+            ):
+                backend.index(kind, ids)
+                last_id = ids[-1]
+                indexed += len(ids)
+            self.stdout.write(self.style.SUCCESS(
+                f'Indexed {indexed} {kind} with {type(backend).__name__}.'
+            ))
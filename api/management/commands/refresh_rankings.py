@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from api.rankings import refresh_rankings
+
+
+class Command(BaseCommand):
+    help = (
+        'Fold ratings and reviews created since the last run into the analytics rollups and the '
+        'leaderboard rankings. '
+        'Meant to run on a schedule (e.g. every few minutes from cron).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help='Rebuild the rankings from every rating and review instead of incrementally.')
+        parser.add_argument('--settle-seconds', type=int,
+                            help='Leave rows younger than this to the next run (default ROLLUP_SETTLE_SECONDS).')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        result = refresh_rankings(
+            full=options['full'], settle_seconds=options['settle_seconds'], batch_size=options['batch_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Folded in {result['ratings']} ratings and {result['reviews']} reviews, updated "
+            f"{result['movies']} movie rankings through {result['watermark'].isoformat()}."
+        ))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+from api.similarity import changed_movie_ids, refresh_similar_movies
+from api.snapshots import get_ratings_snapshot, write_ratings_snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the similar-movies lists of the movies whose ratings changed since their last '
+        'computation, and of the movies whose lists those enter or leave, from a fresh ratings '
+        'snapshot. Nothing is done, and no snapshot written, while no ratings changed.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help='Recompute every movie, picking up genre and review changes too.')
+        parser.add_argument('--reuse-snapshot', action='store_true',
+                            help='Use the current ratings snapshot instead of writing a new one.')
+        parser.add_argument('--k', type=int, help='Neighbours per movie. Default: SIMILAR_MOVIES_K.')
+        parser.add_argument('--batch-size', type=int, default=500, help='Movies replaced per transaction.')
+
+    def handle(self, *args, **options):
+        if not options['full'] and not changed_movie_ids():
+            self.stdout.write(self.style.SUCCESS('No ratings changed; the similar movies are up to date.'))
+            return
+        if not options['reuse_snapshot']:
+            write_ratings_snapshot()
+        snapshot = get_ratings_snapshot()
+        if snapshot is None:
+            raise CommandError('No ratings snapshot yet; run without --reuse-snapshot.')
+        result = refresh_similar_movies(
+            snapshot, full=options['full'], k=options['k'], batch_size=options['batch_size'],
+            log=self.stdout.write,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored {result['neighbours']} neighbours for {result['movies']} movies."
+        ))
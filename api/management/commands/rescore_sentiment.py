@@ -0,0 +1,44 @@
+import os
+from django.core.management.base import BaseCommand, CommandError
+from api.workers import rescore_reviews
+
+
+class Command(BaseCommand):
+    help = (
+        'Re-score the sentiment of every scored review with the current analyzer and thresholds, '
+        'in id-range chunks across a pool of worker processes. Only changed labels are written.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--chunk-size', type=int, default=10000, help='Review ids per task.')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Changed reviews per write transaction.')
+        parser.add_argument(
+            '--max-writes-per-second', type=float,
+            help='Cap on reviews updated per second, across all workers.',
+        )
+        parser.add_argument('--start-id', type=int, help='Skip reviews with lower ids.')
+        parser.add_argument(
+            '--checkpoint', help='JSON file recording progress; an interrupted run resumes from it.',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Report label changes without writing them.')
+
+    def handle(self, *args, **options):
+        for name in ('workers', 'chunk_size', 'batch_size'):
+            if options[name] < 1:
+                raise CommandError(f"--{name.replace('_', '-')} must be positive.")
+        try:
+            totals = rescore_reviews(
+                workers=options['workers'], chunk_size=options['chunk_size'], batch_size=options['batch_size'],
+                max_writes_per_second=options['max_writes_per_second'], dry_run=options['dry_run'],
+                start_id=options['start_id'], checkpoint=options['checkpoint'], log=self.stdout.write,
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        for (old, new), count in sorted(totals['transitions'].items()):
+            if old != new:
+                self.stdout.write(f'  {old} -> {new}: {count}')
+        verb = 'Would change' if options['dry_run'] else 'Changed'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {totals['changed']} of {totals['scanned']} reviews."
+        ))
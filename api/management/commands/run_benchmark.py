@@ -0,0 +1,83 @@
+import json
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from django.utils import timezone
+from api.benchmark import build_scenarios, compare_to_baseline, load_results, run_scenario
+from api.models import Movie, Rating, Review
+
+
+class Command(BaseCommand):
+    help = (
+        'Drive the API endpoints in-process through the real URLconf and middleware at a '
+        'given concurrency, and report p50/p95/p99 latency, throughput and queries per request.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--requests', type=int, default=200, help='Requests per scenario.')
+        parser.add_argument('--warmup', type=int, default=10, help='Unmeasured requests per scenario.')
+        parser.add_argument('--scenario', action='append', dest='scenarios',
+                            help='Only run this scenario (repeatable).')
+        parser.add_argument('--password', help='Password of the seeded users, enables the login scenario.')
+        parser.add_argument('--no-cache', action='store_true', help='Disable the response cache.')
+        parser.add_argument('--output', help='Write the results as JSON to this file.')
+        parser.add_argument('--baseline', help='Compare against results saved by an earlier run.')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Allowed relative slowdown before a metric counts as a regression.')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1 or options['requests'] < 1:
+            raise CommandError('--concurrency and --requests must be positive.')
+        try:
+            scenarios = build_scenarios(password=options['password'])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        if options['scenarios']:
+            unknown = set(options['scenarios']) - {scenario.name for scenario in scenarios}
+            if unknown:
+                raise CommandError(f'Unknown or unavailable scenarios: {", ".join(sorted(unknown))}')
+            scenarios = [scenario for scenario in scenarios if scenario.name in options['scenarios']]
+
+        cache = {**settings.RESPONSE_CACHE, 'ENABLED': not options['no_cache'] and settings.RESPONSE_CACHE['ENABLED']}
+        results = {
+            'meta': {
+                'created_at': timezone.now().isoformat(),
+                'vendor': connection.vendor,
+                'debug': settings.DEBUG,
+                'response_cache': cache['ENABLED'],
+                'concurrency': options['concurrency'],
+                'requests': options['requests'],
+                'dataset': {
+                    'movies': Movie.objects.count(),
+                    'reviews': Review.objects.count(),
+                    'ratings': Rating.objects.count(),
+                },
+            },
+            'scenarios': {},
+        }
+        with override_settings(RESPONSE_CACHE=cache):
+            for scenario in scenarios:
+                result = run_scenario(
+                    scenario, options['concurrency'], options['requests'],
+                    warmup=options['warmup'], seed=options['seed'],
+                )
+                results['scenarios'][scenario.name] = result
+                self.stdout.write(
+                    f"{scenario.name:<22} p50 {result['p50_ms']:8.2f} ms  p95 {result['p95_ms']:8.2f} ms  "
+                    f"p99 {result['p99_ms']:8.2f} ms  {result['throughput_rps']:8.1f} req/s  "
+                    f"{result['queries_per_request']:5.1f} queries  {result['errors']} errors"
+                )
+
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                json.dump(results, handle, indent=2)
+        if options['baseline']:
+            regressions = compare_to_baseline(results, load_results(options['baseline']), options['tolerance'])
+            for regression in regressions:
+                self.stderr.write(f'REGRESSION {regression}')
+            if regressions:
+                raise CommandError(f'{len(regressions)} regression(s) against {options["baseline"]}.')
+            self.stdout.write(self.style.SUCCESS(f'No regressions against {options["baseline"]}.'))
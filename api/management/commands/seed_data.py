@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from api.seeding import seed_dataset
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a synthetic dataset: movies, genres and users with Zipf-skewed '
+        'review and rating activity and generated review text.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--movies', type=int, default=1000)
+        parser.add_argument('--genres', type=int, default=18)
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--reviews', type=int, default=100000)
+        parser.add_argument('--ratings', type=int, default=100000)
+        parser.add_argument('--days', type=int, default=365, help='Spread created_at over this many days.')
+        parser.add_argument('--skew', type=float, default=1.0,
+                            help='Zipf exponent of movie popularity and user activity.')
+        parser.add_argument('--password', help='Password for the seeded users (needed to benchmark login).')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        seed_dataset(
+            movies=options['movies'],
+            genres=options['genres'],
+            users=options['users'],
+            reviews=options['reviews'],
+            ratings=options['ratings'],
+            days=options['days'],
+            skew=options['skew'],
+            password=options['password'],
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            log=self.stdout.write,
+        )
+        self.stdout.write(self.style.SUCCESS('Seeding complete.'))
@@ -0,0 +1,22 @@
+import time
+from django.core.management.base import BaseCommand
+from api.snapshots import write_ratings_snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        'Write every rating to a columnar snapshot (NumPy arrays in CSR layout, indexed by movie '
+        'and by user) that api.snapshots.get_ratings_snapshot() memory-maps for offline jobs.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help='Snapshot directory. Default: RATINGS_SNAPSHOT_DIR.')
+        parser.add_argument('--batch-size', type=int, default=100000, help='Ratings read per query.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        meta = write_ratings_snapshot(options['output'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {meta['ratings']} ratings of {meta['movies']} movies by {meta['users']} users "
+            f"({meta['bytes'] / 2 ** 20:.1f} MiB) in {time.perf_counter() - started:.1f}s."
+        ))
@@ -0,0 +1,218 @@
+import threading
+from bisect import bisect_left
+from contextvars import ContextVar
+from time import perf_counter
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+_request_stats = ContextVar('request_stats', default=None)
+
+
+class RequestStats:
+    """Timings accumulated while one request is handled."""
+    __slots__ = ('db_queries', 'db_time', 'serializer_time', 'sentiment_time', 'sql')
+
+    def __init__(self, capture_sql=False):
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.sentiment_time = 0.0
+        self.sql = [] if capture_sql else None
+
+
+def begin_request(capture_sql=False):
+    stats = RequestStats(capture_sql)
+    return stats, _request_stats.set(stats)
+
+
+def end_request(token):
+    _request_stats.reset(token)
+
+
+def current_stats():
+    """The stats of the request being handled, or None when metrics are off."""
+    return _request_stats.get()
+
+
+def time_query(execute, sql, params, many, context):
+    """Database execute wrapper adding each query to the current request's stats."""
+    stats = _request_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = perf_counter() - started
+        stats.db_queries += 1
+        stats.db_time += elapsed
+        if stats.sql is not None:
+            stats.sql.append((elapsed, sql))
+
+
+def install_query_timer(connection, **kwargs):
+    """
+    Install time_query() on ``connection`` (also a connection_created receiver).
+
+    It is installed per connection rather than per request because async
+    views run their queries on the sync_to_async executor thread, whose
+    connection the request's own thread cannot reach. The stats still find
+    their way there: contextvars are copied into that thread.
+    """
+    if time_query not in connection.execute_wrappers:
+        # Outermost, so execute_wrapper() blocks opened later pop their own wrapper.
+        connection.execute_wrappers.insert(0, time_query)
+
+
+class Histogram:
+    def __init__(self, name, documentation, buckets, labelnames):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self):
+        with self._lock:
+            series = {labels: (list(counts), total, count) for labels, (counts, total, count) in self._series.items()}
+        for labels, (counts, total, count) in sorted(series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, '+Inf'), counts):
+                cumulative += bucket_count
+                yield f'{self.name}_bucket', (*zip(self.labelnames, labels), ('le', str(bound))), cumulative
+            yield f'{self.name}_sum', tuple(zip(self.labelnames, labels)), total
+            yield f'{self.name}_count', tuple(zip(self.labelnames, labels)), count
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        lines.extend(_sample_line(*sample) for sample in self.samples())
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        lines.extend(
+            _sample_line(self.name, tuple(zip(self.labelnames, labels)), value) for labels, value in values
+        )
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _sample_line(name, labels, value):
+    if labels:
+        name += '{' + ','.join(f'{key}="{_escape(label)}"' for key, label in labels) + '}'
+    return f'{name} {value}'
+
+
+VIEW_LABELS = ('view', 'action', 'method')
+
+REQUESTS = Counter('api_requests_total', 'Requests handled.', (*VIEW_LABELS, 'status'))
+REQUEST_DURATION = Histogram(
+    'api_request_duration_seconds', 'Wall time spent handling a request.', LATENCY_BUCKETS, VIEW_LABELS
+)
+DB_QUERIES = Histogram(
+    'api_request_db_queries', 'Database queries run per request.', QUERY_COUNT_BUCKETS, VIEW_LABELS
+)
+DB_DURATION = Histogram(
+    'api_request_db_seconds', 'Time per request spent in database queries.', LATENCY_BUCKETS, VIEW_LABELS
+)
+SERIALIZER_DURATION = Histogram(
+    'api_request_serializer_seconds', 'Time per request spent building serializer data.',
+    LATENCY_BUCKETS, VIEW_LABELS,
+)
+SENTIMENT_DURATION = Histogram(
+    'api_request_sentiment_seconds', 'Time per request spent scoring review sentiment.', LATENCY_BUCKETS, VIEW_LABELS
+)
+REGISTRY = [REQUESTS, REQUEST_DURATION, DB_QUERIES, DB_DURATION, SERIALIZER_DURATION, SENTIMENT_DURATION]
+
+
+def record_request(labels, status, duration, stats):
+    REQUESTS.inc((*labels, str(status)))
+    REQUEST_DURATION.observe(labels, duration)
+    DB_QUERIES.observe(labels, stats.db_queries)
+    DB_DURATION.observe(labels, stats.db_time)
+    SERIALIZER_DURATION.observe(labels, stats.serializer_time)
+    SENTIMENT_DURATION.observe(labels, stats.sentiment_time)
+
+
+def render_metrics():
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+def clear_metrics():
+    for metric in REGISTRY:
+        metric.clear()
+
+
+def time_sentiment(function, *args):
+    """Call ``function(*args)``, adding its duration to the current request's sentiment time."""
+    stats = _request_stats.get()
+    if stats is None:
+        return function(*args)
+    started = perf_counter()
+    try:
+        return function(*args)
+    finally:
+        stats.sentiment_time += perf_counter() - started
+
+
+class TimedSerializerMixin:
+    """
+    Adds the time spent building a serializer's ``.data`` to the request's serializer time.
+
+    Only top-level serializers build ``.data``; nested ones and the items of
+    a list serializer go through to_representation() and are not timed
+    again, so the per-item cost stays at zero.
+    """
+
+    @property
+    def data(self):
+        stats = _request_stats.get()
+        if stats is None:
+            return super().data
+        started = perf_counter()
+        try:
+            return super().data
+        finally:
+            stats.serializer_time += perf_counter() - started
@@ -0,0 +1,158 @@
+import logging
+from time import perf_counter
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.db.backends.signals import connection_created
+from whitenoise.middleware import WhiteNoiseMiddleware
+from . import metrics, routing
+
+slow_request_logger = logging.getLogger('api.slow_requests')
+
+
+class RequestMetricsMiddleware:
+    """
+    Record per-request timings into the histograms in api.metrics.
+
+    For each request it measures wall time, the number and duration of
+    database queries, serializer time and sentiment scoring time, labelled
+    by view, action and method. With API_METRICS['ENABLED'] off, Django
+    drops the middleware at startup, so it costs nothing.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        config = settings.API_METRICS
+        if not config['ENABLED']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slow_request_seconds = config['SLOW_REQUEST_MS'] / 1000 if config['SLOW_REQUEST_MS'] else None
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        connection_created.connect(metrics.install_query_timer, dispatch_uid='api.metrics.query_timer')
+        metrics.install_query_timer(connection)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        stats, token = metrics.begin_request(capture_sql=self.slow_request_seconds is not None)
+        started = perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.end_request(token)
+        return self.finish_request(request, response, perf_counter() - started, stats)
+
+    async def __acall__(self, request):
+        stats, token = metrics.begin_request(capture_sql=self.slow_request_seconds is not None)
+        started = perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.end_request(token)
+        return self.finish_request(request, response, perf_counter() - started, stats)
+
+    def finish_request(self, request, response, duration, stats):
+        labels = getattr(request, '_metrics_labels', None) or ('unresolved', '', request.method)
+        metrics.record_request(labels, response.status_code, duration, stats)
+        if self.slow_request_seconds is not None and duration >= self.slow_request_seconds:
+            self.log_slow_request(request, response, labels, duration, stats)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        method = request.method.lower()
+        view_class = getattr(view_func, 'cls', None)
+        if view_class is not None:
+            actions = getattr(view_func, 'actions', None) or {}
+            view, action = view_class.__name__, actions.get(method, method)
+        elif hasattr(view_func, 'view_class'):
+            view_class = view_func.view_class
+            action = getattr(view_class, 'action', method) if method in ('get', 'head') else method
+            view = view_class.__name__
+        else:
+            view, action = view_func.__name__, method
+        request._metrics_labels = (view, action, request.method)
+
+    def log_slow_request(self, request, response, labels, duration, stats):
+        statements = '\n'.join(f'  {elapsed * 1000:8.2f} ms  {sql}' for elapsed, sql in stats.sql)
+        slow_request_logger.warning(
+            'Slow request %s %s (%s.%s) -> %s in %.1f ms: %d queries, %.1f ms db, '
+            '%.1f ms serializer, %.1f ms sentiment\n%s',
+            request.method, request.get_full_path(), labels[0], labels[1], response.status_code,
+            duration * 1000, stats.db_queries, stats.db_time * 1000,
+            stats.serializer_time * 1000, stats.sentiment_time * 1000, statements,
+        )
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Exposes the request being served to api.routing.PrimaryReplicaRouter,
+    and pins users who have just written to the primary. Django drops it at
+    startup when no DATABASE_REPLICAS are configured.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        token = routing.begin_request(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            routing.end_request(token)
+        routing.finish_request(request, response)
+        return response
+
+    async def __acall__(self, request):
+        token = routing.begin_request(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            routing.end_request(token)
+        routing.finish_request(request, response)
+        return response
+
+
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise's middleware, made async-capable.
+
+    The stock middleware is sync only, which makes Django run everything
+    below it, async views included, on a worker thread under ASGI. Here
+    static files are still served by WhiteNoise (on a thread), while every
+    other request stays on the event loop.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings=settings)
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
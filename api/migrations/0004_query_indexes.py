@@ -0,0 +1,98 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:16
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+from django.db.migrations.operations import AddIndex
+
+TRIGRAM_INDEXES = {
+    # Serves title__trigram_similar and other pg_trgm operators.
+    'movie_title_trgm': 'title gin_trgm_ops',
+    # Serves title__icontains, which Django compiles to UPPER(title::text) LIKE UPPER(...).
+    'movie_title_upper_trgm': '(UPPER(title::text)) gin_trgm_ops',
+}
+
+
+def create_trigram_indexes(apps, schema_editor):
+    # pg_trgm is PostgreSQL only; other backends keep using plain scans for title search.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, expression in TRIGRAM_INDEXES.items():
+        schema_editor.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON api_movie USING gin ({expression})')
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+
+
+class AddQueryIndex(AddIndexConcurrently):
+    """
+    CREATE INDEX CONCURRENTLY on PostgreSQL, so building the indexes of a
+    large table does not block writes to it; a plain AddIndex elsewhere.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+        else:
+            AddIndex.database_forwards(self, app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+        else:
+            AddIndex.database_backwards(self, app_label, schema_editor, from_state, to_state)
+
+
+class Migration(migrations.Migration):
+    # The concurrent index builds cannot run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('api', '0003_movie_rating_aggregates'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddQueryIndex(
+            model_name='movie',
+            index=models.Index(fields=['created_at'], name='movie_created_at'),
+        ),
+        AddQueryIndex(
+            model_name='moviegenre',
+            index=models.Index(fields=['genre', 'movie'], name='moviegenre_genre_movie'),
+        ),
+        AddQueryIndex(
+            model_name='rating',
+            index=models.Index(fields=['movie', 'id'], name='rating_movie_id'),
+        ),
+        AddQueryIndex(
+            model_name='rating',
+            index=models.Index(fields=['created_at'], name='rating_created_at'),
+        ),
+        AddQueryIndex(
+            model_name='review',
+            index=models.Index(fields=['movie', 'sentiment', 'id'], name='review_movie_sentiment_id'),
+        ),
+        AddQueryIndex(
+            model_name='review',
+            index=models.Index(fields=['movie', 'id'], name='review_movie_id'),
+        ),
+        AddQueryIndex(
+            model_name='review',
+            index=models.Index(fields=['sentiment', 'id'], name='review_sentiment_id'),
+        ),
+        AddQueryIndex(
+            model_name='review',
+            index=models.Index(fields=['created_at'], name='review_created_at'),
+        ),
+        AddQueryIndex(
+            model_name='review',
+            index=models.Index(condition=models.Q(('sentiment', 'Pending')), fields=['id'], name='review_pending_id'),
+        ),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
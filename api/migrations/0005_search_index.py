@@ -0,0 +1,70 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:24
+
+import django.contrib.postgres.search
+import django.db.models.deletion
+from django.db import migrations, models
+
+SEARCH_VECTOR_INDEXES = {
+    'movie_search_vector': 'api_movie',
+    'review_search_vector': 'api_review',
+}
+
+
+def create_search_vector_indexes(apps, schema_editor):
+    # The tsvector columns are only filled by the PostgreSQL search backend.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table in SEARCH_VECTOR_INDEXES.items():
+        schema_editor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin (search_vector)')
+
+
+def drop_search_vector_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name in SEARCH_VECTOR_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.CreateModel(
+            name='MovieSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('weight', models.FloatField()),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.movie')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['term', 'movie'], name='moviesearchterm_term_movie')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ReviewSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('weight', models.FloatField()),
+                ('review', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.review')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['term', 'review'], name='reviewsearchterm_term_review')],
+            },
+        ),
+        migrations.RunPython(create_search_vector_indexes, drop_search_vector_indexes),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_revoked_token'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Watermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=64, unique=True)),
+                ('created_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MovieRanking',
+            fields=[
+                ('movie', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='ranking', serialize=False, to='api.movie')),
+                ('bayesian_rating', models.FloatField(default=0.0)),
+                ('review_count', models.PositiveIntegerField(default=0)),
+                ('trending_score', models.FloatField(default=0.0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-bayesian_rating', 'movie'], name='ranking_bayesian_rating'), models.Index(fields=['-review_count', 'movie'], name='ranking_review_count'), models.Index(fields=['-trending_score', 'movie'], name='ranking_trending_score')],
+            },
+        ),
+        migrations.CreateModel(
+            name='MovieDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('rating_count', models.PositiveIntegerField(default=0)),
+                ('review_count', models.PositiveIntegerField(default=0)),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.movie')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day', 'movie'], name='moviedailystats_day_movie')],
+                'constraints': [models.UniqueConstraint(fields=('movie', 'day'), name='moviedailystats_movie_day')],
+            },
+        ),
+    ]
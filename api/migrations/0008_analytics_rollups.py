@@ -0,0 +1,91 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def rename_watermark(apps, schema_editor):
+    # The rankings watermark now tracks the rollups, which the rankings are computed from.
+    apps.get_model('api', 'Watermark').objects.filter(name='rankings').update(name='rollups')
+
+
+def restore_watermark(apps, schema_editor):
+    apps.get_model('api', 'Watermark').objects.filter(name='rollups').update(name='rankings')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_rankings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='moviedailystats',
+            name='negative_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='moviedailystats',
+            name='neutral_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='moviedailystats',
+            name='pending_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='moviedailystats',
+            name='positive_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='moviedailystats',
+            name='stars_1_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='moviedailystats',
+            name='stars_2_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='moviedailystats',
+            name='stars_3_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='moviedailystats',
+            name='stars_4_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='moviedailystats',
+            name='stars_5_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='GenreDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('rating_count', models.PositiveIntegerField(default=0)),
+                ('stars_1_count', models.PositiveIntegerField(default=0)),
+                ('stars_2_count', models.PositiveIntegerField(default=0)),
+                ('stars_3_count', models.PositiveIntegerField(default=0)),
+                ('stars_4_count', models.PositiveIntegerField(default=0)),
+                ('stars_5_count', models.PositiveIntegerField(default=0)),
+                ('review_count', models.PositiveIntegerField(default=0)),
+                ('positive_count', models.PositiveIntegerField(default=0)),
+                ('negative_count', models.PositiveIntegerField(default=0)),
+                ('neutral_count', models.PositiveIntegerField(default=0)),
+                ('pending_count', models.PositiveIntegerField(default=0)),
+                ('genre', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.genre')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('genre', 'day'), name='genredailystats_genre_day')],
+            },
+        ),
+        migrations.RunPython(rename_watermark, restore_watermark),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_analytics_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarityState',
+            fields=[
+                ('movie', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to='api.movie')),
+                ('rating_count', models.PositiveIntegerField()),
+                ('rating_sum', models.PositiveIntegerField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MovieSimilarity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similarities', to='api.movie')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.movie')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['movie', '-score'], name='moviesimilarity_movie_score')],
+                'constraints': [models.UniqueConstraint(fields=('movie', 'similar'), name='moviesimilarity_movie_similar')],
+            },
+        ),
+    ]
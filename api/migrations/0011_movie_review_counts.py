@@ -0,0 +1,43 @@
+# Generated by Django 5.2.5 on 2026-10-18 20:05
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def backfill_review_counts(apps, schema_editor):
+    Movie = apps.get_model('api', 'Movie')
+    Review = apps.get_model('api', 'Review')
+    counts = {
+        f'{sentiment.lower()}_review_count': Count('id', filter=Q(sentiment=sentiment))
+        for sentiment in ('Positive', 'Negative', 'Neutral')
+    }
+    rows = Review.objects.values('movie_id').annotate(**counts).order_by()
+    for row in rows.iterator():
+        movie_id = row.pop('movie_id')
+        Movie.objects.filter(pk=movie_id).update(**row)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_idempotency_records'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='positive_review_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='negative_review_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='neutral_review_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_review_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.5 on 2026-10-18 22:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # The leading column of the (movie, id) indexes from 0004 already serves
+    # lookups and cascades by movie, so the foreign keys' own indexes go.
+
+    dependencies = [
+        ('api', '0012_revokedtoken_revoked_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='review',
+            name='movie',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='reviews', to='api.movie'),
+        ),
+        migrations.AlterField(
+            model_name='rating',
+            name='movie',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='ratings', to='api.movie'),
+        ),
+    ]
@@ -1,12 +1,25 @@
-from django.db import models
+from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction
+from django.db.models import F, Q
+from django.dispatch import Signal
 from django.contrib.auth.models import User
-from textblob import TextBlob
 from enum import Enum
 
+# Sent with ``movie_ids`` whenever Movie.apply_rating_changes() updates aggregates.
+ratings_changed = Signal()
+
 class Sentiment(Enum):
     POSITIVE = 'Positive'
     NEGATIVE = 'Negative'
     NEUTRAL = 'Neutral'
+    PENDING = 'Pending'
+
+# The Movie counter of each scored review sentiment; Pending reviews are not counted.
+REVIEW_COUNT_FIELDS = {
+    sentiment.value: f'{sentiment.name.lower()}_review_count'
+    for sentiment in (Sentiment.POSITIVE, Sentiment.NEGATIVE, Sentiment.NEUTRAL)
+}
 
 class Genre(models.Model):
     name = models.CharField(max_length=50, unique=True)
@@ -21,50 +34,315 @@ class Movie(models.Model):
     poster_url = models.URLField(blank=True)
     genres = models.ManyToManyField(Genre, through='MovieGenre')
     created_at = models.DateTimeField(auto_now_add=True)
+    # Denormalized rating aggregates, maintained incrementally by Rating.save()
+    # and the post_delete handler in api.signals.
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    stars_1_count = models.PositiveIntegerField(default=0, editable=False)
+    stars_2_count = models.PositiveIntegerField(default=0, editable=False)
+    stars_3_count = models.PositiveIntegerField(default=0, editable=False)
+    stars_4_count = models.PositiveIntegerField(default=0, editable=False)
+    stars_5_count = models.PositiveIntegerField(default=0, editable=False)
+    # Reviews per sentiment, maintained by Review.save(), the post_delete
+    # handler in api.signals and the bulk review writers.
+    positive_review_count = models.PositiveIntegerField(default=0, editable=False)
+    negative_review_count = models.PositiveIntegerField(default=0, editable=False)
+    neutral_review_count = models.PositiveIntegerField(default=0, editable=False)
+    # Maintained by api.search on PostgreSQL; NULL with the inverted index backend.
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at'], name='movie_created_at'),
+        ]
 
     def __str__(self):
         return self.title
 
+    @property
+    def average_rating(self):
+        if not self.rating_count:
+            return 0.0
+        return self.rating_sum / self.rating_count
+
+    @property
+    def rating_histogram(self):
+        return {stars: getattr(self, f'stars_{stars}_count') for stars in range(1, 6)}
+
+    @property
+    def sentiment_counts(self):
+        return {sentiment: getattr(self, field) for sentiment, field in REVIEW_COUNT_FIELDS.items()}
+
+    @classmethod
+    def apply_rating_changes(cls, changes):
+        """Apply (movie_id, stars, sign) changes to the rating aggregates.
+
+        Changes are folded into one UPDATE per movie using F() expressions, so
+        concurrent writers never lose increments. Movies are updated in id
+        order to keep row-lock acquisition order stable across transactions.
+        """
+        deltas = {}
+        for movie_id, stars, sign in changes:
+            delta = deltas.setdefault(movie_id, {})
+            for field, amount in (
+                ('rating_count', sign),
+                ('rating_sum', sign * stars),
+                (f'stars_{stars}_count', sign),
+            ):
+                delta[field] = delta.get(field, 0) + amount
+        for movie_id in sorted(deltas):
+            updates = {
+                field: F(field) + amount
+                for field, amount in deltas[movie_id].items()
+                if amount
+            }
+            if updates:
+                cls.objects.filter(pk=movie_id).update(**updates)
+        if deltas:
+            ratings_changed.send(sender=cls, movie_ids=sorted(deltas))
+
+    @classmethod
+    def apply_review_changes(cls, changes):
+        """Apply (movie_id, sentiment, sign) changes to the review sentiment counts.
+
+        Like apply_rating_changes(): one UPDATE per movie, in id order.
+        Sentiments without a counter (Pending, blank) are ignored.
+        """
+        deltas = {}
+        for movie_id, sentiment, sign in changes:
+            if sentiment in REVIEW_COUNT_FIELDS:
+                delta = deltas.setdefault(movie_id, {})
+                field = REVIEW_COUNT_FIELDS[sentiment]
+                delta[field] = delta.get(field, 0) + sign
+        for movie_id in sorted(deltas):
+            updates = {
+                field: F(field) + amount
+                for field, amount in deltas[movie_id].items()
+                if amount
+            }
+            if updates:
+                cls.objects.filter(pk=movie_id).update(**updates)
+
 class MovieGenre(models.Model):
     movie = models.ForeignKey(Movie, on_delete=models.CASCADE)
     genre = models.ForeignKey(Genre, on_delete=models.CASCADE)
 
     class Meta:
         unique_together = ('movie', 'genre')
+        indexes = [
+            # Genre browsing; the unique constraint only covers movie -> genre.
+            models.Index(fields=['genre', 'movie'], name='moviegenre_genre_movie'),
+        ]
 
     def __str__(self):
         return f"{self.movie.title} - {self.genre.name}"
 
 class Review(models.Model):
-    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='reviews')
+    # Served by the (movie, ...) indexes below, so no index of its own.
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='reviews', db_index=False)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     review_text = models.TextField()
     sentiment = models.CharField(max_length=10, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # Keyset pages (ORDER BY id) per movie, per sentiment, and both.
+            models.Index(fields=['movie', 'sentiment', 'id'], name='review_movie_sentiment_id'),
+            models.Index(fields=['movie', 'id'], name='review_movie_id'),
+            models.Index(fields=['sentiment', 'id'], name='review_sentiment_id'),
+            models.Index(fields=['created_at'], name='review_created_at'),
+            # The async sentiment queue only ever scans pending rows.
+            models.Index(fields=['id'], condition=Q(sentiment='Pending'), name='review_pending_id'),
+        ]
 
     def save(self, *args, **kwargs):
         if self.review_text:
-            blob = TextBlob(self.review_text)
-            polarity = blob.sentiment.polarity
-            if polarity > 0:
-                self.sentiment = 'Positive'
-            elif polarity < 0:
-                self.sentiment = 'Negative'
+            if settings.SENTIMENT_ASYNC:
+                # Scored later by the process_sentiment_queue workers.
+                self.sentiment = Sentiment.PENDING.value
             else:
-                self.sentiment = 'Neutral'
-        super().save(*args, **kwargs)
+                from .sentiment import classify
+                self.sentiment = classify(self.review_text)
+        with transaction.atomic():
+            previous = None
+            if self.pk is not None:
+                previous = (
+                    Review.objects.select_for_update()
+                    .filter(pk=self.pk)
+                    .values_list('movie_id', 'sentiment')
+                    .first()
+                )
+            super().save(*args, **kwargs)
+            changes = [(self.movie_id, self.sentiment, 1)]
+            if previous is not None:
+                changes.append((*previous, -1))
+            Movie.apply_review_changes(changes)
 
     def __str__(self):
         return f"{self.user.username} - {self.movie.title}"
 
 class Rating(models.Model):
-    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='ratings')
+    # Served by the rating_movie_id index, so no index of its own.
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='ratings', db_index=False)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     stars = models.IntegerField(choices=[(i, i) for i in range(1, 6)])
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         unique_together = ('movie', 'user')  # Ensures one rating per user per movie
+        indexes = [
+            models.Index(fields=['movie', 'id'], name='rating_movie_id'),
+            models.Index(fields=['created_at'], name='rating_created_at'),
+        ]
+
+    @classmethod
+    def lock_user(cls, user_id):
+        """
+        Lock the user's row until the end of the transaction. Every insert of
+        the user's ratings takes it first, so a concurrent upsert of the same
+        rating cannot be counted as a new one twice.
+        """
+        list(User.objects.select_for_update().filter(pk=user_id).values_list('pk', flat=True))
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            previous = None
+            if self.pk is not None:
+                previous = (
+                    Rating.objects.select_for_update()
+                    .filter(pk=self.pk)
+                    .values_list('movie_id', 'stars')
+                    .first()
+                )
+            else:
+                Rating.lock_user(self.user_id)
+            super().save(*args, **kwargs)
+            changes = [(self.movie_id, self.stars, 1)]
+            if previous is not None:
+                changes.append((*previous, -1))
+            Movie.apply_rating_changes(changes)
 
     def __str__(self):
-        return f"{self.user.username} - {self.movie.title}: {self.stars}"
\ No newline at end of file
+        return f"{self.user.username} - {self.movie.title}: {self.stars}"
+
+class MovieSearchTerm(models.Model):
+    """Inverted index posting: ``term`` occurs in the movie's title or description."""
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='+')
+    term = models.CharField(max_length=64)
+    weight = models.FloatField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['term', 'movie'], name='moviesearchterm_term_movie'),
+        ]
+
+class ReviewSearchTerm(models.Model):
+    """Inverted index posting: ``term`` occurs in the review text."""
+    review = models.ForeignKey(Review, on_delete=models.CASCADE, related_name='+')
+    term = models.CharField(max_length=64)
+    weight = models.FloatField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['term', 'review'], name='reviewsearchterm_term_review'),
+        ]
+
+class RevokedToken(models.Model):
+    """A JWT revoked at logout, kept until it would have expired anyway (see api.auth)."""
+    jti = models.CharField(max_length=255, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+    revoked_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+class IdempotencyRecord(models.Model):
+    """The response to a request sent with an Idempotency-Key, replayed to retries of it (see api.idempotency)."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    key = models.CharField(max_length=255)
+    # SHA-256 of the method, path and body the key was first used with.
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField()
+    response = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='idempotencyrecord_user_key'),
+        ]
+
+class Watermark(models.Model):
+    """How far (by created_at) an incremental job has processed its source rows."""
+    name = models.CharField(max_length=64, unique=True)
+    created_at = models.DateTimeField()
+
+class DailyStats(models.Model):
+    """Ratings (per star) and reviews (per sentiment) created on a UTC day, maintained by api.rollups."""
+    day = models.DateField()
+    rating_count = models.PositiveIntegerField(default=0)
+    stars_1_count = models.PositiveIntegerField(default=0)
+    stars_2_count = models.PositiveIntegerField(default=0)
+    stars_3_count = models.PositiveIntegerField(default=0)
+    stars_4_count = models.PositiveIntegerField(default=0)
+    stars_5_count = models.PositiveIntegerField(default=0)
+    review_count = models.PositiveIntegerField(default=0)
+    positive_count = models.PositiveIntegerField(default=0)
+    negative_count = models.PositiveIntegerField(default=0)
+    neutral_count = models.PositiveIntegerField(default=0)
+    pending_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+class MovieDailyStats(DailyStats):
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='+')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['movie', 'day'], name='moviedailystats_movie_day'),
+        ]
+        indexes = [
+            models.Index(fields=['day', 'movie'], name='moviedailystats_day_movie'),
+        ]
+
+class GenreDailyStats(DailyStats):
+    """The MovieDailyStats of the genre's movies, summed."""
+    genre = models.ForeignKey(Genre, on_delete=models.CASCADE, related_name='+')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['genre', 'day'], name='genredailystats_genre_day'),
+        ]
+
+class MovieRanking(models.Model):
+    """Precomputed leaderboard scores of a movie, refreshed by `manage.py refresh_rankings`."""
+    movie = models.OneToOneField(Movie, on_delete=models.CASCADE, primary_key=True, related_name='ranking')
+    bayesian_rating = models.FloatField(default=0.0)
+    review_count = models.PositiveIntegerField(default=0)
+    trending_score = models.FloatField(default=0.0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-bayesian_rating', 'movie'], name='ranking_bayesian_rating'),
+            models.Index(fields=['-review_count', 'movie'], name='ranking_review_count'),
+            models.Index(fields=['-trending_score', 'movie'], name='ranking_trending_score'),
+        ]
+
+class MovieSimilarity(models.Model):
+    """One of a movie's nearest neighbours, computed by `manage.py refresh_similar_movies`."""
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='similarities')
+    similar = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['movie', 'similar'], name='moviesimilarity_movie_similar'),
+        ]
+        indexes = [
+            models.Index(fields=['movie', '-score'], name='moviesimilarity_movie_score'),
+        ]
+
+class SimilarityState(models.Model):
+    """The rating aggregates a movie's neighbours were last computed from, to spot changed movies."""
+    movie = models.OneToOneField(Movie, on_delete=models.CASCADE, primary_key=True, related_name='+')
+    rating_count = models.PositiveIntegerField()
+    rating_sum = models.PositiveIntegerField()
@@ -0,0 +1,182 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from django.conf import settings
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class PageSizeMixin:
+    page_size_query_param = 'page_size'
+
+    @property
+    def page_size(self):
+        return settings.REST_FRAMEWORK.get('PAGE_SIZE') or 50
+
+    @property
+    def max_page_size(self):
+        return getattr(settings, 'API_MAX_PAGE_SIZE', 500)
+
+    def get_page_size(self, request):
+        try:
+            requested = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if requested <= 0:
+            return self.page_size
+        return min(requested, self.max_page_size)
+
+
+class KeysetPagination(PageSizeMixin, BasePagination):
+    """
+    Opaque-cursor pagination over a unique, ascending key (``id``).
+
+    Each page is a single ``WHERE id > %s ORDER BY id LIMIT n`` query, so the
+    cost of a page does not grow with how deep into the table it sits.
+    """
+    ordering = 'id'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def encode_cursor(self, direction, key):
+        raw = f'{direction}:{key}'.encode()
+        return urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            raw = urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4)).decode()
+            direction, key = raw.split(':', 1)
+            key = int(key)
+        except (BinasciiError, UnicodeDecodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if direction not in ('n', 'p'):
+            raise NotFound(self.invalid_cursor_message)
+        return direction, key
+
+    def get_key(self, row):
+        if isinstance(row, dict):
+            return row[self.ordering]
+        return getattr(row, self.ordering)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        rows = self.fetch_page(queryset, cursor, page_size)
+        return self.finish_page(rows, cursor, page_size)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset() for async views, fetching the page with the async ORM."""
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        rows = [row async for row in self.page_queryset(queryset, cursor, page_size)]
+        return self.finish_page(rows, cursor, page_size)
+
+    def page_queryset(self, queryset, cursor, page_size):
+        queryset = queryset.order_by(self.ordering)
+        if cursor is None:
+            return queryset[:page_size + 1]
+        direction, key = cursor
+        if direction == 'n':
+            return queryset.filter(**{f'{self.ordering}__gt': key})[:page_size + 1]
+        return queryset.filter(**{f'{self.ordering}__lt': key}).order_by(f'-{self.ordering}')[:page_size + 1]
+
+    def fetch_page(self, queryset, cursor, page_size):
+        return list(self.page_queryset(queryset, cursor, page_size))
+
+    def finish_page(self, rows, cursor, page_size):
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if cursor is not None and cursor[0] == 'p':
+            rows.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+        self.first_key = self.get_key(rows[0]) if rows else None
+        self.last_key = self.get_key(rows[-1]) if rows else None
+        return rows
+
+    def get_next_link(self):
+        if not self.has_next or self.last_key is None:
+            return None
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, self.encode_cursor('n', self.last_key)
+        )
+
+    def get_previous_link(self):
+        if not self.has_previous or self.first_key is None:
+            return None
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, self.encode_cursor('p', self.first_key)
+        )
+
+    def get_paginated_data(self, data):
+        return {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        }
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class RankedPagination(PageSizeMixin, BasePagination):
+    """
+    Page-number pagination for relevance-ordered results.
+
+    Keyset cursors do not apply to a rank ordering, so pages are fetched with
+    LIMIT/OFFSET. One extra row is fetched to tell whether a next page exists
+    instead of running a COUNT over every match.
+    """
+    page_query_param = 'page'
+    invalid_page_message = 'Invalid page'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        try:
+            self.page = int(request.query_params.get(self.page_query_param, 1))
+        except ValueError:
+            raise NotFound(self.invalid_page_message)
+        if self.page < 1:
+            raise NotFound(self.invalid_page_message)
+        page_size = self.get_page_size(request)
+        offset = (self.page - 1) * page_size
+        rows = list(queryset[offset:offset + page_size + 1])
+        self.has_next = len(rows) > page_size
+        return rows[:page_size]
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return replace_query_param(self.base_url, self.page_query_param, self.page + 1)
+
+    def get_previous_link(self):
+        if self.page == 1:
+            return None
+        return replace_query_param(self.base_url, self.page_query_param, self.page - 1)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
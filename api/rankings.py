@@ -0,0 +1,121 @@
+from collections import defaultdict
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, FloatField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Cast
+from django.utils import timezone
+from .cache import invalidate_on_commit
+from .models import Movie, MovieDailyStats, MovieRanking
+from .rollups import backfill_rollups, refresh_rollups
+
+# Leaderboard name -> MovieRanking field it is ordered by
+LEADERBOARDS = {
+    'top-rated': 'bayesian_rating',
+    'most-reviewed': 'review_count',
+    'trending': 'trending_score',
+}
+
+
+def bayesian_rating(prior_mean, prior_weight):
+    """
+    The expression for a Movie's average rating pulled toward ``prior_mean``
+    as if ``prior_weight`` more ratings had that value, 0 when unrated.
+    """
+    return Case(
+        When(rating_count=0, then=Value(0.0)),
+        default=(
+            (Cast('rating_sum', FloatField()) + Value(prior_weight * prior_mean)) / (F('rating_count') + prior_weight)
+        ),
+        output_field=FloatField(),
+    )
+
+
+def trending_score(daily_counts, today, half_life):
+    """Sum of (day, count) pairs, each weighted down by half every ``half_life`` days of age."""
+    return sum(count * 0.5 ** ((today - day).days / half_life) for day, count in daily_counts)
+
+
+def refresh_rankings(full=False, now=None, settle_seconds=None, batch_size=1000):
+    """
+    Bring the rollups up to date (see api.rollups), then the rankings of the
+    movies they changed.
+
+    Every Bayesian rating is recomputed, in one UPDATE from the aggregates
+    kept on Movie, as the prior (the mean of all ratings) moves with every
+    new rating and edited ratings keep their created_at. Movies with new
+    reviews get a review count summed from the rollups, and trending scores
+    are recomputed from the rollups of the trending window. ``full`` first rebuilds the rollups from the raw tables
+    and then every ranking, which also picks up deleted or edited rows.
+    """
+    counts = {'ratings': 0, 'reviews': 0}
+    if full:
+        counts.update(backfill_rollups(settle_seconds=settle_seconds, batch_size=batch_size))
+    with transaction.atomic():
+        high, deltas = refresh_rollups(now, settle_seconds, batch_size)
+        rated, reviewed = set(), set()
+        for (movie_id, _), delta in deltas.items():
+            counts['ratings'] += delta['rating_count']
+            counts['reviews'] += delta['review_count']
+            if delta['rating_count']:
+                rated.add(movie_id)
+            if delta['review_count']:
+                reviewed.add(movie_id)
+        if full:
+            MovieRanking.objects.all().delete()
+            rated = set(Movie.objects.filter(rating_count__gt=0).values_list('id', flat=True))
+            reviewed = set(
+                MovieDailyStats.objects.filter(review_count__gt=0).values_list('movie_id', flat=True).distinct()
+            )
+
+        today = timezone.localdate(high)
+        recent = defaultdict(list)
+        for movie_id, day, count in MovieDailyStats.objects.filter(
+            day__gt=today - timedelta(days=settings.TRENDING_WINDOW_DAYS), rating_count__gt=0,
+        ).values_list('movie_id', 'day', 'rating_count'):
+            recent[movie_id].append((day, count))
+        trending = {
+            movie_id: trending_score(days, today, settings.TRENDING_HALF_LIFE_DAYS)
+            for movie_id, days in recent.items()
+        }
+
+        stale_trending = MovieRanking.objects.filter(trending_score__gt=0).values_list('movie_id', flat=True)
+        movie_ids = rated | reviewed | set(trending) | set(stale_trending)
+        rankings = MovieRanking.objects.in_bulk(movie_ids)
+        review_counts = dict(
+            MovieDailyStats.objects.filter(movie_id__in=reviewed)
+            .values_list('movie_id').annotate(total=Sum('review_count')).order_by()
+        )
+        rows = []
+        for movie_id in movie_ids:
+            ranking = rankings.get(movie_id) or MovieRanking(movie_id=movie_id)
+            if movie_id in review_counts:
+                ranking.review_count = review_counts[movie_id]
+            ranking.trending_score = trending.get(movie_id, 0.0)
+            rows.append(ranking)
+        MovieRanking.objects.bulk_create(
+            rows, batch_size=batch_size, update_conflicts=True, unique_fields=['movie'],
+            update_fields=['review_count', 'trending_score'],
+        )
+        totals = Movie.objects.aggregate(count=Sum('rating_count'), total=Sum('rating_sum'))
+        prior_mean = totals['total'] / totals['count'] if totals['count'] else 0.0
+        MovieRanking.objects.update(bayesian_rating=Subquery(
+            Movie.objects.filter(pk=OuterRef('movie_id'))
+            .values(score=bayesian_rating(prior_mean, settings.LEADERBOARD_PRIOR_RATINGS))
+        ))
+        invalidate_on_commit('leaderboards')
+    return {**counts, 'movies': len(rows), 'watermark': high}
+
+
+def leaderboard(kind, genre=None, limit=10):
+    """The top ``limit`` rankings of leaderboard ``kind``, optionally within a genre."""
+    field = LEADERBOARDS[kind]
+    rankings = (
+        MovieRanking.objects.select_related('movie')
+        .filter(**{f'{field}__gt': 0})
+        .order_by(f'-{field}', 'movie_id')
+    )
+    if genre is not None:
+        rankings = rankings.filter(movie__genres=genre)
+    return list(rankings[:limit])
+
@@ -0,0 +1,103 @@
+import csv
+import io
+import json
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.cache import patch_vary_headers
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+# Optional accelerators: orjson for JSON, msgpack for the MessagePack format.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+_encoder = JSONEncoder()
+
+
+def dumps_json(data):
+    """
+    Compact UTF-8 JSON bytes, with orjson when it is installed. Values
+    orjson does not handle natively, and datetimes, are converted as DRF's
+    JSONRenderer would, so both produce the same document.
+    """
+    if orjson is not None:
+        content = orjson.dumps(
+            data, default=_encoder.default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME,
+        )
+    else:
+        content = json.dumps(data, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':')).encode()
+    # Like DRF, escape the two line terminators that are valid JSON but not JavaScript.
+    return content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+def _vary_on_accept(renderer_context):
+    # JSON and MessagePack share URLs, ETags and response cache entries.
+    response = (renderer_context or {}).get('response')
+    if response is not None and msgpack is not None:
+        patch_vary_headers(response, ('Accept',))
+
+
+class FastJSONRenderer(JSONRenderer):
+    """DRF's JSONRenderer, encoding with orjson when available (see dumps_json)."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        _vary_on_accept(renderer_context)
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type or '', renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps_json(data)
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Renders to MessagePack (Accept: application/msgpack or ?format=msgpack); requires msgpack."""
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        _vary_on_accept(renderer_context)
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=_encoder.default, use_bin_type=True)
+
+
+class NDJSONRenderer(BaseRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        rows = data if isinstance(data, list) else [data]
+        return ''.join(self.encode_row(row) for row in rows).encode(self.charset)
+
+    @staticmethod
+    def encode_row(row):
+        return json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+class CSVRenderer(BaseRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        rows = data if isinstance(data, list) else [data]
+        if not rows:
+            return b''
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        header = list(rows[0].keys())
+        writer.writerow(header)
+        writer.writerows([row.get(field) for field in header] for row in rows)
+        return buffer.getvalue().encode(self.charset)
@@ -0,0 +1,250 @@
+from collections import Counter, defaultdict
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Min, Q, Sum
+from django.db.models.functions import TruncDate, TruncWeek
+from django.utils import timezone
+from .cache import invalidate_on_commit
+from .models import (
+    Genre, GenreDailyStats, Movie, MovieDailyStats, MovieGenre, Rating, Review, Sentiment, Watermark,
+)
+
+WATERMARK = 'rollups'
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+STARS_FIELDS = {stars: f'stars_{stars}_count' for stars in range(1, 6)}
+SENTIMENT_FIELDS = {sentiment.value: f'{sentiment.name.lower()}_count' for sentiment in Sentiment}
+COUNT_FIELDS = ('rating_count', *STARS_FIELDS.values(), 'review_count', *SENTIMENT_FIELDS.values())
+
+# Analytics resource -> (model, its rollup model, the rollup's key field)
+ROLLUPS = {
+    'movies': (Movie, MovieDailyStats, 'movie'),
+    'genres': (Genre, GenreDailyStats, 'genre'),
+}
+
+
+def count_rows(window):
+    """Counter deltas per (movie_id, day) for the ratings and reviews matching ``window``."""
+    deltas = defaultdict(Counter)
+    ratings = (
+        Rating.objects.filter(window)
+        .annotate(day=TruncDate('created_at'))
+        .values_list('movie_id', 'day', 'stars')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+    for movie_id, day, stars, count in ratings:
+        deltas[movie_id, day].update({'rating_count': count, STARS_FIELDS[stars]: count})
+    reviews = (
+        Review.objects.filter(window)
+        .annotate(day=TruncDate('created_at'))
+        .values_list('movie_id', 'day', 'sentiment')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+    for movie_id, day, sentiment, count in reviews:
+        deltas[movie_id, day]['review_count'] += count
+        if sentiment in SENTIMENT_FIELDS:
+            deltas[movie_id, day][SENTIMENT_FIELDS[sentiment]] += count
+    return deltas
+
+
+def genre_deltas(movie_deltas):
+    genres = defaultdict(list)
+    for movie_id, genre_id in MovieGenre.objects.filter(
+        movie_id__in={movie_id for movie_id, _ in movie_deltas}
+    ).values_list('movie_id', 'genre_id'):
+        genres[movie_id].append(genre_id)
+    deltas = defaultdict(Counter)
+    for (movie_id, day), delta in movie_deltas.items():
+        for genre_id in genres[movie_id]:
+            deltas[genre_id, day].update(delta)
+    return deltas
+
+
+def lock_stats(model, key, pairs):
+    """The ``model`` rows of these (key id, day) pairs, locked in key order, by pair."""
+    key_ids = defaultdict(set)
+    for key_id, day in pairs:
+        key_ids[day].add(key_id)
+    # Only these rows, not every key on every day.
+    query = Q()
+    for day, ids in key_ids.items():
+        query |= Q(day=day, **{f'{key}_id__in': ids})
+    return {
+        (getattr(row, f'{key}_id'), row.day): row
+        for row in model.objects.filter(query).order_by(key, 'day').select_for_update()
+    }
+
+
+def add_stats(model, key, deltas, batch_size=1000):
+    """
+    Add ``deltas`` ({(key id, day): Counter}) to the ``model`` rollup rows,
+    creating missing ones. Only the rows being added to are locked, so
+    writers of other (key id, day) rows do not wait.
+    """
+    if not deltas:
+        return
+    existing = lock_stats(model, key, deltas)
+    missing = sorted(pair for pair in deltas if pair not in existing)
+    if missing:
+        model.objects.bulk_create(
+            [model(**{f'{key}_id': key_id}, day=day) for key_id, day in missing],
+            batch_size=batch_size, ignore_conflicts=True,
+        )
+        existing.update(lock_stats(model, key, missing))
+    rows = []
+    for (key_id, day), delta in deltas.items():
+        row = existing[key_id, day]
+        for field, amount in delta.items():
+            setattr(row, field, getattr(row, field) + amount)
+        rows.append(row)
+    model.objects.bulk_create(
+        rows, batch_size=batch_size, update_conflicts=True,
+        unique_fields=[key, 'day'], update_fields=list(COUNT_FIELDS),
+    )
+
+
+def fold(deltas, batch_size=1000):
+    add_stats(MovieDailyStats, 'movie', deltas, batch_size)
+    add_stats(GenreDailyStats, 'genre', genre_deltas(deltas), batch_size)
+    invalidate_on_commit('analytics')
+
+
+def lock_watermark():
+    # Refreshes, backfills and changes to reviews past the watermark hold
+    # this row lock, which serializes them.
+    Watermark.objects.get_or_create(name=WATERMARK, defaults={'created_at': EPOCH})
+    return Watermark.objects.select_for_update().get(name=WATERMARK)
+
+
+def start_of_day(day):
+    return datetime.combine(day, time.min, tzinfo=timezone.get_current_timezone())
+
+
+def refresh_rollups(now=None, settle_seconds=None, batch_size=1000):
+    """
+    Fold the ratings and reviews created since the last run into the rollups.
+
+    Only rows with created_at after the watermark are read. Rows younger
+    than ``settle_seconds`` are left for the next run, so that transactions
+    still in flight are not skipped. Returns the new watermark and the
+    per-(movie, day) deltas that were folded in.
+    """
+    now = now or timezone.now()
+    if settle_seconds is None:
+        settle_seconds = settings.ROLLUP_SETTLE_SECONDS
+    with transaction.atomic():
+        watermark = lock_watermark()
+        high = max(now - timedelta(seconds=settle_seconds), watermark.created_at)
+        deltas = count_rows(Q(created_at__gt=watermark.created_at, created_at__lte=high))
+        fold(deltas, batch_size)
+        watermark.created_at = high
+        watermark.save(update_fields=['created_at'])
+    return high, deltas
+
+
+def backfill_rollups(start=None, end=None, chunk_days=7, settle_seconds=None, batch_size=1000, log=None):
+    """
+    Rebuild the rollups of days ``start`` through ``end`` (default: all of
+    them) from the raw tables, one transaction per ``chunk_days`` days.
+
+    Rows past the watermark are left to refresh_rollups(). On a database
+    that was never refreshed, the watermark is first set to the present, so
+    the backfill covers the history and refreshes continue from there.
+    Deleted and edited rows, which refreshes do not see, are accounted for.
+    """
+    log = log or (lambda message: None)
+    if settle_seconds is None:
+        settle_seconds = settings.ROLLUP_SETTLE_SECONDS
+    with transaction.atomic():
+        watermark = lock_watermark()
+        if watermark.created_at == EPOCH:
+            watermark.created_at = timezone.now() - timedelta(seconds=settle_seconds)
+            watermark.save(update_fields=['created_at'])
+    if start is None:
+        firsts = [
+            model.objects.aggregate(first=Min('created_at'))['first'] for model in (Rating, Review)
+        ]
+        start = timezone.localdate(min((first for first in firsts if first), default=watermark.created_at))
+    end = end or timezone.localdate(watermark.created_at)
+    totals = Counter()
+    day = start
+    while day <= end:
+        last = min(day + timedelta(days=chunk_days - 1), end)
+        with transaction.atomic():
+            watermark = lock_watermark()
+            MovieDailyStats.objects.filter(day__range=(day, last)).delete()
+            GenreDailyStats.objects.filter(day__range=(day, last)).delete()
+            deltas = count_rows(Q(
+                created_at__gte=start_of_day(day),
+                created_at__lt=start_of_day(last + timedelta(days=1)),
+                created_at__lte=watermark.created_at,
+            ))
+            fold(deltas, batch_size)
+        for delta in deltas.values():
+            totals.update(ratings=delta['rating_count'], reviews=delta['review_count'])
+        log(f'Rolled up {day} to {last}.')
+        day = last + timedelta(days=1)
+    return totals
+
+
+def apply_sentiment_changes(changes):
+    """
+    Move relabelled reviews between the sentiment counters.
+
+    ``changes`` are (movie_id, created_at, old label, new label) tuples.
+    Call it in the transaction that updates the reviews: reviews past the
+    watermark are skipped, as the next refresh counts their new label.
+    Only changes to such recent reviews take the watermark lock, so that a
+    refresh cannot count them in between; the rest just lock their rollup
+    rows, and concurrent callers do not wait for each other.
+    """
+    if not changes:
+        return
+    with transaction.atomic():
+        # The watermark only moves forward: reviews behind it stay counted.
+        watermark = refreshed_through()
+        if watermark is None or any(created_at > watermark for _, created_at, _, _ in changes):
+            watermark = lock_watermark().created_at
+        deltas = defaultdict(Counter)
+        for movie_id, created_at, old, new in changes:
+            if created_at > watermark or old == new:
+                continue
+            delta = deltas[movie_id, timezone.localdate(created_at)]
+            if old in SENTIMENT_FIELDS:
+                delta[SENTIMENT_FIELDS[old]] -= 1
+            if new in SENTIMENT_FIELDS:
+                delta[SENTIMENT_FIELDS[new]] += 1
+        fold(deltas)
+
+
+def rollup_series(model, start, end, granularity='day', **filters):
+    """
+    Summed rollup counters of the ``model`` rows matching ``filters`` per
+    day, or per week (starting on Monday), from ``start`` through ``end``.
+    Buckets without activity are included with zero counts.
+    """
+    rows = model.objects.filter(**filters)
+    if granularity == 'week':
+        start -= timedelta(days=start.weekday())
+        step = timedelta(days=7)
+        rows = rows.annotate(bucket=TruncWeek('day'))
+    else:
+        step = timedelta(days=1)
+        rows = rows.annotate(bucket=F('day'))
+    # Annotations may not reuse the model's field names.
+    sums = rows.filter(day__range=(start, end)).values('bucket').annotate(
+        **{f'total_{field}': Sum(field) for field in COUNT_FIELDS}
+    ).order_by()
+    totals = {row['bucket']: {field: row[f'total_{field}'] for field in COUNT_FIELDS} for row in sums}
+    empty = dict.fromkeys(COUNT_FIELDS, 0)
+    buckets = []
+    while start <= end:
+        buckets.append({'start': start, **totals.get(start, empty)})
+        start += step
+    return buckets
+
+
+def refreshed_through():
+    return Watermark.objects.filter(name=WATERMARK).values_list('created_at', flat=True).first()
@@ -0,0 +1,93 @@
+import random
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.functional import SimpleLazyObject, empty
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# The request being served, set by api.middleware.ReplicaRoutingMiddleware.
+_current_request = ContextVar('api_routing_request', default=None)
+
+
+def begin_request(request):
+    return _current_request.set(request)
+
+
+def end_request(token):
+    _current_request.reset(token)
+
+
+def _pin_key(user_id):
+    return f'api:primary-pin:{user_id}'
+
+
+def request_user_id(request):
+    """The id of the request's user, or None while it is unknown; never queries for it."""
+    user = request.__dict__.get('user')
+    if isinstance(user, SimpleLazyObject) and user._wrapped is empty:
+        # AuthenticationMiddleware's lazy session user; DRF replaces it once it authenticates.
+        return None
+    return getattr(user, 'pk', None)
+
+
+def pin_to_primary(user_id):
+    """Send the user's reads to the primary for DB_REPLICA_PIN_SECONDS."""
+    caches['default'].set(_pin_key(user_id), True, settings.DB_REPLICA_PIN_SECONDS)
+
+
+def is_pinned(request):
+    pinned = getattr(request, '_primary_pinned', None)
+    if pinned is None:
+        user_id = request_user_id(request)
+        if user_id is None:
+            return False
+        pinned = request._primary_pinned = bool(caches['default'].get(_pin_key(user_id)))
+    return pinned
+
+
+def read_from_replica(request):
+    """Whether reads made while serving ``request`` went to a replica."""
+    return getattr(request, '_db_replica', None) is not None
+
+
+def finish_request(request, response):
+    if request.method not in SAFE_METHODS and response.status_code < 400:
+        user_id = request_user_id(request)
+        if user_id is not None:
+            pin_to_primary(user_id)
+
+
+class PrimaryReplicaRouter:
+    """
+    Sends the reads of GET, HEAD and OPTIONS requests to one of the
+    DATABASE_REPLICAS, picked per request, and everything else to the
+    primary: writes, reads in other requests, transactions, management
+    commands and workers. A user who has just written through the API reads
+    from the primary for DB_REPLICA_PIN_SECONDS, so replication lag never
+    hides their own writes from them.
+    """
+
+    def db_for_read(self, model, **hints):
+        request = _current_request.get()
+        if (
+            request is None or request.method not in SAFE_METHODS
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block or is_pinned(request)
+        ):
+            return DEFAULT_DB_ALIAS
+        replica = getattr(request, '_db_replica', None)
+        if replica is None:
+            replica = request._db_replica = random.choice(settings.DATABASE_REPLICAS)
+        return replica
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get the schema through replication.
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,187 @@
+import math
+import re
+import threading
+from collections import defaultdict
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.core.signals import setting_changed
+from django.db import connection, transaction
+from django.db.models import Count, F, Sum
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from .models import Movie, MovieSearchTerm, Review, ReviewSearchTerm
+from .utils import chunked
+
+SEARCH_MODELS = {'movies': Movie, 'reviews': Review}
+
+# Text fields indexed per kind, with their weight. Letters and weights follow
+# PostgreSQL's ts_rank defaults (A = 1.0, B = 0.4) so both backends rank alike.
+SEARCH_FIELDS = {
+    'movies': [('title', 'A', 1.0), ('description', 'B', 0.4)],
+    'reviews': [('review_text', 'A', 1.0)],
+}
+
+TOKEN_RE = re.compile(r"[^\W_]+(?:'[^\W_]+)*")
+STOP_WORDS = frozenset((
+    'a an and are as at be but by for from has have he her his i if in into is it its me my no nor '
+    'of on or our she so than that the their them then there these they this to was we were what '
+    'when which who will with you your'
+).split())
+MAX_TERM_LENGTH = 64
+
+
+def tokenize(text):
+    return [token[:MAX_TERM_LENGTH] for token in TOKEN_RE.findall(text.lower()) if token not in STOP_WORDS]
+
+
+def search_filters(kind, genre=None, year=None, sentiment=None, movie=None):
+    """Translate search parameters into ORM lookups on the searched model."""
+    prefix = '' if kind == 'movies' else 'movie__'
+    filters = {}
+    if genre is not None:
+        filters[f'{prefix}moviegenre__genre_id'] = genre
+    if year is not None:
+        filters[f'{prefix}release_year'] = year
+    if sentiment is not None:
+        filters['sentiment'] = sentiment
+    if movie is not None:
+        filters['movie_id'] = movie
+    return filters
+
+
+class SearchBackend:
+    """
+    Base class for search index backends.
+
+    ``index()`` (re)builds the entries of the given documents and
+    ``search()`` returns a queryset of ``(id, rank)`` pairs, best match
+    first, for the documents matching every word of ``text``.
+    """
+
+    def index(self, kind, ids):
+        raise NotImplementedError
+
+    def search(self, kind, text, filters):
+        raise NotImplementedError
+
+
+class PostgresSearchBackend(SearchBackend):
+    """Weighted ``tsvector`` columns on the movie and review rows, served by GIN indexes."""
+
+    def vector(self, kind):
+        vectors = [
+            SearchVector(field, weight=letter, config=settings.SEARCH_CONFIG)
+            for field, letter, _ in SEARCH_FIELDS[kind]
+        ]
+        vector = vectors[0]
+        for other in vectors[1:]:
+            vector = vector + other
+        return vector
+
+    def index(self, kind, ids):
+        SEARCH_MODELS[kind].objects.filter(pk__in=ids).update(search_vector=self.vector(kind))
+
+    def search(self, kind, text, filters):
+        query = SearchQuery(text, config=settings.SEARCH_CONFIG, search_type='websearch')
+        # Normalization 1 divides the rank by 1 + log(document length).
+        rank = SearchRank(F('search_vector'), query, normalization=1)
+        return (
+            SEARCH_MODELS[kind].objects.filter(search_vector=query, **filters)
+            .annotate(rank=rank)
+            .order_by('-rank', 'id')
+            .values_list('id', 'rank')
+        )
+
+
+class InvertedIndexSearchBackend(SearchBackend):
+    """
+    A term -> document postings table for databases without full-text search.
+
+    Each posting stores the term's weight in the document: the weight of
+    the best field it appears in, damped by 1 + log(tf) and normalized by
+    1 + log(document length). A query ANDs its terms and ranks documents by their summed
+    weights, in a single grouped scan of the (term, document) index.
+    """
+    postings = {
+        'movies': (MovieSearchTerm, 'movie'),
+        'reviews': (ReviewSearchTerm, 'review'),
+    }
+
+    def term_weights(self, kind, document):
+        frequencies = defaultdict(float)
+        counts = defaultdict(int)
+        length = 0
+        for field, _, weight in SEARCH_FIELDS[kind]:
+            for term in tokenize(document[field] or ''):
+                frequencies[term] = max(frequencies[term], weight)
+                counts[term] += 1
+                length += 1
+        norm = 1 + math.log(length) if length else 1
+        return {term: weight * (1 + math.log(counts[term])) / norm for term, weight in frequencies.items()}
+
+    def index(self, kind, ids):
+        model, field = self.postings[kind]
+        text_fields = [name for name, _, _ in SEARCH_FIELDS[kind]]
+        documents = SEARCH_MODELS[kind].objects.filter(pk__in=ids).values('id', *text_fields)
+        postings = [
+            (document['id'], term, weight)
+            for document in documents
+            for term, weight in self.term_weights(kind, document).items()
+        ]
+        # Postings are plain tuples written with executemany(); building a
+        # model instance per posting costs more than the insert itself.
+        quote = connection.ops.quote_name
+        insert = (
+            f'INSERT INTO {quote(model._meta.db_table)} ({quote(field + "_id")}, {quote("term")}, {quote("weight")}) '
+            'VALUES (%s, %s, %s)'
+        )
+        with transaction.atomic():
+            model.objects.filter(**{f'{field}_id__in': ids}).delete()
+            with connection.cursor() as cursor:
+                cursor.executemany(insert, postings)
+
+    def search(self, kind, text, filters):
+        model, field = self.postings[kind]
+        terms = sorted(set(tokenize(text)))
+        if not terms:
+            return model.objects.none().values_list(f'{field}_id', 'weight')
+        return (
+            model.objects.filter(term__in=terms, **{f'{field}__{lookup}': value for lookup, value in filters.items()})
+            .values(f'{field}_id')
+            .annotate(matched=Count('term'), rank=Sum('weight'))
+            .filter(matched=len(terms))
+            .order_by('-rank', f'{field}_id')
+            .values_list(f'{field}_id', 'rank')
+        )
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_search_backend():
+    """Return the backend configured by ``SEARCH_BACKEND``, or the default for the database."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                path = settings.SEARCH_BACKEND or (
+                    'api.search.PostgresSearchBackend' if connection.vendor == 'postgresql'
+                    else 'api.search.InvertedIndexSearchBackend'
+                )
+                _backend = import_string(path)()
+    return _backend
+
+
+@receiver(setting_changed)
+def reset_search_backend(setting, **kwargs):
+    global _backend
+    if setting.startswith('SEARCH_'):
+        _backend = None
+
+
+def index_documents(kind, ids):
+    """Index ``ids`` in batches of ``SEARCH_INDEX_BATCH_SIZE``."""
+    backend = get_search_backend()
+    for chunk in chunked(ids, settings.SEARCH_INDEX_BATCH_SIZE):
+        backend.index(kind, chunk)
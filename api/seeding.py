@@ -0,0 +1,206 @@
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from io import StringIO
+from itertools import accumulate
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import transaction
+from django.utils import timezone
+from .models import Genre, Movie, MovieGenre, Rating, Review
+from .sentiment import classify_many
+
+GENRE_NAMES = [
+    'Action', 'Adventure', 'Animation', 'Comedy', 'Crime', 'Documentary', 'Drama', 'Family',
+    'Fantasy', 'History', 'Horror', 'Music', 'Mystery', 'Romance', 'Science Fiction', 'Thriller',
+    'War', 'Western',
+]
+TITLE_ADJECTIVES = [
+    'Silent', 'Last', 'Broken', 'Golden', 'Hidden', 'Midnight', 'Crimson', 'Lost', 'Electric',
+    'Endless', 'Frozen', 'Wild', 'Secret', 'Distant', 'Burning',
+]
+TITLE_NOUNS = [
+    'River', 'Empire', 'Garden', 'Signal', 'Horizon', 'Kingdom', 'Harbor', 'Witness', 'Machine',
+    'Summer', 'Frontier', 'Letter', 'Voyage', 'Storm', 'Station',
+]
+DESCRIPTION_TEMPLATES = [
+    'A {adjective} story about a {role} who must face the {noun} before it is too late.',
+    'When a {role} discovers the {noun}, nothing in the small town stays the same.',
+    'Two strangers, a {role} and a drifter, cross paths on the way to the {noun}.',
+]
+ROLES = ['detective', 'teacher', 'pilot', 'young mother', 'retired boxer', 'scientist', 'musician']
+
+# Review sentences by tone. Reviews mix an opener, one or two remarks and
+# usually a closer, so the text varies the way real reviews do.
+REVIEW_OPENERS = {
+    'positive': ['Loved it.', 'What a film.', 'I was pleasantly surprised.', 'Easily one of my favorites.'],
+    'negative': ['What a letdown.', 'I wanted to like this.', 'Hard to sit through.', 'Not worth the ticket.'],
+    'mixed': ['Watched it last weekend.', 'Hard to say.', 'It has its moments.', 'Saw it with friends.'],
+}
+REVIEW_REMARKS = {
+    'positive': [
+        'The acting is superb and the cast has real chemistry.',
+        'A beautiful score and stunning cinematography.',
+        'The plot is clever and the pacing never drags.',
+        'Funny, moving and surprisingly deep.',
+        'The ending is perfect.',
+    ],
+    'negative': [
+        'The plot is boring and predictable.',
+        'The dialogue is awful and the acting is weak.',
+        'Far too long, with terrible pacing.',
+        'The jokes fall flat and the characters are dull.',
+        'A messy script and a disappointing ending.',
+    ],
+    'mixed': [
+        'The first half works, the second half does not.',
+        'Great visuals, but the story is thin.',
+        'Some scenes are brilliant and some are forgettable.',
+        'The lead is good, the rest of the cast less so.',
+    ],
+}
+REVIEW_CLOSERS = {
+    'positive': ['Highly recommended!', 'I will watch it again.', 'Go see it.'],
+    'negative': ['Skip it.', 'I would not recommend it.', 'Disappointing.'],
+    'mixed': ['Worth a look on a slow night.', 'Your mileage may vary.', 'Fine for a rainy day.'],
+}
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """Let bulk_create() keep the created_at values we generate instead of now()."""
+    fields = [model._meta.get_field('created_at') for model in models]
+    try:
+        for field in fields:
+            field.auto_now_add = False
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def zipf_weights(count, skew):
+    """Cumulative weights for picking from ``count`` items with a Zipf(skew) long tail."""
+    return list(accumulate(1 / (rank + 1) ** skew for rank in range(count)))
+
+
+def review_text(rng, quality):
+    """A review whose tone follows the movie's quality on the 1-5 scale."""
+    draw = rng.random()
+    positive = (quality - 1) / 4
+    tone = 'positive' if draw < positive * 0.85 else 'negative' if draw > 1 - (1 - positive) * 0.85 else 'mixed'
+    sentences = [rng.choice(REVIEW_OPENERS[tone])]
+    sentences.extend(rng.sample(REVIEW_REMARKS[tone], rng.randint(1, 2)))
+    if rng.random() < 0.7:
+        sentences.append(rng.choice(REVIEW_CLOSERS[tone]))
+    return ' '.join(sentences)
+
+
+def seed_dataset(movies=1000, genres=18, users=1000, reviews=100000, ratings=100000,
+                 days=365, seed=0, batch_size=5000, skew=1.0, password=None, log=None):
+    """
+    Bulk-insert a synthetic dataset and rebuild the derived data.
+
+    Movie popularity and user activity follow Zipf distributions with
+    exponent ``skew``, so a few movies draw most reviews and ratings like in
+    production. Every movie gets a hidden quality that drives its star
+    ratings and the tone of its reviews, which are labelled by the
+    configured sentiment analyzer. Seeded users share ``password``.
+    """
+    rng = random.Random(seed)
+    log = log or (lambda message: None)
+    now = timezone.now()
+    tag = f'{seed}-{int(now.timestamp())}'
+
+    def moment():
+        return now - timedelta(seconds=rng.randrange(days * 86400))
+
+    names = [
+        GENRE_NAMES[index] if index < len(GENRE_NAMES) else f'{GENRE_NAMES[index % len(GENRE_NAMES)]} {index}'
+        for index in range(genres)
+    ]
+    Genre.objects.bulk_create([Genre(name=name) for name in names], ignore_conflicts=True)
+    genre_objs = list(Genre.objects.filter(name__in=names))
+    # Genres are unequally popular too.
+    genre_weights = zipf_weights(len(genre_objs), 0.8)
+    hashed = make_password(password)
+    user_objs = User.objects.bulk_create(
+        [User(username=f'seed-{tag}-{index}', password=hashed) for index in range(users)],
+        batch_size=batch_size,
+    )
+    with explicit_timestamps(Movie, Review, Rating):
+        movie_objs = Movie.objects.bulk_create(
+            [
+                Movie(
+                    title=f'The {rng.choice(TITLE_ADJECTIVES)} {rng.choice(TITLE_NOUNS)}'
+                          + (f' {rng.randint(2, 4)}' if rng.random() < 0.1 else ''),
+                    release_year=1950 + round(75 * rng.betavariate(3, 1.2)),
+                    description=rng.choice(DESCRIPTION_TEMPLATES).format(
+                        adjective=rng.choice(TITLE_ADJECTIVES).lower(),
+                        noun=rng.choice(TITLE_NOUNS).lower(),
+                        role=rng.choice(ROLES),
+                    ),
+                    created_at=moment(),
+                )
+                for _ in range(movies)
+            ],
+            batch_size=batch_size,
+        )
+        log(f'Created {len(genre_objs)} genres, {len(user_objs)} users, {len(movie_objs)} movies.')
+        MovieGenre.objects.bulk_create(
+            [
+                MovieGenre(movie=movie, genre=genre)
+                for movie in movie_objs
+                for genre in {
+                    *rng.choices(genre_objs, cum_weights=genre_weights, k=rng.randint(1, 3))
+                }
+            ],
+            batch_size=batch_size,
+        )
+
+        quality = {movie.id: min(5.0, max(1.0, rng.gauss(3.4, 0.8))) for movie in movie_objs}
+        # Popularity rank is independent of creation order.
+        popular = rng.sample(movie_objs, len(movie_objs))
+        movie_weights = zipf_weights(len(popular), skew)
+        active = rng.sample(user_objs, len(user_objs))
+        user_weights = zipf_weights(len(active), skew)
+
+        for start in range(0, reviews, batch_size):
+            size = min(batch_size, reviews - start)
+            picked = rng.choices(popular, cum_weights=movie_weights, k=size)
+            texts = [review_text(rng, quality[movie.id]) for movie in picked]
+            authors = rng.choices(active, cum_weights=user_weights, k=size)
+            with transaction.atomic():
+                Review.objects.bulk_create([
+                    Review(movie=movie, user=user, review_text=text, sentiment=label, created_at=moment())
+                    for movie, user, text, label in zip(picked, authors, texts, classify_many(texts))
+                ])
+            log(f'Reviews: {start + size}/{reviews}')
+
+        ratings = min(ratings, len(movie_objs) * len(user_objs))
+        seen = set()
+        created = 0
+        while created < ratings:
+            size = min(batch_size, ratings - created)
+            batch = []
+            # Popular pairs repeat often; keep drawing until the batch is full of new ones.
+            while len(batch) < size:
+                movie = rng.choices(popular, cum_weights=movie_weights)[0]
+                user = rng.choices(active, cum_weights=user_weights)[0]
+                if len(seen) > 0.9 * len(movie_objs) * len(user_objs):
+                    movie, user = rng.choice(movie_objs), rng.choice(user_objs)
+                if (movie.id, user.id) in seen:
+                    continue
+                seen.add((movie.id, user.id))
+                stars = min(5, max(1, round(rng.gauss(quality[movie.id], 1.0))))
+                batch.append(Rating(movie=movie, user=user, stars=stars, created_at=moment()))
+            Rating.objects.bulk_create(batch)
+            created += len(batch)
+            log(f'Ratings: {created}/{ratings}')
+    for command, options in (
+        ('rebuild_rating_aggregates', {}), ('rebuild_search_index', {}), ('refresh_rankings', {'full': True}),
+    ):
+        output = StringIO()
+        call_command(command, stdout=output, **options)
+        log(output.getvalue().strip())
@@ -0,0 +1,317 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+import numpy as np
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from .metrics import time_sentiment
+from .models import Sentiment
+
+
+# Anything that may be part of an emoticon. TextBlob matches emoticons case
+# sensitively (':D' scores, ':d' does not), so such texts keep their case.
+EMOTICON_CHARACTERS = re.compile(r'[:;=<>*°♥]|x-?d|o[._]o|8-?[d)]', re.IGNORECASE)
+
+
+def normalize_text(text):
+    text = ' '.join(text.split())
+    return text if EMOTICON_CHARACTERS.search(text) else text.lower()
+
+
+def text_key(text):
+    return hashlib.blake2b(normalize_text(text).encode(), digest_size=16).digest()
+
+
+class PolarityCache:
+    """A thread-safe LRU mapping of normalized-text hash to polarity."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._data:
+                    self._data.move_to_end(key)
+                    found[key] = self._data[key]
+        return found
+
+    def set_many(self, items):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            for key, value in items:
+                self._data[key] = value
+                self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SentimentAnalyzer:
+    """
+    Base class for sentiment backends.
+
+    Subclasses implement ``polarity_batch()``, returning one polarity in
+    [-1, 1] per text. Labelling, thresholds and caching live here, so every
+    backend gets them for free.
+    """
+
+    def __init__(self, positive_threshold=None, negative_threshold=None, cache_size=None):
+        self.positive_threshold = (
+            settings.SENTIMENT_POSITIVE_THRESHOLD if positive_threshold is None else positive_threshold
+        )
+        self.negative_threshold = (
+            settings.SENTIMENT_NEGATIVE_THRESHOLD if negative_threshold is None else negative_threshold
+        )
+        self.cache = PolarityCache(settings.SENTIMENT_CACHE_SIZE if cache_size is None else cache_size)
+
+    def load(self):
+        """Load any lexicons or models up front. Safe to call more than once."""
+
+    def polarity_batch(self, texts):
+        raise NotImplementedError
+
+    def label(self, polarity):
+        if polarity > self.positive_threshold:
+            return Sentiment.POSITIVE.value
+        if polarity < self.negative_threshold:
+            return Sentiment.NEGATIVE.value
+        return Sentiment.NEUTRAL.value
+
+    def polarities(self, texts):
+        keys = [text_key(text) for text in texts]
+        cached = self.cache.get_many(keys)
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+        if missing:
+            scores = self.polarity_batch(list(missing.values()))
+            computed = list(zip(missing.keys(), (float(score) for score in scores)))
+            self.cache.set_many(computed)
+            cached.update(computed)
+        return [cached[key] for key in keys]
+
+    def classify_batch(self, texts):
+        return [self.label(polarity) for polarity in self.polarities(texts)]
+
+    def classify(self, text):
+        return self.classify_batch([text])[0]
+
+
+class TextBlobSentimentAnalyzer(SentimentAnalyzer):
+    """Scores each text with ``TextBlob(text).sentiment.polarity``."""
+
+    def load(self):
+        from textblob.en import sentiment
+        len(sentiment)  # Forces the lazy lexicon to load.
+
+    def polarity_batch(self, texts):
+        from textblob import TextBlob
+        return np.array([TextBlob(text).sentiment.polarity for text in texts], dtype=np.float64)
+
+
+class LexiconSentimentAnalyzer(SentimentAnalyzer):
+    """
+    A vectorized reimplementation of TextBlob's pattern polarity scorer.
+
+    Texts are tokenized with TextBlob's tokenizer and mapped onto its
+    sentiment lexicon. Modifier chaining ("very good"), negation ("not
+    good"), exclamation boosts and averaging are then evaluated for the
+    whole batch at once with NumPy array operations. The few constructs
+    that need pattern's sequential state machine (emoticons, the "(!)"
+    irony mark, and a negation directly after an "-ly" modifier) are
+    routed to TextBlob itself, so labels agree with TextBlob.
+    """
+    NEGATIONS = frozenset(('no', 'not', "n't", 'never'))
+
+    # Per-token flags for words outside the lexicon.
+    NEGATION = 1
+    RESETS_NEGATION = 2
+    RESETS_MODIFIER = 4
+    EXCLAMATION = 8
+    NEEDS_PATTERN = 16
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    def load(self):
+        with self._lock:
+            if self._loaded:
+                return
+            from textblob._text import EMOTICONS, PUNCTUATION
+            from textblob.en import sentiment
+            len(sentiment)
+            words = list(dict.keys(sentiment))
+            self._vocabulary = {word: index for index, word in enumerate(words)}
+            scores = np.array([dict.__getitem__(sentiment, word)[None] for word in words], dtype=np.float64)
+            self._polarity = scores[:, 0]
+            self._intensity = scores[:, 2]
+            self._is_modifier = np.array(['RB' in dict.__getitem__(sentiment, word) for word in words])
+            self._ends_with_ly = np.array([word.endswith('ly') for word in words])
+            self._emoticons = {e.lower() for group in EMOTICONS.values() for e in group}
+            self._punctuation = PUNCTUATION
+            self._pattern = sentiment
+            self._token_codes = {}
+            self._loaded = True
+
+    def _token_code(self, token):
+        code = self._token_codes.get(token)
+        if code is None:
+            index = self._vocabulary.get(token)
+            if index is not None:
+                code = (index, 0)
+            else:
+                flags = 0
+                if token in self.NEGATIONS:
+                    flags |= self.NEGATION
+                elif len(token.strip("'")) > 1:
+                    flags |= self.RESETS_NEGATION
+                if len(token) > 2:
+                    flags |= self.RESETS_MODIFIER
+                if token == '!':
+                    flags |= self.EXCLAMATION
+                if token == '(!)' or (
+                    not token.isalpha() and len(token) <= 5
+                    and token not in self._punctuation and token in self._emoticons
+                ):
+                    flags |= self.NEEDS_PATTERN
+                code = (-1, flags)
+            if len(self._token_codes) < 200000:
+                self._token_codes[token] = code
+        return code
+
+    def _encode(self, texts):
+        tokenize = self._pattern.tokenizer
+        vocab_ids, flags, doc_ids = [], [], []
+        for doc, text in enumerate(texts):
+            for token in ' '.join(tokenize(text)).split():
+                index, token_flags = self._token_code(token.lower())
+                vocab_ids.append(index)
+                flags.append(token_flags)
+                doc_ids.append(doc)
+        return (
+            np.array(vocab_ids, dtype=np.int64),
+            np.array(flags, dtype=np.int64),
+            np.array(doc_ids, dtype=np.int64),
+        )
+
+    @staticmethod
+    def _last_before(mask, doc_start):
+        """For each position, the index of the last True in ``mask`` strictly before it in the same text, else -1."""
+        positions = np.where(mask, np.arange(mask.size), -1)
+        last = np.maximum.accumulate(positions) if mask.size else positions
+        last = np.concatenate(([-1], last[:-1]))
+        return np.where(last >= doc_start, last, -1)
+
+    def polarity_batch(self, texts):
+        self.load()
+        polarity = np.zeros(len(texts), dtype=np.float64)
+        vocab_ids, flags, doc_ids = self._encode(texts)
+        if not vocab_ids.size:
+            return polarity
+
+        size = vocab_ids.size
+        doc_start = np.zeros(size, dtype=np.int64)
+        boundaries = np.flatnonzero(np.diff(doc_ids)) + 1
+        doc_start[boundaries] = boundaries
+        doc_start = np.maximum.accumulate(doc_start)
+
+        known = vocab_ids >= 0
+        safe_ids = np.where(known, vocab_ids, 0)
+        is_modifier = known & self._is_modifier[safe_ids]
+        negation = (flags & self.NEGATION) > 0
+        last_known = self._last_before(known, doc_start)
+        last_modifier_reset = self._last_before((flags & self.RESETS_MODIFIER) > 0, doc_start)
+        last_negation_event = self._last_before(negation | ((flags & self.RESETS_NEGATION) > 0), doc_start)
+
+        lk = np.where(last_known >= 0, last_known, 0)
+        modifier_active = (last_known >= 0) & is_modifier[lk] & (last_modifier_reset < last_known)
+        negation_active = (last_negation_event > last_known) & negation[np.maximum(last_negation_event, 0)]
+
+        fallback = np.zeros(len(texts), dtype=bool)
+        fallback[doc_ids[(flags & self.NEEDS_PATTERN) > 0]] = True
+        ly_negation = negation & modifier_active & self._ends_with_ly[vocab_ids[lk].clip(0)]
+        fallback[doc_ids[ly_negation]] = True
+
+        # Known words are assessed; a word following a modifier merges into the modifier's assessment.
+        word_polarity = self._polarity[safe_ids]
+        intensity = self._intensity[safe_ids]
+        intensity = np.where(negation_active & known, 1.0 / np.where(intensity == 0, 1.0, intensity), intensity)
+        merged = np.clip(word_polarity * intensity[lk], -1.0, 1.0)
+        word_polarity = np.where(modifier_active, merged, word_polarity)
+
+        assessed = np.flatnonzero(known)
+        starts = ~modifier_active[assessed]
+        group = np.cumsum(starts) - 1
+        group_count = int(group[-1]) + 1 if group.size else 0
+        group_of_token = np.full(size, -1, dtype=np.int64)
+        group_of_token[assessed] = group
+        group_last = np.zeros(group_count, dtype=np.int64)
+        group_last[group] = assessed  # Later tokens overwrite earlier ones.
+        group_negated = np.bincount(group, weights=negation_active[assessed], minlength=group_count) > 0
+        group_polarity = word_polarity[group_last]
+
+        # "!" boosts the assessment it follows, unless a later word merges into that assessment.
+        exclamations = np.flatnonzero(((flags & self.EXCLAMATION) > 0) & (last_known >= 0))
+        boosted = group_of_token[last_known[exclamations]]
+        boosted = boosted[group_last[boosted] == last_known[exclamations]]
+        boosts = np.bincount(boosted, minlength=group_count)
+        for step in range(int(boosts.max()) if boosts.size else 0):
+            group_polarity = np.where(boosts > step, np.clip(group_polarity * 1.25, -1.0, 1.0), group_polarity)
+        group_polarity = np.where(group_negated, group_polarity * -0.5, group_polarity)
+
+        group_doc = doc_ids[group_last]
+        totals = np.bincount(group_doc, weights=group_polarity, minlength=len(texts))
+        counts = np.bincount(group_doc, minlength=len(texts))
+        polarity = totals / np.maximum(counts, 1)
+
+        for doc in np.flatnonzero(fallback):
+            polarity[doc] = self._pattern(texts[doc])[0]
+        return polarity
+
+
+_analyzer = None
+_analyzer_lock = threading.Lock()
+
+
+def get_analyzer():
+    """Return the process-wide analyzer configured by ``SENTIMENT_ANALYZER``."""
+    global _analyzer
+    if _analyzer is None:
+        with _analyzer_lock:
+            if _analyzer is None:
+                analyzer = import_string(settings.SENTIMENT_ANALYZER)()
+                analyzer.load()
+                _analyzer = analyzer
+    return _analyzer
+
+
+@receiver(setting_changed)
+def reset_analyzer(setting, **kwargs):
+    global _analyzer
+    if setting.startswith('SENTIMENT_'):
+        _analyzer = None
+
+
+def classify(text):
+    return time_sentiment(get_analyzer().classify, text)
+
+
+def classify_many(texts):
+    return time_sentiment(get_analyzer().classify_batch, texts)
@@ -1,36 +1,268 @@
+from datetime import timedelta
+from functools import partial
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
 from rest_framework import serializers
-from django.db.models import Avg
-from .models import Movie, Genre, Review, Rating
+from rest_framework.permissions import SAFE_METHODS
+from .metrics import TimedSerializerMixin
+from .models import Movie, MovieRanking, MovieSimilarity, Genre, Review, Rating, Sentiment
 
-class GenreSerializer(serializers.ModelSerializer):
+class TimedListSerializer(TimedSerializerMixin, serializers.ListSerializer):
+    pass
+
+def _names(value):
+    return {name.strip() for name in value.split(',') if name.strip()} if value else set()
+
+def requested_fieldset(request):
+    """
+    The ?fields= and ?expand= names of a read request, as (fields, expand);
+    fields is None when every default field is wanted.
+    """
+    if request is None or request.method not in SAFE_METHODS:
+        return None, set()
+    params = getattr(request, 'query_params', request.GET)
+    return _names(params.get('fields')) or None, _names(params.get('expand'))
+
+def returned_fields(default_names, expandable, request):
+    """The names of the fields a response will carry, and which of them are expanded."""
+    fields, expand = requested_fieldset(request)
+    expanded = expand & set(expandable)
+    names = [name for name in default_names if fields is None or name == 'id' or name in fields]
+    names.extend(sorted(expanded - set(names)))
+    return names, expanded
+
+def fieldset_queryset(queryset, serializer_class, request):
+    """
+    Load what the request's fieldset needs: many-to-many fields are only
+    prefetched, and expanded foreign keys and the ones behind returned
+    ``source='relation.field'`` fields joined, when returned; text columns
+    that are not returned are deferred.
+    """
+    meta = serializer_class.Meta
+    names, expanded = returned_fields(meta.fields, getattr(meta, 'expandable', {}), request)
+    model_fields = {field.name: field for field in queryset.model._meta.get_fields()}
+    deferred = [
+        name for name in serializer_class.Meta.fields
+        if name not in names and isinstance(model_fields.get(name), models.TextField)
+    ]
+    prefetched = [name for name in names if getattr(model_fields.get(name), 'many_to_many', False)]
+    sources = [
+        (serializer_class._declared_fields[name].source or '').partition('.')[0]
+        for name in names if name in serializer_class._declared_fields
+    ]
+    joined = [
+        name for name in dict.fromkeys([*expanded, *sources])
+        if getattr(model_fields.get(name), 'many_to_one', False)
+    ]
+    if deferred:
+        queryset = queryset.defer(*deferred)
+    if prefetched:
+        queryset = queryset.prefetch_related(*prefetched)
+    if joined:
+        queryset = queryset.select_related(*joined)
+    return queryset
+
+class SparseFieldsetMixin:
+    """
+    Trims a read response to the ?fields= requested (``id`` is always kept)
+    and adds the ?expand= ones declared in Meta.expandable, a mapping of
+    field names to factories of the field that replaces or extends the
+    default one.
+
+    Fields are dropped before serialization, so method fields and relations
+    that are not returned cost nothing. Only the top-level serializer (or
+    the items of a top-level list) follows the query string; nested
+    serializers keep all their fields.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        root = self.parent if isinstance(self.parent, serializers.ListSerializer) else self
+        if root.parent is not None or self.context.get('request') is None:
+            return fields
+        expandable = getattr(getattr(self, 'Meta', None), 'expandable', {})
+        names, expanded = returned_fields(list(fields), expandable, self.context['request'])
+        for name in expanded:
+            fields[name] = expandable[name]()
+        return {name: fields[name] for name in names}
+
+class GenreSerializer(SparseFieldsetMixin, TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Genre
+        list_serializer_class = TimedListSerializer
         fields = ['id', 'name']
 
-class MovieSerializer(serializers.ModelSerializer):
+class MovieSummarySerializer(serializers.ModelSerializer):
+    """The movie of a review or rating, with ?expand=movie."""
+    class Meta:
+        model = Movie
+        fields = ['id', 'title', 'release_year']
+
+class MovieSerializer(SparseFieldsetMixin, TimedSerializerMixin, serializers.ModelSerializer):
     genres = GenreSerializer(many=True, read_only=True)
     average_rating = serializers.SerializerMethodField()
     class Meta:
         model = Movie
-        fields = ['id', 'title', 'release_year', 'description', 'genres', 'average_rating', 'created_at']
+        list_serializer_class = TimedListSerializer
+        fields = ['id', 'title', 'release_year', 'description', 'genres', 'average_rating', 'rating_count', 'created_at']
+        expandable = {
+            'rating_histogram': lambda: serializers.DictField(child=serializers.IntegerField(), read_only=True),
+        }
     def get_average_rating(self, obj):
-        avg = obj.ratings.aggregate(Avg('stars'))['stars__avg']
+        avg = obj.average_rating
         return round(avg, 2) if avg else 0
 
-class ReviewSerializer(serializers.ModelSerializer):
+class MovieBatchQuerySerializer(serializers.Serializer):
+    ids = serializers.CharField()
+    reviews = serializers.IntegerField(min_value=0, max_value=20, default=0)
+
+    max_ids = 200
+
+    def validate_ids(self, value):
+        try:
+            ids = [int(part) for part in value.split(',') if part.strip()]
+        except ValueError:
+            raise serializers.ValidationError('Expected comma-separated movie ids.')
+        # Duplicates are dropped; the first occurrence keeps its position.
+        ids = list(dict.fromkeys(ids))
+        if not ids:
+            raise serializers.ValidationError('Expected at least one movie id.')
+        if len(ids) > self.max_ids:
+            raise serializers.ValidationError(f'At most {self.max_ids} movie ids per request.')
+        return ids
+
+class MovieBatchSerializer(MovieSerializer):
+    rating_histogram = serializers.DictField(child=serializers.IntegerField(), read_only=True)
+    class Meta(MovieSerializer.Meta):
+        fields = MovieSerializer.Meta.fields + ['rating_histogram']
+        expandable = {}
+
+class MovieReviewsQuerySerializer(serializers.Serializer):
+    sentiment = serializers.ChoiceField(choices=[s.value for s in Sentiment], required=False)
+
+class ReviewSerializer(SparseFieldsetMixin, TimedSerializerMixin, serializers.ModelSerializer):
+    username = serializers.CharField(source='user.username', read_only=True)
     class Meta:
         model = Review
-        fields = ['id', 'movie', 'review_text', 'sentiment', 'created_at']
+        list_serializer_class = TimedListSerializer
+        fields = ['id', 'movie', 'username', 'review_text', 'sentiment', 'created_at']
         read_only_fields = ['user', 'sentiment', 'created_at']
+        expandable = {'movie': partial(MovieSummarySerializer, read_only=True)}
     def create(self, validated_data):
         validated_data['user'] = self.context['request'].user
         return super().create(validated_data)
 
-class RatingSerializer(serializers.ModelSerializer):
+class RatingSerializer(SparseFieldsetMixin, TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Rating
+        list_serializer_class = TimedListSerializer
         fields = ['id', 'movie', 'stars', 'created_at']
         read_only_fields = ['user']
+        expandable = {'movie': partial(MovieSummarySerializer, read_only=True)}
     def create(self, validated_data):
         validated_data['user'] = self.context['request'].user
-        return super().create(validated_data)
\ No newline at end of file
+        return super().create(validated_data)
+
+class RatingUpsertSerializer(serializers.Serializer):
+    stars = serializers.ChoiceField(choices=[(i, i) for i in range(1, 6)])
+
+class ReviewBulkRowSerializer(serializers.Serializer):
+    movie = serializers.IntegerField(min_value=1)
+    review_text = serializers.CharField()
+
+class RatingBulkRowSerializer(serializers.Serializer):
+    movie = serializers.IntegerField(min_value=1)
+    stars = serializers.ChoiceField(choices=[(i, i) for i in range(1, 6)])
+
+class SearchQuerySerializer(serializers.Serializer):
+    q = serializers.CharField(max_length=200)
+    type = serializers.ChoiceField(choices=['movies', 'reviews'], default='movies')
+    genre = serializers.IntegerField(min_value=1, required=False)
+    year = serializers.IntegerField(required=False)
+    sentiment = serializers.ChoiceField(choices=[s.value for s in Sentiment], required=False)
+    movie = serializers.IntegerField(min_value=1, required=False)
+
+    def validate(self, attrs):
+        if attrs['type'] == 'movies' and ('sentiment' in attrs or 'movie' in attrs):
+            raise serializers.ValidationError('The sentiment and movie filters only apply to review search.')
+        return attrs
+
+class MovieSearchResultSerializer(MovieSerializer):
+    rank = serializers.FloatField(read_only=True)
+    class Meta(MovieSerializer.Meta):
+        fields = MovieSerializer.Meta.fields + ['rank']
+
+class ReviewSearchResultSerializer(ReviewSerializer):
+    rank = serializers.FloatField(read_only=True)
+    class Meta(ReviewSerializer.Meta):
+        fields = ReviewSerializer.Meta.fields + ['rank']
+
+class LeaderboardQuerySerializer(serializers.Serializer):
+    genre = serializers.PrimaryKeyRelatedField(queryset=Genre.objects.all(), required=False)
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=10)
+
+class LeaderboardEntrySerializer(SparseFieldsetMixin, TimedSerializerMixin, serializers.ModelSerializer):
+    id = serializers.IntegerField(source='movie.id')
+    title = serializers.CharField(source='movie.title')
+    release_year = serializers.IntegerField(source='movie.release_year')
+    average_rating = serializers.SerializerMethodField()
+    rating_count = serializers.IntegerField(source='movie.rating_count')
+    class Meta:
+        model = MovieRanking
+        list_serializer_class = TimedListSerializer
+        fields = ['id', 'title', 'release_year', 'average_rating', 'rating_count',
+                  'review_count', 'bayesian_rating', 'trending_score']
+    def get_average_rating(self, obj):
+        return round(obj.movie.average_rating, 2)
+
+class SimilarMoviesQuerySerializer(serializers.Serializer):
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=10)
+
+class SimilarMovieSerializer(SparseFieldsetMixin, TimedSerializerMixin, serializers.ModelSerializer):
+    id = serializers.IntegerField(source='similar.id')
+    title = serializers.CharField(source='similar.title')
+    release_year = serializers.IntegerField(source='similar.release_year')
+    average_rating = serializers.SerializerMethodField()
+    class Meta:
+        model = MovieSimilarity
+        list_serializer_class = TimedListSerializer
+        fields = ['id', 'title', 'release_year', 'average_rating', 'score']
+    def get_average_rating(self, obj):
+        return round(obj.similar.average_rating, 2)
+
+class AnalyticsQuerySerializer(serializers.Serializer):
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    granularity = serializers.ChoiceField(choices=['day', 'week'], default='day')
+
+    def validate(self, attrs):
+        # Defaults to the last 30 days.
+        end = attrs.setdefault('end', timezone.localdate())
+        start = attrs.setdefault('start', end - timedelta(days=29))
+        if start > end:
+            raise serializers.ValidationError('start must not be after end.')
+        if (end - start).days >= settings.ANALYTICS_MAX_DAYS:
+            raise serializers.ValidationError(f'The range may cover at most {settings.ANALYTICS_MAX_DAYS} days.')
+        return attrs
+
+class AnalyticsBucketSerializer(SparseFieldsetMixin, serializers.Serializer):
+    """One bucket of api.rollups.rollup_series()."""
+    start = serializers.DateField()
+    rating_count = serializers.IntegerField()
+    average_rating = serializers.SerializerMethodField()
+    rating_histogram = serializers.SerializerMethodField()
+    review_count = serializers.IntegerField()
+    sentiment = serializers.SerializerMethodField()
+
+    def get_average_rating(self, bucket):
+        if not bucket['rating_count']:
+            return 0.0
+        total = sum(stars * bucket[f'stars_{stars}_count'] for stars in range(1, 6))
+        return round(total / bucket['rating_count'], 2)
+
+    def get_rating_histogram(self, bucket):
+        return {stars: bucket[f'stars_{stars}_count'] for stars in range(1, 6)}
+
+    def get_sentiment(self, bucket):
+        return {sentiment.value: bucket[f'{sentiment.name.lower()}_count'] for sentiment in Sentiment}
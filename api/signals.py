@@ -0,0 +1,77 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from .cache import invalidate_on_commit
+from .models import Genre, Movie, MovieGenre, Rating, Review, ratings_changed
+from .search import SEARCH_FIELDS, index_documents
+
+
+@receiver(post_delete, sender=Rating)
+def remove_rating_from_aggregates(sender, instance, origin=None, **kwargs):
+    # The movie row is going away too, there is nothing left to update.
+    if isinstance(origin, Movie):
+        return
+    Movie.apply_rating_changes([(instance.movie_id, instance.stars, -1)])
+
+
+@receiver(post_delete, sender=Review)
+def remove_review_from_counts(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, Movie):
+        return
+    Movie.apply_review_changes([(instance.movie_id, instance.sentiment, -1)])
+
+
+def _text_changed(kind, update_fields):
+    return update_fields is None or any(field in update_fields for field, _, _ in SEARCH_FIELDS[kind])
+
+
+@receiver(post_save, sender=Movie)
+def index_saved_movie(sender, instance, update_fields=None, **kwargs):
+    if _text_changed('movies', update_fields):
+        index_documents('movies', [instance.pk])
+
+
+@receiver(post_save, sender=Review)
+def index_saved_review(sender, instance, update_fields=None, **kwargs):
+    if _text_changed('reviews', update_fields):
+        index_documents('reviews', [instance.pk])
+
+
+# Response cache invalidation. Tags mirror the ones attached in api.cache.
+
+@receiver(ratings_changed)
+def invalidate_rated_movies(sender, movie_ids, **kwargs):
+    invalidate_on_commit(*(f'movie:{movie_id}' for movie_id in movie_ids))
+
+
+@receiver(post_save, sender=Movie)
+def invalidate_saved_movie(sender, instance, created, **kwargs):
+    invalidate_on_commit('movies' if created else f'movie:{instance.pk}')
+
+
+@receiver(post_delete, sender=Movie)
+def invalidate_deleted_movie(sender, instance, **kwargs):
+    invalidate_on_commit('movies', f'movie:{instance.pk}')
+
+
+@receiver(post_save, sender=Genre)
+@receiver(post_delete, sender=Genre)
+def invalidate_genre(sender, instance, **kwargs):
+    invalidate_on_commit('genres', f'genre:{instance.pk}')
+
+
+@receiver(post_save, sender=MovieGenre)
+@receiver(post_delete, sender=MovieGenre)
+def invalidate_movie_genre(sender, instance, **kwargs):
+    invalidate_on_commit(f'movie:{instance.movie_id}')
+
+
+@receiver(m2m_changed, sender=Movie.genres.through)
+def invalidate_movie_genres(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        invalidate_on_commit(f'movie:{instance.pk}')
+    elif pk_set:
+        invalidate_on_commit(*(f'movie:{pk}' for pk in pk_set))
+    else:
+        invalidate_on_commit('movies', f'genre:{instance.pk}')
@@ -0,0 +1,182 @@
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Min, Sum
+from .cache import invalidate_on_commit
+from .models import Movie, MovieDailyStats, MovieGenre, MovieSimilarity, SimilarityState
+
+
+class MovieFeatures:
+    """
+    What relatedness is computed from, for every movie in the catalog:
+    ratings (from a RatingsSnapshot), genre memberships and the sentiment
+    balance of its reviews (from the rollups). Arrays are aligned with the
+    sorted ``movie_ids``.
+    """
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self.movie_ids = np.array(Movie.objects.order_by('id').values_list('id', flat=True), dtype=np.int64)
+        # Catalog position of each snapshot movie; movies deleted since the snapshot are dropped.
+        positions = np.searchsorted(self.movie_ids, snapshot.movie_ids)
+        known = positions < len(self.movie_ids)
+        known[known] = self.movie_ids[positions[known]] == snapshot.movie_ids[known]
+        self.rated_positions, self.rated_known = positions, known
+        stats = snapshot.movie_stats()
+        self.rating_counts = np.zeros(len(self.movie_ids), dtype=np.int64)
+        self.rating_counts[positions[known]] = stats['count'][known]
+        self.rating_sums = np.zeros(len(self.movie_ids), dtype=np.int64)
+        self.rating_sums[positions[known]] = np.rint(stats['mean'] * stats['count'])[known]
+
+        pairs = np.array(list(MovieGenre.objects.values_list('movie_id', 'genre_id')), dtype=np.int64).reshape(-1, 2)
+        pairs = pairs[np.isin(pairs[:, 0], self.movie_ids)]
+        genre_ids = np.unique(pairs[:, 1])
+        self.genres = np.zeros((len(self.movie_ids), len(genre_ids)))
+        self.genres[np.searchsorted(self.movie_ids, pairs[:, 0]), np.searchsorted(genre_ids, pairs[:, 1])] = 1
+        self.genre_counts = self.genres.sum(axis=1)
+
+        # Share of positive minus share of negative scored reviews; NaN without any.
+        self.sentiment = np.full(len(self.movie_ids), np.nan)
+        totals = (
+            MovieDailyStats.objects.values_list('movie_id')
+            .annotate(Sum('positive_count'), Sum('negative_count'), Sum('neutral_count'))
+            .order_by()
+        )
+        for movie_id, positive, negative, neutral in totals:
+            position = np.searchsorted(self.movie_ids, movie_id)
+            if positive + negative + neutral and position < len(self.movie_ids) and self.movie_ids[position] == movie_id:
+                self.sentiment[position] = (positive - negative) / (positive + negative + neutral)
+
+    def scores(self, position, rating_weight, genre_weight, sentiment_weight):
+        """
+        Relatedness of the movie at ``position`` to every movie: the weighted
+        sum of the cosine similarity of their ratings, the Jaccard index of
+        their genres and, for movies related by either, the agreement of
+        their sentiment balance (1 when equal, 0 when opposite).
+        """
+        shared = self.genres @ self.genres[position]
+        union = self.genre_counts + self.genre_counts[position] - shared
+        genre = np.divide(shared, union, out=np.zeros_like(shared), where=union > 0)
+        rating = np.zeros(len(self.movie_ids))
+        if self.rating_counts[position]:
+            similarities = self.snapshot.similarities(self.movie_ids[position])
+            rating[self.rated_positions[self.rated_known]] = similarities[self.rated_known]
+        agreement = np.nan_to_num(1 - np.abs(self.sentiment - self.sentiment[position]) / 2)
+        scores = rating_weight * rating + genre_weight * genre + sentiment_weight * agreement * ((rating > 0) | (genre > 0))
+        scores[position] = 0
+        return scores
+
+
+def top_k(scores, k):
+    """Positions of the ``k`` highest positive scores, best first."""
+    candidates = np.flatnonzero(scores > 0)
+    if len(candidates) > k:
+        candidates = candidates[np.argpartition(-scores[candidates], k)[:k]]
+    return candidates[np.argsort(-scores[candidates], kind='stable')]
+
+
+def _computed_totals():
+    return {
+        movie_id: (count, total)
+        for movie_id, count, total in SimilarityState.objects.values_list('movie_id', 'rating_count', 'rating_sum')
+    }
+
+
+def changed_movie_ids():
+    """
+    Ids of the movies whose rating totals, as kept on Movie, differ from the
+    ones their neighbour list was computed from. Cheap enough to check
+    before writing a snapshot.
+    """
+    computed = _computed_totals()
+    return [
+        movie_id for movie_id, count, total in Movie.objects.values_list('id', 'rating_count', 'rating_sum')
+        if computed.get(movie_id) != (count, total)
+    ]
+
+
+def affected_positions(features, changed, k, weights):
+    """
+    Positions of the other movies whose neighbour lists the movies at
+    ``changed`` positions may have left or joined: the lists holding one
+    of them, and the lists whose last neighbour one of them now outscores
+    (any positive score, for lists shorter than ``k``). Relatedness is
+    symmetric, so each changed movie's scores are all that is needed.
+    """
+    if not changed:
+        return []
+    movie_ids = features.movie_ids
+    affected = np.zeros(len(movie_ids), dtype=bool)
+    floors = np.zeros(len(movie_ids))
+    listing = (
+        MovieSimilarity.objects.filter(similar_id__in=movie_ids[changed].tolist())
+        .values_list('movie_id', flat=True).distinct()
+    )
+    stored = MovieSimilarity.objects.values_list('movie_id').annotate(Min('score'), Count('id')).order_by()
+    # Rows of movies deleted since the features were read are skipped.
+    for movie_id in listing:
+        position = np.searchsorted(movie_ids, movie_id)
+        if position < len(movie_ids) and movie_ids[position] == movie_id:
+            affected[position] = True
+    for movie_id, lowest, count in stored:
+        position = np.searchsorted(movie_ids, movie_id)
+        if count >= k and position < len(movie_ids) and movie_ids[position] == movie_id:
+            floors[position] = lowest
+    for position in changed:
+        affected |= features.scores(position, *weights) > floors
+    affected[changed] = False
+    return np.flatnonzero(affected).tolist()
+
+
+def refresh_similar_movies(snapshot, full=False, k=None, batch_size=500, log=None):
+    """
+    Recompute the neighbour lists of the movies whose ratings differ from
+    the ones their list was computed from, and of the movies whose lists
+    those may have left or joined (every movie when ``full``), with ratings
+    read from ``snapshot``. Lists are replaced ``batch_size`` movies per
+    transaction. Genre and review changes are picked up by ``full``.
+    """
+    log = log or (lambda message: None)
+    k = k or settings.SIMILAR_MOVIES_K
+    weights = (
+        settings.SIMILARITY_RATING_WEIGHT, settings.SIMILARITY_GENRE_WEIGHT, settings.SIMILARITY_SENTIMENT_WEIGHT,
+    )
+    features = MovieFeatures(snapshot)
+    # Plain ints for the ORM.
+    movie_ids, counts, sums = (
+        array.tolist() for array in (features.movie_ids, features.rating_counts, features.rating_sums)
+    )
+    if full:
+        stale = list(range(len(features.movie_ids)))
+    else:
+        computed = _computed_totals()
+        stale = [
+            position for position, movie_id in enumerate(movie_ids)
+            if computed.get(movie_id) != (counts[position], sums[position])
+        ]
+        stale += affected_positions(features, stale, k, weights)
+    neighbours = 0
+    for start in range(0, len(stale), batch_size):
+        chunk = stale[start:start + batch_size]
+        rows = []
+        for position in chunk:
+            scores = features.scores(position, *weights)
+            rows.extend(
+                MovieSimilarity(movie_id=movie_ids[position], similar_id=movie_ids[other], score=float(scores[other]))
+                for other in top_k(scores, k).tolist()
+            )
+        with transaction.atomic():
+            MovieSimilarity.objects.filter(movie_id__in=[movie_ids[position] for position in chunk]).delete()
+            MovieSimilarity.objects.bulk_create(rows, batch_size=1000)
+            SimilarityState.objects.bulk_create(
+                [
+                    SimilarityState(movie_id=movie_ids[position], rating_count=counts[position], rating_sum=sums[position])
+                    for position in chunk
+                ],
+                batch_size=1000, update_conflicts=True, unique_fields=['movie'],
+                update_fields=['rating_count', 'rating_sum'],
+            )
+            invalidate_on_commit('similar-movies')
+        neighbours += len(rows)
+        log(f'Movies: {start + len(chunk)}/{len(stale)}')
+    return {'movies': len(stale), 'neighbours': neighbours}
@@ -0,0 +1,226 @@
+import json
+import os
+import shutil
+import threading
+from functools import cached_property
+import numpy as np
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils import timezone
+from .models import Rating
+
+FORMAT_VERSION = 1
+# The .npy files of a snapshot. Movies and users are numbered by their position
+# in the sorted movie_ids / user_ids; the ratings are stored twice in CSR layout:
+# by movie (row pointers, user positions, stars) and by user (row pointers,
+# movie positions, stars).
+ARRAYS = (
+    'movie_ids', 'user_ids',
+    'by_movie_indptr', 'by_movie_users', 'by_movie_stars',
+    'by_user_indptr', 'by_user_movies', 'by_user_stars',
+)
+
+
+def read_ratings(batch_size=100000):
+    """The movie_id, user_id and stars columns of every rating, read ``batch_size`` rows at a time."""
+    movies, users, stars = [], [], []
+    last_id = 0
+    while True:
+        rows = list(
+            Rating.objects.filter(id__gt=last_id).order_by('id')
+            .values_list('id', 'movie_id', 'user_id', 'stars')[:batch_size]
+        )
+        if not rows:
+            break
+        batch = np.array(rows, dtype=np.int64)
+        last_id = int(batch[-1, 0])
+        movies.append(batch[:, 1])
+        users.append(batch[:, 2])
+        stars.append(batch[:, 3].astype(np.int8))
+    if not movies:
+        return np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0, np.int8)
+    return np.concatenate(movies), np.concatenate(users), np.concatenate(stars)
+
+
+def csr(rows, columns, values, n_rows):
+    """Row pointers, column indices and values of (rows, columns, values) triples, columns sorted per row."""
+    order = np.lexsort((columns, rows))
+    indptr = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n_rows), out=indptr[1:])
+    return indptr, columns[order].astype(np.int32), values[order]
+
+
+def write_ratings_snapshot(path=None, batch_size=100000):
+    """
+    Write every rating to a snapshot directory (default RATINGS_SNAPSHOT_DIR)
+    and return its metadata.
+
+    The snapshot is built next to ``path`` and swapped in by renaming, so
+    readers never see a partial one; processes that have the previous one
+    mapped keep reading it until they reopen.
+    """
+    path = os.fspath(path or settings.RATINGS_SNAPSHOT_DIR)
+    created_at = timezone.now()
+    movie_column, user_column, stars = read_ratings(batch_size)
+    movie_ids, movies = np.unique(movie_column, return_inverse=True)
+    user_ids, users = np.unique(user_column, return_inverse=True)
+    arrays = {'movie_ids': movie_ids, 'user_ids': user_ids}
+    arrays['by_movie_indptr'], arrays['by_movie_users'], arrays['by_movie_stars'] = csr(
+        movies, users, stars, len(movie_ids)
+    )
+    arrays['by_user_indptr'], arrays['by_user_movies'], arrays['by_user_stars'] = csr(
+        users, movies, stars, len(user_ids)
+    )
+    meta = {
+        'version': FORMAT_VERSION,
+        'created_at': created_at.isoformat(),
+        'ratings': len(stars),
+        'movies': len(movie_ids),
+        'users': len(user_ids),
+        'bytes': sum(array.nbytes for array in arrays.values()),
+    }
+
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    staging = f'{path}.tmp-{os.getpid()}'
+    shutil.rmtree(staging, ignore_errors=True)
+    os.mkdir(staging)
+    for name, array in arrays.items():
+        np.save(os.path.join(staging, f'{name}.npy'), array)
+    with open(os.path.join(staging, 'meta.json'), 'w') as handle:
+        json.dump(meta, handle)
+    previous = f'{path}.old-{os.getpid()}'
+    if os.path.exists(path):
+        os.rename(path, previous)
+    os.rename(staging, path)
+    shutil.rmtree(previous, ignore_errors=True)
+    return meta
+
+
+class RatingsSnapshot:
+    """
+    A snapshot written by write_ratings_snapshot(), memory-mapped read-only.
+
+    Pages are loaded on demand and shared between the processes mapping the
+    same files. Per-movie and per-user lookups return views into the maps,
+    not copies; the vectorized methods touch only the arrays they need.
+    """
+
+    def __init__(self, path):
+        self.path = os.fspath(path)
+        with open(os.path.join(self.path, 'meta.json')) as handle:
+            self.meta = json.load(handle)
+        if self.meta['version'] != FORMAT_VERSION:
+            raise ValueError(f'Unsupported ratings snapshot version {self.meta["version"]}.')
+        for name in ARRAYS:
+            setattr(self, name, np.load(os.path.join(self.path, f'{name}.npy'), mmap_mode='r'))
+
+    def __len__(self):
+        return len(self.by_movie_stars)
+
+    @staticmethod
+    def _position(ids, value):
+        position = int(np.searchsorted(ids, value))
+        if position == len(ids) or ids[position] != value:
+            raise KeyError(value)
+        return position
+
+    def movie_index(self, movie_id):
+        """Position of ``movie_id`` in movie_ids; KeyError if the movie has no ratings."""
+        return self._position(self.movie_ids, movie_id)
+
+    def user_index(self, user_id):
+        return self._position(self.user_ids, user_id)
+
+    def movie_ratings(self, movie_id):
+        """(user positions, stars) of the movie's ratings."""
+        row = self.movie_index(movie_id)
+        start, end = self.by_movie_indptr[row], self.by_movie_indptr[row + 1]
+        return self.by_movie_users[start:end], self.by_movie_stars[start:end]
+
+    def user_ratings(self, user_id):
+        """(movie positions, stars) of the user's ratings."""
+        row = self.user_index(user_id)
+        start, end = self.by_user_indptr[row], self.by_user_indptr[row + 1]
+        return self.by_user_movies[start:end], self.by_user_stars[start:end]
+
+    @cached_property
+    def _movie_rows(self):
+        # The movie position of each rating in the by-movie arrays.
+        return np.repeat(np.arange(len(self.movie_ids)), np.diff(self.by_movie_indptr))
+
+    def movie_stats(self):
+        """Rating count, mean and 5-column star histogram of every movie, aligned with movie_ids."""
+        counts = np.diff(self.by_movie_indptr)
+        sums = np.bincount(self._movie_rows, weights=self.by_movie_stars, minlength=len(self.movie_ids))
+        histogram = np.bincount(
+            self._movie_rows * 5 + self.by_movie_stars - 1, minlength=len(self.movie_ids) * 5
+        ).reshape(-1, 5)
+        return {'count': counts, 'mean': sums / np.maximum(counts, 1), 'histogram': histogram}
+
+    @cached_property
+    def movie_norms(self):
+        """Euclidean norm of each movie's vector of stars by user."""
+        squares = self.by_movie_stars.astype(np.float64) ** 2
+        return np.sqrt(np.bincount(self._movie_rows, weights=squares, minlength=len(self.movie_ids)))
+
+    def similarities(self, movie_id, chunk_size=1 << 22):
+        """
+        Cosine similarity of the movie's stars-by-user vector with every
+        movie's, aligned with movie_ids. Only the ratings of users who rated
+        the movie are read, so the cost follows its raters' activity rather
+        than the size of the snapshot; they are processed about
+        ``chunk_size`` ratings at a time to bound memory.
+        """
+        row = self.movie_index(movie_id)
+        users, stars = self.movie_ratings(movie_id)
+        starts = self.by_user_indptr[users]
+        lengths = self.by_user_indptr[users + 1] - starts
+        dots = np.zeros(len(self.movie_ids))
+        # Split the raters so each chunk covers about chunk_size of their ratings.
+        bounds = np.searchsorted(np.cumsum(lengths), np.arange(chunk_size, lengths.sum(), chunk_size))
+        for chunk in np.split(np.arange(len(users)), bounds):
+            chunk_lengths = lengths[chunk]
+            # Positions of the chunk's ratings in the by-user arrays.
+            offsets = np.repeat(starts[chunk] - (np.cumsum(chunk_lengths) - chunk_lengths), chunk_lengths)
+            positions = offsets + np.arange(chunk_lengths.sum())
+            weights = np.repeat(stars[chunk].astype(np.float64), chunk_lengths) * self.by_user_stars[positions]
+            dots += np.bincount(self.by_user_movies[positions], weights=weights, minlength=len(self.movie_ids))
+        norms = self.movie_norms * self.movie_norms[row]
+        return np.divide(dots, norms, out=np.zeros_like(dots), where=norms > 0)
+
+
+_snapshot = None
+_snapshot_mtime = None
+_snapshot_lock = threading.Lock()
+
+
+def get_ratings_snapshot():
+    """
+    The snapshot in RATINGS_SNAPSHOT_DIR, reopened when a newer one has been
+    written, or None if there is none yet.
+    """
+    global _snapshot, _snapshot_mtime
+    path = os.fspath(settings.RATINGS_SNAPSHOT_DIR)
+    try:
+        mtime = os.stat(os.path.join(path, 'meta.json')).st_mtime_ns
+    except FileNotFoundError:
+        # Not written yet, or being swapped for a new one right now.
+        return _snapshot
+    if mtime != _snapshot_mtime:
+        with _snapshot_lock:
+            if mtime != _snapshot_mtime:
+                try:
+                    _snapshot = RatingsSnapshot(path)
+                except FileNotFoundError:
+                    return _snapshot
+                _snapshot_mtime = mtime
+    return _snapshot
+
+
+@receiver(setting_changed)
+def reset_ratings_snapshot(setting, **kwargs):
+    global _snapshot, _snapshot_mtime
+    if setting == 'RATINGS_SNAPSHOT_DIR':
+        _snapshot = _snapshot_mtime = None
@@ -1,12 +1,48 @@
-from django.test import TestCase
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection, transaction
+from django.http import HttpResponse
+from django.db.models import Count, Sum
+from django.test import AsyncClient, RequestFactory, TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from django.contrib.auth.models import User
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
-from rest_framework_simplejwt.tokens import RefreshToken
-from api.models import Movie, Genre, Review, Rating
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from api.models import Movie, MovieDailyStats, MovieRanking, Genre, Review, Rating, ReviewSearchTerm, RevokedToken
 from api.serializers import MovieSerializer, ReviewSerializer
+from api import async_views, renderers, rollups
+from api.auth import RevocationCache, StatelessJWTAuthentication
+from api.benchmark import run_http_load
+from api.cache import cache_response, get_response_cache
+from api.ingest import ingest_reviews
+from api.metrics import clear_metrics, render_metrics
+from api.middleware import ReplicaRoutingMiddleware
+from api.rankings import refresh_rankings
+from api.rollups import apply_sentiment_changes, refresh_rollups
+from api.renderers import FastJSONRenderer
+from api.routing import PrimaryReplicaRouter
+from api.sentiment import LexiconSentimentAnalyzer, TextBlobSentimentAnalyzer, classify_many, get_analyzer, normalize_text
+from api.snapshots import get_ratings_snapshot
+from api.warmup import warm_up
+from api.workers import score_pending_reviews
 from textblob import TextBlob
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import json
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
 class MovieModelTest(TestCase):
     def setUp(self):
@@ -31,6 +67,599 @@ class MovieModelTest(TestCase):
         self.assertEqual(self.review.review_text, "Great film!")
         self.assertEqual(self.review.sentiment, "Positive")
 
+class RatingAggregateTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="rater", password="testpass123")
+        self.other = User.objects.create_user(username="rater2", password="testpass123")
+        self.movie = Movie.objects.create(title="Rated Movie", release_year=2021)
+
+    def test_aggregates_follow_create_update_delete(self):
+        rating = Rating.objects.create(movie=self.movie, user=self.user, stars=4)
+        Rating.objects.create(movie=self.movie, user=self.other, stars=2)
+        self.movie.refresh_from_db()
+        self.assertEqual(self.movie.rating_count, 2)
+        self.assertEqual(self.movie.rating_sum, 6)
+        self.assertEqual(self.movie.average_rating, 3.0)
+
+        rating.stars = 5
+        rating.save()
+        self.movie.refresh_from_db()
+        self.assertEqual(self.movie.rating_sum, 7)
+        self.assertEqual(self.movie.rating_histogram, {1: 0, 2: 1, 3: 0, 4: 0, 5: 1})
+
+        rating.delete()
+        self.movie.refresh_from_db()
+        self.assertEqual(self.movie.rating_count, 1)
+        self.assertEqual(self.movie.rating_histogram[5], 0)
+
+    def test_rebuild_command_repairs_drift(self):
+        Rating.objects.create(movie=self.movie, user=self.user, stars=3)
+        Movie.objects.filter(pk=self.movie.pk).update(rating_count=0, rating_sum=0, stars_3_count=0)
+        call_command("rebuild_rating_aggregates", stdout=StringIO())
+        self.movie.refresh_from_db()
+        self.assertEqual(self.movie.rating_count, 1)
+        self.assertEqual(self.movie.rating_sum, 3)
+        self.assertEqual(self.movie.stars_3_count, 1)
+
+class IndexBenchmarkTest(TestCase):
+    def test_benchmark_compares_plans_and_restores_indexes(self):
+        with tempfile.NamedTemporaryFile(suffix=".json") as output:
+            call_command(
+                "benchmark_indexes", seed_reviews=300, seed_movies=20, seed_users=30,
+                repeat=1, output=output.name, stdout=StringIO(),
+            )
+            with open(output.name) as handle:
+                results = {row["query"]: row for row in json.load(handle)["results"]}
+        pending = results["pending sentiment queue"]
+        self.assertIn("review_sentiment_id", pending["with_indexes"]["plan"])
+        self.assertNotIn("review_sentiment_id", pending["without_indexes"]["plan"])
+        with connection.cursor() as cursor:
+            indexes = connection.introspection.get_constraints(cursor, Review._meta.db_table)
+        self.assertIn("review_pending_id", indexes)
+
+class LoadBenchmarkTest(TransactionTestCase):
+    def test_seed_and_benchmark_with_baseline(self):
+        call_command("seed_data", movies=20, users=10, reviews=200, ratings=100, password="benchpass", stdout=StringIO())
+        self.assertEqual(Review.objects.count(), 200)
+        self.assertEqual(Rating.objects.count(), 100)
+        self.assertEqual(Movie.objects.aggregate(total=Sum("rating_count"))["total"], 100)
+
+        scenarios = ["movie detail", "reviews by sentiment", "movie ratings", "auth login"]
+        options = {"scenario": scenarios, "requests": 4, "concurrency": 2, "warmup": 0, "password": "benchpass"}
+        with tempfile.TemporaryDirectory() as directory:
+            output = f"{directory}/results.json"
+            call_command("run_benchmark", output=output, stdout=StringIO(), **options)
+            with open(output) as handle:
+                results = json.load(handle)
+            self.assertEqual(set(results["scenarios"]), set(scenarios))
+            for result in results["scenarios"].values():
+                self.assertEqual(result["requests"], 4)
+                self.assertEqual(result["errors"], 0)
+                self.assertLessEqual(result["p50_ms"], result["p99_ms"])
+            self.assertGreater(results["scenarios"]["movie ratings"]["queries_per_request"], 0)
+
+            for result in results["scenarios"].values():
+                result.update(p50_ms=0.001, p95_ms=0.001, queries_per_request=0)
+            with open(output, "w") as handle:
+                json.dump(results, handle)
+            with self.assertRaisesMessage(CommandError, "regression"):
+                call_command("run_benchmark", baseline=output, stdout=StringIO(), stderr=StringIO(), **options)
+
+class WarmupTest(TransactionTestCase):
+    def test_models_import_without_nlp_libraries(self):
+        script = "import sys, django; django.setup(); import api.models; print(sorted({'nltk', 'textblob'} & set(sys.modules)))"
+        output = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True).stdout
+        self.assertEqual(output.strip(), "[]")
+
+    def test_warm_up(self):
+        self.assertEqual(list(warm_up()), ["urls", "caches", "analyzer", "databases"])
+        with self.settings(SENTIMENT_ASYNC=True):
+            self.assertEqual(list(warm_up(connect=False)), ["urls", "caches"])
+
+        async def on_event_loop():
+            return warm_up()
+        # As under uvicorn: the database step moves off the event loop.
+        self.assertIn("databases", asyncio.run(on_event_loop()))
+
+    def test_warm_up_survives_database_errors(self):
+        # As against an unmigrated database, or a replica that is down.
+        revocations = mock.Mock(**{"sync.side_effect": OperationalError("no such table: api_revokedtoken")})
+        with mock.patch("api.warmup.get_revocation_cache", return_value=revocations), \
+                mock.patch.object(connection, "ensure_connection", side_effect=OperationalError("unreachable")), \
+                self.assertLogs("api.warmup", "WARNING") as logs:
+            self.assertIn("databases", warm_up())
+        self.assertEqual(len([line for line in logs.output if "Warm-up could not" in line]), 2)
+
+@override_settings(SENTIMENT_ASYNC=True)
+class AsyncSentimentTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="asyncuser", password="testpass123")
+        self.movie = Movie.objects.create(title="Queued Movie", release_year=2020)
+
+    def test_review_is_pending_until_worker_scores_it(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.post(
+            "/api/reviews/", {"movie": self.movie.id, "review_text": "Terrible, boring film."}, format="json"
+        )
+        self.assertEqual(response.data["sentiment"], "Pending")
+        pending = self.client.get("/api/reviews/?sentiment=Pending")
+        self.assertEqual([r["id"] for r in pending.data["results"]], [response.data["id"]])
+
+        self.assertEqual(score_pending_reviews(batch_size=10), 1)
+        self.assertEqual(Review.objects.get().sentiment, "Negative")
+        self.assertEqual(score_pending_reviews(batch_size=10), 0)
+
+class RescoreSentimentTest(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username="rescored", password="testpass123")
+        self.movie = Movie.objects.create(title="Rescored", release_year=2020)
+        for text in ("A good film.", "Truly excellent!", "Slightly good.", "Awful film."):
+            Review.objects.create(movie=self.movie, user=user, review_text=text)
+        refresh_rollups(settle_seconds=0)
+
+    def rescore(self, **options):
+        output = StringIO()
+        call_command("rescore_sentiment", workers=1, chunk_size=1, stdout=output, **options)
+        return output.getvalue()
+
+    def test_rescore_with_new_threshold(self):
+        self.assertEqual(Review.objects.filter(sentiment="Positive").count(), 3)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        checkpoint = f"{directory.name}/rescore.json"
+        with self.settings(SENTIMENT_POSITIVE_THRESHOLD=0.8):
+            output = self.rescore(dry_run=True)
+            self.assertIn("Positive -> Neutral: 2", output)
+            self.assertIn("Would change 2 of 4 reviews.", output)
+            self.assertEqual(Review.objects.filter(sentiment="Positive").count(), 3)
+
+            self.assertIn("Changed 2 of 4 reviews.", self.rescore(checkpoint=checkpoint, max_writes_per_second=1000))
+            self.assertEqual(Review.objects.filter(sentiment="Positive").count(), 1)
+            stats = MovieDailyStats.objects.get(movie=self.movie)
+            self.assertEqual((stats.positive_count, stats.neutral_count, stats.negative_count), (1, 2, 1))
+            # A finished run resumes past the end; its totals come from the checkpoint.
+            output = self.rescore(checkpoint=checkpoint)
+            self.assertNotIn("Chunks:", output)
+            self.assertIn("Changed 2 of 4 reviews.", output)
+        # The checkpoint belongs to a run with other thresholds.
+        with self.assertRaises(CommandError):
+            self.rescore(checkpoint=checkpoint)
+
+    def test_reviews_changed_while_scoring_are_skipped(self):
+        from api import workers
+        reviews = list(Review.objects.filter(movie=self.movie).order_by("id"))
+
+        def classify_and_change(texts):
+            labels = classify_many(texts)
+            # Both reviews go from Positive to Neutral below, once they are scored.
+            reviews[0].delete()
+            reviews[2].review_text = "Truly excellent!"
+            reviews[2].save()
+            return labels
+
+        with self.settings(SENTIMENT_POSITIVE_THRESHOLD=0.8), \
+                mock.patch("api.workers.classify_many", side_effect=classify_and_change):
+            result = workers.rescore_chunk(0, reviews[-1].id + 1)
+        self.assertNotIn(("Positive", "Neutral"), result["transitions"])
+        self.movie.refresh_from_db()
+        self.assertEqual(
+            (self.movie.positive_review_count, self.movie.neutral_review_count, self.movie.negative_review_count),
+            (2, 0, 1),
+        )
+        # The deleted review leaves the rollups on their next refresh.
+        stats = MovieDailyStats.objects.get(movie=self.movie)
+        self.assertEqual((stats.positive_count, stats.neutral_count, stats.negative_count), (3, 0, 1))
+
+    def test_only_changes_past_the_watermark_lock_it(self):
+        counted = Review.objects.filter(movie=self.movie).first().created_at
+        with mock.patch("api.rollups.lock_watermark", wraps=rollups.lock_watermark) as lock:
+            apply_sentiment_changes([(self.movie.id, counted, "Positive", "Neutral")])
+            self.assertFalse(lock.called)
+            # Left to the next refresh, which counts the review's new label.
+            apply_sentiment_changes([(self.movie.id, timezone.now() + timedelta(seconds=1), "Positive", "Neutral")])
+            self.assertTrue(lock.called)
+        stats = MovieDailyStats.objects.get(movie=self.movie)
+        self.assertEqual((stats.positive_count, stats.neutral_count), (2, 1))
+
+class SentimentAnalyzerTest(TestCase):
+    texts = [
+        "Great film!",
+        "Terrible, boring film.",
+        "It was not good at all",
+        "not bad, really not bad!!",
+        "A very very good movie :)",
+        "The plot was absolutely not convincing",
+        "I watched it on Sunday.",
+        "",
+    ]
+
+    def test_lexicon_analyzer_matches_textblob(self):
+        lexicon = LexiconSentimentAnalyzer(cache_size=0)
+        textblob = TextBlobSentimentAnalyzer(cache_size=0)
+        self.assertEqual(lexicon.classify_batch(self.texts), textblob.classify_batch(self.texts))
+        for text in self.texts:
+            self.assertAlmostEqual(
+                lexicon.polarity_batch([text])[0], TextBlob(text).sentiment.polarity
+            )
+
+    def test_duplicate_texts_are_scored_once(self):
+        analyzer = LexiconSentimentAnalyzer(cache_size=10)
+        calls = []
+        original = analyzer.polarity_batch
+        analyzer.polarity_batch = lambda texts: calls.append(list(texts)) or original(texts)
+        analyzer.classify_batch(["Great film!", "great   FILM!", "Awful."])
+        analyzer.classify("Awful.")
+        self.assertEqual(calls, [["Great film!", "Awful."]])
+
+    def test_emoticons_keep_their_case_in_the_cache(self):
+        from textblob._text import EMOTICONS
+        for emoticon in {e for group in EMOTICONS.values() for e in group}:
+            self.assertEqual(normalize_text(f"Meh  {emoticon}"), f"Meh {emoticon}")
+        analyzer = LexiconSentimentAnalyzer(cache_size=10)
+        self.assertEqual(analyzer.classify("Meh :D"), "Positive")
+        self.assertEqual(analyzer.classify("meh :d"), "Neutral")
+
+    @override_settings(SENTIMENT_POSITIVE_THRESHOLD=0.9)
+    def test_thresholds_are_configurable(self):
+        self.assertEqual(get_analyzer().classify("A good movie"), "Neutral")
+        self.assertEqual(get_analyzer().classify("Perfect!"), "Positive")
+
+class BulkIngestTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="importer", password="testpass123")
+        self.movie = Movie.objects.create(title="Imported Movie", release_year=2019)
+        self.other_movie = Movie.objects.create(title="Other Movie", release_year=2018)
+        self.client.force_authenticate(self.user)
+
+    def test_bulk_reviews_report_per_row_results(self):
+        rows = [{"movie": self.movie.id, "review_text": f"Great film number {i}!"} for i in range(50)]
+        rows.insert(3, {"movie": 999999, "review_text": "Missing movie"})
+        rows.insert(7, {"movie": self.movie.id})
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post("/api/reviews/bulk/", rows, format="json")
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(response.data["summary"], {"created": 50, "error": 2})
+        self.assertEqual([r["index"] for r in response.data["results"]], list(range(52)))
+        self.assertIn("movie", response.data["results"][3]["errors"])
+        self.assertIn("review_text", response.data["results"][7]["errors"])
+        self.assertEqual(Review.objects.filter(sentiment="Positive").count(), 50)
+        # A fixed number of queries per chunk, however many rows: one UPDATE per movie for the counts.
+        self.assertLess(len(ctx.captured_queries), 12)
+
+    def test_bulk_body_must_be_a_list_of_rows(self):
+        for body in ("null", "true", "3", '"rows"', '{"movie": 1, "stars": 4}'):
+            response = self.client.post("/api/ratings/bulk/", body, content_type="application/json")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, body)
+        response = self.client.post("/api/reviews/bulk/", "true", content_type="application/json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_ratings_ndjson_upsert(self):
+        Rating.objects.create(movie=self.movie, user=self.user, stars=1)
+        body = "\n".join([
+            json.dumps({"movie": self.movie.id, "stars": 4}),
+            "not json",
+            json.dumps({"movie": self.other_movie.id, "stars": 2}),
+            json.dumps({"movie": self.other_movie.id, "stars": 5}),
+        ])
+        response = self.client.post("/api/ratings/bulk/", body, content_type="application/x-ndjson")
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        statuses = [r["status"] for r in response.data["results"]]
+        self.assertEqual(statuses, ["updated", "error", "superseded", "created"])
+        self.assertEqual(Rating.objects.get(movie=self.movie, user=self.user).stars, 4)
+        self.other_movie.refresh_from_db()
+        self.movie.refresh_from_db()
+        self.assertEqual((self.movie.rating_count, self.movie.rating_sum), (1, 4))
+        self.assertEqual((self.other_movie.rating_count, self.other_movie.rating_sum), (1, 5))
+
+    def test_bulk_rejects_non_list_payload(self):
+        response = self.client.post("/api/ratings/bulk/", {"movie": self.movie.id}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class ExportTest(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(username="exporter", password="testpass123", is_staff=True)
+        self.genre = Genre.objects.create(name="Drama")
+        self.movie = Movie.objects.create(title="Exported Movie", release_year=2017)
+        self.movie.genres.add(self.genre)
+        self.other = Movie.objects.create(title="Other Movie", release_year=2016)
+        self.reviews = [
+            Review.objects.create(movie=self.movie, user=self.admin, review_text="Great film!"),
+            Review.objects.create(movie=self.movie, user=self.admin, review_text="Awful film."),
+            Review.objects.create(movie=self.other, user=self.admin, review_text="Great fun!"),
+        ]
+        self.client.force_authenticate(self.admin)
+
+    def read(self, response):
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return b"".join(response.streaming_content).decode()
+
+    def test_ndjson_export_with_filters_and_resume(self):
+        body = self.read(self.client.get("/api/export/reviews/?sentiment=Positive"))
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([r["id"] for r in rows], [self.reviews[0].id, self.reviews[2].id])
+
+        body = self.read(self.client.get(f"/api/export/reviews/?genre={self.genre.id}&after_id={self.reviews[0].id}"))
+        self.assertEqual([json.loads(line)["id"] for line in body.splitlines()], [self.reviews[1].id])
+
+    def test_csv_export_of_movies(self):
+        body = self.read(self.client.get("/api/export/movies/?format=csv"))
+        lines = body.splitlines()
+        self.assertTrue(lines[0].startswith("id,title,"))
+        self.assertTrue(lines[1].endswith(f",{self.genre.id}"))
+        self.assertEqual(len(lines), 3)
+
+    def test_export_requires_admin_and_valid_filters(self):
+        response = self.client.get("/api/export/ratings/?created_after=yesterday")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.client.force_authenticate(None)
+        self.assertIn(self.client.get("/api/export/ratings/").status_code, (401, 403))
+
+    async def test_asgi_export_is_streamed_asynchronously(self):
+        token = str(RefreshToken.for_user(self.admin).access_token)
+        response = await AsyncClient().get("/api/export/reviews/", headers={"Authorization": f"Bearer {token}"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # A sync iterator would be read into memory whole before the first byte is sent.
+        self.assertTrue(response.is_async)
+        body = b"".join([chunk async for chunk in response.streaming_content]).decode()
+        self.assertEqual([json.loads(line)["id"] for line in body.splitlines()], [r.id for r in self.reviews])
+
+class SearchTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="searcher", password="testpass123")
+        self.genre = Genre.objects.create(name="Space")
+        self.titled = Movie.objects.create(title="Galaxy Quest", release_year=1999, description="A comedy.")
+        self.titled.genres.add(self.genre)
+        self.described = Movie.objects.create(
+            title="Crew", release_year=2005, description="A long trip through the galaxy."
+        )
+        self.review = Review.objects.create(movie=self.titled, user=self.user, review_text="A great galaxy adventure!")
+        Review.objects.create(movie=self.described, user=self.user, review_text="Awful galaxy scenes.")
+
+    def ids(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [row["id"] for row in response.data["results"]]
+
+    def test_movies_ranked_and_filtered(self):
+        self.assertEqual(self.ids("/api/search/?q=galaxy"), [self.titled.id, self.described.id])
+        self.assertEqual(self.ids(f"/api/search/?q=galaxy&genre={self.genre.id}"), [self.titled.id])
+        self.assertEqual(self.ids("/api/search/?q=galaxy&year=2005"), [self.described.id])
+        self.assertEqual(self.ids("/api/search/?q=galaxy+comedy"), [self.titled.id])
+        self.assertEqual(self.ids("/api/search/?q=the"), [])
+
+    def test_reviews_filtered_by_sentiment_and_paginated(self):
+        self.assertEqual(self.ids("/api/search/?q=galaxy&type=reviews&sentiment=Positive"), [self.review.id])
+        response = self.client.get("/api/search/?q=galaxy&type=reviews&page_size=1")
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertIn("page=2", response.data["next"])
+        self.assertIn("rank", response.data["results"][0])
+        response = self.client.get("/api/search/?q=galaxy&sentiment=Positive")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_index_follows_updates_bulk_ingest_and_rebuild(self):
+        self.review.review_text = "A great nebula adventure!"
+        self.review.save()
+        self.assertEqual(self.ids("/api/search/?q=nebula&type=reviews"), [self.review.id])
+        self.assertNotIn(self.review.id, self.ids("/api/search/?q=galaxy&type=reviews"))
+
+        self.client.force_authenticate(self.user)
+        response = self.client.post(
+            "/api/reviews/bulk/", [{"movie": self.described.id, "review_text": "Nebula again"}], format="json"
+        )
+        created = response.data["results"][0]["id"]
+        self.assertEqual(len(self.ids("/api/search/?q=nebula&type=reviews")), 2)
+
+        ReviewSearchTerm.objects.all().delete()
+        call_command("rebuild_search_index", stdout=StringIO())
+        self.assertEqual(set(self.ids("/api/search/?q=nebula&type=reviews")), {self.review.id, created})
+
+METRICS_ON = {"ENABLED": True, "SLOW_REQUEST_MS": 0, "TOKEN": ""}
+
+@override_settings(API_METRICS=METRICS_ON)
+class RequestMetricsTest(APITestCase):
+    def setUp(self):
+        clear_metrics()
+        self.user = User.objects.create_user(username="measured", password="testpass123")
+        self.movie = Movie.objects.create(title="Measured Movie", release_year=2020)
+
+    def test_request_timings_exported(self):
+        self.client.get("/api/movies/")
+        self.client.force_authenticate(self.user)
+        self.client.post("/api/reviews/", {"movie": self.movie.id, "review_text": "Lovely!"}, format="json")
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        body = response.content.decode()
+        self.assertIn('api_requests_total{view="MovieViewSet",action="list",method="GET",status="200"} 1', body)
+        self.assertIn('api_request_db_queries_bucket{view="MovieViewSet",action="list",method="GET",le="+Inf"} 1', body)
+        sentiment = next(
+            line for line in body.splitlines()
+            if line.startswith('api_request_sentiment_seconds_sum{view="ReviewViewSet",action="create"')
+        )
+        self.assertGreater(float(sentiment.split()[-1]), 0)
+        serializer = next(
+            line for line in body.splitlines()
+            if line.startswith('api_request_serializer_seconds_sum{view="MovieViewSet",action="list"')
+        )
+        self.assertGreater(float(serializer.split()[-1]), 0)
+
+    @override_settings(API_METRICS={**METRICS_ON, "SLOW_REQUEST_MS": 0.001, "TOKEN": "scrape"})
+    def test_slow_request_log_and_token(self):
+        with self.assertLogs("api.slow_requests", level="WARNING") as logs:
+            self.client.get("/api/movies/")
+            self.assertEqual(self.client.get("/metrics").status_code, status.HTTP_401_UNAUTHORIZED)
+            response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer scrape")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("MovieViewSet.list", logs.output[0])
+        self.assertIn("SELECT", logs.output[0])
+
+    @override_settings(API_METRICS={**METRICS_ON, "ENABLED": False})
+    def test_disabled_records_nothing(self):
+        self.client.get("/api/movies/")
+        self.assertNotIn("MovieViewSet", render_metrics())
+        self.assertEqual(self.client.get("/metrics").status_code, status.HTTP_404_NOT_FOUND)
+
+class ResponseCacheTest(APITestCase):
+    def setUp(self):
+        get_response_cache().clear()
+        self.user = User.objects.create_user(username="cacheuser", password="testpass123")
+        self.genre = Genre.objects.create(name="Thriller")
+        self.movie = Movie.objects.create(title="Cached Movie", release_year=2015)
+        self.movie.genres.add(self.genre)
+        self.other = Movie.objects.create(title="Other Cached Movie", release_year=2014)
+
+    def test_detail_is_served_from_cache_with_conditional_support(self):
+        first = self.client.get(f"/api/movies/{self.movie.id}/")
+        self.assertEqual(first["X-Cache"], "MISS")
+        with self.assertNumQueries(0):
+            second = self.client.get(f"/api/movies/{self.movie.id}/")
+        self.assertEqual(second["X-Cache"], "HIT")
+        self.assertEqual(second.data, first.data)
+        not_modified = self.client.get(f"/api/movies/{self.movie.id}/", HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        since = self.client.get(f"/api/movies/{self.movie.id}/", HTTP_IF_MODIFIED_SINCE=first["Last-Modified"])
+        self.assertEqual(since.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_new_rating_only_evicts_the_rated_movie(self):
+        for movie in (self.movie, self.other):
+            self.client.get(f"/api/movies/{movie.id}/average-rating/")
+        Rating.objects.create(movie=self.movie, user=self.user, stars=4)
+        rated = self.client.get(f"/api/movies/{self.movie.id}/average-rating/")
+        self.assertEqual(rated["X-Cache"], "MISS")
+        self.assertEqual(rated.data["rating_count"], 1)
+        self.assertEqual(self.client.get(f"/api/movies/{self.other.id}/average-rating/")["X-Cache"], "HIT")
+
+    def test_genre_rename_evicts_movies_showing_it(self):
+        self.client.get("/api/genres/")
+        self.client.get(f"/api/movies/{self.other.id}/")
+        self.genre.name = "Suspense"
+        self.genre.save()
+        genres = self.client.get("/api/genres/")
+        self.assertEqual(genres["X-Cache"], "MISS")
+        self.assertEqual(genres.data["results"][0]["name"], "Suspense")
+        movie = self.client.get(f"/api/movies/{self.movie.id}/")
+        self.assertEqual(movie.data["genres"][0]["name"], "Suspense")
+        self.assertEqual(self.client.get(f"/api/movies/{self.other.id}/")["X-Cache"], "HIT")
+
+    def test_stats_endpoint(self):
+        self.client.get("/api/genres/")
+        self.client.get("/api/genres/")
+        admin = User.objects.create_user(username="cacheadmin", password="testpass123", is_staff=True)
+        self.client.force_authenticate(admin)
+        stats = self.client.get("/api/cache/stats/").data
+        self.assertGreaterEqual(stats["hits"], 1)
+        self.assertGreaterEqual(stats["misses"], 1)
+
+    def test_filesystem_backend(self):
+        with tempfile.TemporaryDirectory() as location:
+            config = {
+                "BACKEND": "api.cache.FileSystemCacheBackend",
+                "TIMEOUT": 60,
+                "OPTIONS": {"location": location, "max_entries": 100},
+            }
+            with self.settings(RESPONSE_CACHE=config):
+                self.assertEqual(self.client.get("/api/genres/")["X-Cache"], "MISS")
+                self.assertEqual(self.client.get("/api/genres/")["X-Cache"], "HIT")
+                Genre.objects.create(name="Western")
+                self.assertEqual(self.client.get("/api/genres/")["X-Cache"], "MISS")
+
+    def test_data_read_before_a_concurrent_write_is_not_cached(self):
+        cache = get_response_cache()
+
+        @cache_response(lambda view, data: [f"movie:{data['id']}"])
+        def get(view, request, write=False):
+            data = {"id": 1}
+            if write:
+                # Another request's write commits while this view runs.
+                cache.invalidate("movie:1")
+            return Response(data)
+
+        request = RequestFactory().get("/api/movies/1/")
+        self.assertEqual(get(None, request, write=True)["X-Cache"], "MISS")
+        self.assertEqual(get(None, request)["X-Cache"], "MISS")
+        self.assertEqual(get(None, request)["X-Cache"], "HIT")
+
+class AsyncReadViewTest(APITestCase):
+    def setUp(self):
+        get_response_cache().clear()
+        self.factory = RequestFactory()
+        self.user = User.objects.create_user(username="asyncreader", password="testpass123")
+        self.movie = Movie.objects.create(title="Async Movie", release_year=2021)
+        self.movie.genres.add(Genre.objects.create(name="Noir"))
+        Rating.objects.create(movie=self.movie, user=self.user, stars=4)
+        Review.objects.create(movie=self.movie, user=self.user, review_text="Wonderful, brilliant film!")
+        Review.objects.create(movie=self.movie, user=self.user, review_text="Awful and boring.")
+
+    def call(self, view, path, method="get", **kwargs):
+        extra = {key: kwargs.pop(key) for key in list(kwargs) if key.startswith("HTTP_")}
+        request = getattr(self.factory, method)(path, **extra)
+        return async_to_sync(view.as_view())(request, **kwargs)
+
+    def test_async_views_match_viewsets(self):
+        movie_id = self.movie.id
+        cases = [
+            (async_views.MovieListView, "/api/movies/?page_size=1", {}),
+            (async_views.MovieDetailView, f"/api/movies/{movie_id}/", {"pk": movie_id}),
+            (async_views.MovieDetailView, "/api/movies/999999/", {"pk": 999999}),
+            (async_views.MovieAverageRatingView, f"/api/movies/{movie_id}/average-rating/", {"pk": movie_id}),
+            (async_views.ReviewListView, "/api/reviews/?sentiment=Positive", {}),
+            (async_views.ReviewListView, "/api/reviews/?cursor=bogus", {}),
+            (async_views.MovieListView, "/api/movies/?fields=title,genres", {}),
+            (async_views.ReviewListView, "/api/reviews/?fields=sentiment&expand=movie", {}),
+            (async_views.MovieRatingsView, f"/api/ratings/movie/{movie_id}/ratings/", {"movie_id": movie_id}),
+        ]
+        with self.settings(RESPONSE_CACHE={"ENABLED": False, "BACKEND": "api.cache.LRUCacheBackend"}):
+            for view, path, kwargs in cases:
+                with self.subTest(path=path):
+                    expected = self.client.get(path)
+                    response = self.call(view, path, **kwargs)
+                    self.assertEqual(response.status_code, expected.status_code)
+                    self.assertEqual(json.loads(response.content), expected.json())
+
+    def test_cache_auth_and_writes(self):
+        path = f"/api/movies/{self.movie.id}/"
+        first = self.call(async_views.MovieDetailView, path, pk=self.movie.id)
+        self.assertEqual(first["X-Cache"], "MISS")
+        self.assertEqual(self.client.get(path)["X-Cache"], "HIT")
+        not_modified = self.call(async_views.MovieDetailView, path, pk=self.movie.id, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        token = str(RefreshToken.for_user(self.user).access_token)
+        authorized = self.call(async_views.ReviewListView, "/api/reviews/", HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.assertEqual(authorized.status_code, status.HTTP_200_OK)
+        rejected = self.call(async_views.ReviewListView, "/api/reviews/", HTTP_AUTHORIZATION="Bearer nope")
+        self.assertEqual(rejected.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIn("WWW-Authenticate", rejected)
+
+        # Anything but GET is handled by the viewset, permissions included.
+        created = self.call(async_views.MovieListView, "/api/movies/", method="post")
+        self.assertEqual(created.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_view_without_get_answers_405(self):
+        class NoGetView(async_views.AsyncReadView):
+            pass
+
+        response = self.call(NoGetView, "/api/movies/")
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    def test_http_load_driver(self):
+        async def handle(reader, writer):
+            request = await reader.readuntil(b"\r\n\r\n")
+            status_line = b"404 Not Found" if b"/missing" in request else b"200 OK"
+            writer.write(b"HTTP/1.1 " + status_line + b"\r\nContent-Length: 0\r\n\r\n")
+            await writer.drain()
+            writer.close()
+
+        async def run():
+            server = await asyncio.start_server(handle, "127.0.0.1", 0)
+            async with server:
+                port = server.sockets[0].getsockname()[1]
+                return await run_http_load("127.0.0.1", port, ["/ok", "/missing"], 4, 20, client_delay=0.001)
+
+        result = asyncio.run(run())
+        self.assertEqual(result["requests"], 20)
+        self.assertGreater(result["errors"], 0)
+        self.assertEqual(result["error_statuses"], [404])
+
 class MovieSerializerTest(TestCase):
     def setUp(self):
         self.genre = Genre.objects.create(name="Comedy")
@@ -44,6 +673,599 @@ class MovieSerializerTest(TestCase):
         self.assertEqual(data["release_year"], 2022)
         self.assertIn("Comedy", [g.get("name") for g in data["genres"]])
 
+class MovieQueryCountTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="querycount", password="testpass123")
+        self.genres = [Genre.objects.create(name=f"Genre {i}") for i in range(3)]
+
+    def create_movies(self, count):
+        for i in range(count):
+            movie = Movie.objects.create(title=f"Movie {i}", release_year=2000 + i)
+            movie.genres.add(*self.genres)
+            Rating.objects.create(movie=movie, user=self.user, stars=1 + i % 5)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(ctx.captured_queries)
+
+    def test_movie_list_query_count_is_constant(self):
+        self.create_movies(2)
+        small = self.count_queries("/api/movies/")
+        self.create_movies(20)
+        large = self.count_queries("/api/movies/")
+        self.assertEqual(small, large)
+        self.assertLessEqual(large, 2)
+
+    def test_movie_detail_and_average_rating_query_counts(self):
+        self.create_movies(1)
+        movie = Movie.objects.get()
+        self.assertLessEqual(self.count_queries(f"/api/movies/{movie.id}/"), 2)
+        self.assertEqual(self.count_queries(f"/api/movies/{movie.id}/average-rating/"), 1)
+
+class SparseFieldsetTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="sparse", password="testpass123")
+        self.movie = Movie.objects.create(title="Sparse", release_year=2001, description="Long text " * 100)
+        self.movie.genres.add(Genre.objects.create(name="Minimal"))
+        Rating.objects.create(movie=self.movie, user=self.user, stars=4)
+        Review.objects.create(movie=self.movie, user=self.user, review_text="Lean and wonderful.")
+
+    def test_fields_and_expand(self):
+        full = self.client.get("/api/movies/")
+        with self.assertNumQueries(1):
+            sparse = self.client.get("/api/movies/?fields=title,bogus")
+        self.assertEqual(sparse.json()["results"], [{"id": self.movie.id, "title": "Sparse"}])
+        self.assertLess(len(sparse.content), len(full.content) / 10)
+
+        detail = self.client.get(f"/api/movies/{self.movie.id}/?fields=title&expand=rating_histogram").json()
+        self.assertEqual(detail, {
+            "id": self.movie.id, "title": "Sparse", "rating_histogram": {"1": 0, "2": 0, "3": 0, "4": 1, "5": 0},
+        })
+        with self.assertNumQueries(1):
+            reviews = self.client.get("/api/reviews/?fields=sentiment&expand=movie").json()["results"]
+        self.assertEqual(reviews[0]["movie"], {"id": self.movie.id, "title": "Sparse", "release_year": 2001})
+        self.assertEqual(set(reviews[0]), {"id", "sentiment", "movie"})
+
+        # Writes validate and return every field.
+        self.client.force_authenticate(self.user)
+        other = Movie.objects.create(title="Other", release_year=2002)
+        created = self.client.post("/api/ratings/?fields=id", {"movie": other.id, "stars": 5}, format="json")
+        self.assertEqual(set(created.json()), {"id", "movie", "stars", "created_at"})
+
+    def test_renderers_match_drf_json(self):
+        data = {"when": timezone.now(), "amount": Decimal("1.50"), "histogram": {1: 2}, "text": "a\u2028b"}
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        response = self.client.get("/api/movies/", HTTP_ACCEPT="application/msgpack")
+        if renderers.msgpack is None:
+            self.assertEqual(response["Content-Type"], "application/json")
+            return
+        self.assertEqual(response["Content-Type"], "application/msgpack")
+        self.assertIn("Accept", response["Vary"])
+        payload = renderers.msgpack.unpackb(response.content, strict_map_key=False)
+        self.assertEqual(payload["results"][0]["title"], "Sparse")
+
+class MovieBatchTest(APITestCase):
+    def setUp(self):
+        get_response_cache().clear()
+        self.user = User.objects.create_user(username="watchlist", password="testpass123")
+        genre = Genre.objects.create(name="Watchlisted")
+        self.movies = [Movie.objects.create(title=f"Batch {i}", release_year=2000 + i) for i in range(3)]
+        for movie in self.movies:
+            movie.genres.add(genre)
+            Rating.objects.create(movie=movie, user=self.user, stars=3)
+            for text in ("Great film.", "Boring film.", "Lovely film."):
+                Review.objects.create(movie=movie, user=self.user, review_text=text)
+
+    def test_batch_lookup(self):
+        first, second, third = (movie.id for movie in self.movies)
+        with self.assertNumQueries(3):
+            response = self.client.get(f"/api/movies/batch/?ids={third},999999,{first},{third}&reviews=2")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([movie["id"] for movie in response.data["results"]], [third, first])
+        self.assertEqual(response.data["missing"], [999999])
+        movie = response.data["results"][0]
+        self.assertEqual(movie["genres"], [{"id": self.movies[2].genres.get().id, "name": "Watchlisted"}])
+        self.assertEqual((movie["average_rating"], movie["rating_histogram"]["3"]), (3.0, 1))
+        self.assertEqual([review["review_text"] for review in movie["latest_reviews"]], ["Lovely film.", "Boring film."])
+
+        url = f"/api/movies/batch/?ids={second},{first}&fields=title"
+        with self.assertNumQueries(1):
+            self.assertNotIn("latest_reviews", self.client.get(url).data["results"][0])
+        self.assertEqual(self.client.get(url)["X-Cache"], "HIT")
+        Rating.objects.create(movie=self.movies[0], user=User.objects.create_user(username="late"), stars=5)
+        self.assertEqual(self.client.get(url)["X-Cache"], "MISS")
+        self.assertEqual(self.client.get("/api/movies/batch/?ids=1,x").status_code, status.HTTP_400_BAD_REQUEST)
+        too_many = ",".join(str(i) for i in range(1, 202))
+        self.assertEqual(self.client.get(f"/api/movies/batch/?ids={too_many}").status_code, status.HTTP_400_BAD_REQUEST)
+
+class MovieReviewFeedTest(APITestCase):
+    def setUp(self):
+        self.movie = Movie.objects.create(title="Reviewed", release_year=2021)
+        self.other = Movie.objects.create(title="Elsewhere", release_year=2021)
+        self.reviews = []
+        for index, text in enumerate(("Great film!", "Awful film.", "I watched it on Sunday.", "Lovely film!")):
+            author = User.objects.create_user(username=f"critic{index}", password="testpass123")
+            self.reviews.append(Review.objects.create(movie=self.movie, user=author, review_text=text))
+        Review.objects.create(movie=self.other, user=author, review_text="Great film!")
+
+    def test_feed_with_sentiment_counts(self):
+        url = f"/api/movies/{self.movie.id}/reviews/"
+        # The movie with its counts, then one page of reviews joined with their authors.
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["sentiment_counts"], {"Positive": 2, "Negative": 1, "Neutral": 1})
+        self.assertEqual([review["username"] for review in response.data["results"]], [f"critic{i}" for i in range(4)])
+
+        page = self.client.get(f"{url}?sentiment=Positive&page_size=1").data
+        self.assertEqual([review["review_text"] for review in page["results"]], ["Great film!"])
+        self.assertEqual([review["review_text"] for review in self.client.get(page["next"]).data["results"]], ["Lovely film!"])
+        self.assertEqual(self.client.get(f"{url}?sentiment=Happy").status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get("/api/movies/999999/reviews/").status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_counts_follow_review_writes(self):
+        edited = self.reviews[1]
+        edited.review_text = "A great film after all."
+        edited.save()
+        self.reviews[0].delete()
+        ingest_reviews(self.reviews[2].user, [{"movie": self.movie.id, "review_text": "Awful."}])
+        self.movie.refresh_from_db()
+        self.assertEqual(self.movie.sentiment_counts, {"Positive": 2, "Negative": 1, "Neutral": 1})
+        self.other.refresh_from_db()
+        self.assertEqual(self.other.sentiment_counts, {"Positive": 1, "Negative": 0, "Neutral": 0})
+
+        Movie.objects.update(positive_review_count=0)
+        call_command("rebuild_rating_aggregates", stdout=StringIO())
+        self.movie.refresh_from_db()
+        self.assertEqual(self.movie.positive_review_count, 2)
+
+class StatelessAuthTest(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(username="claimsadmin", password="testpass123", is_staff=True)
+
+    def login(self, username="claimsadmin", password="testpass123"):
+        return self.client.post("/api/auth/login/", {"username": username, "password": password}, format="json").data
+
+    def test_user_is_built_from_token_claims(self):
+        access = self.login()["access"]
+        request = RequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {access}")
+        authentication = StatelessJWTAuthentication()
+        with self.settings(JWT_REVOCATION_SYNC_SECONDS=60):
+            authentication.authenticate(request)
+            with self.assertNumQueries(0):
+                user, token = authentication.authenticate(request)
+                self.assertEqual(user.id, self.admin.id)
+                self.assertTrue(user.is_staff)
+                self.assertTrue(user.is_authenticated)
+            with self.assertNumQueries(1):
+                self.assertEqual(user.username, "claimsadmin")
+
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+        response = self.client.post("/api/genres/", {"name": "Claims"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_refresh_picks_up_current_claims(self):
+        refresh = self.login()["refresh"]
+        User.objects.filter(pk=self.admin.pk).update(is_staff=False)
+        access = self.client.post("/api/auth/refresh/", {"refresh": refresh}, format="json").data["access"]
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+        response = self.client.post("/api/genres/", {"name": "Demoted"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_logout_revokes_tokens(self):
+        tokens = self.login()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+        response = self.client.post("/api/auth/logout/", {"refresh": tokens["refresh"]}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.post("/api/genres/", {"name": "After logout"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.client.credentials()
+        response = self.client.post("/api/auth/refresh/", {"refresh": tokens["refresh"]}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.client.post("/api/auth/logout/").status_code, status.HTTP_401_UNAUTHORIZED)
+        # Other workers learn about the revocation from the RevokedToken table.
+        self.assertTrue(RevocationCache(sync_interval=0).is_revoked(AccessToken(tokens["access"], verify=False)["jti"]))
+
+    def test_sync_picks_up_revocations_committed_late(self):
+        revocations = RevocationCache(sync_interval=0, sync_margin=60)
+        self.assertFalse(revocations.is_revoked("late"))
+        # Stamped before that sync, but committed after it: not in id or revoked_at order.
+        RevokedToken.objects.create(jti="late", expires_at=timezone.now() + timedelta(hours=1))
+        RevokedToken.objects.filter(jti="late").update(revoked_at=timezone.now() - timedelta(seconds=30))
+        self.assertTrue(revocations.is_revoked("late"))
+
+@override_settings(LEADERBOARD_PRIOR_RATINGS=2)
+class LeaderboardTest(APITestCase):
+    def setUp(self):
+        self.users = [User.objects.create_user(username=f"fan{i}", password="testpass123") for i in range(4)]
+        self.drama = Genre.objects.create(name="Drama")
+        self.classic = Movie.objects.create(title="Classic", release_year=1970)
+        self.hyped = Movie.objects.create(title="Hyped", release_year=2024)
+        self.obscure = Movie.objects.create(title="Obscure", release_year=2001)
+        self.hyped.genres.add(self.drama)
+        self.obscure.genres.add(self.drama)
+        for user in self.users:
+            Rating.objects.create(movie=self.classic, user=user, stars=5)
+        Rating.objects.create(movie=self.obscure, user=self.users[0], stars=5)
+        Rating.objects.create(movie=self.hyped, user=self.users[0], stars=1)
+        for user in self.users[:3]:
+            Review.objects.create(movie=self.hyped, user=user, review_text="Everyone talks about it")
+        # Old ratings count toward top-rated but not toward trending.
+        Rating.objects.filter(movie=self.classic).update(created_at=timezone.now() - timedelta(days=30))
+
+    def ids(self, path):
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [movie["id"] for movie in response.data["results"]]
+
+    def test_leaderboards(self):
+        call_command("refresh_rankings", settle_seconds=0, stdout=StringIO())
+        # One 5-star rating is pulled further toward the mean than four of them.
+        self.assertEqual(self.ids("/api/leaderboards/top-rated/"), [self.classic.id, self.obscure.id, self.hyped.id])
+        self.assertEqual(self.ids(f"/api/leaderboards/top-rated/?genre={self.drama.id}&limit=1"), [self.obscure.id])
+        self.assertEqual(self.ids("/api/leaderboards/most-reviewed/"), [self.hyped.id])
+        self.assertEqual(self.ids("/api/leaderboards/trending/"), [self.hyped.id, self.obscure.id])
+        self.assertEqual(self.client.get("/api/leaderboards/unknown/").status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_refresh_is_incremental(self):
+        refresh_rankings(settle_seconds=0)
+        self.assertEqual(self.ids("/api/leaderboards/most-reviewed/"), [self.hyped.id])
+        Review.objects.create(movie=self.obscure, user=self.users[0], review_text="Hidden gem")
+        Review.objects.create(movie=self.obscure, user=self.users[1], review_text="Hidden gem")
+        for user in self.users[1:]:
+            Rating.objects.create(movie=self.obscure, user=user, stars=5)
+
+        result = refresh_rankings(settle_seconds=0)
+        self.assertEqual((result["ratings"], result["reviews"]), (3, 2))
+        self.assertEqual(MovieRanking.objects.get(movie=self.hyped).review_count, 3)
+        self.assertEqual(self.ids("/api/leaderboards/most-reviewed/"), [self.hyped.id, self.obscure.id])
+        # Bayesian rating of 4 five-star ratings, with 9 ratings averaging 41/9 as the prior.
+        self.assertAlmostEqual(MovieRanking.objects.get(movie=self.obscure).bayesian_rating, (20 + 2 * 41 / 9) / 6)
+        # Movies without new ratings move with the prior too.
+        self.assertAlmostEqual(MovieRanking.objects.get(movie=self.hyped).bayesian_rating, (1 + 2 * 41 / 9) / 3)
+        self.assertEqual(self.ids("/api/leaderboards/trending/")[0], self.obscure.id)
+        self.assertEqual(refresh_rankings(settle_seconds=0)["reviews"], 0)
+        self.assertEqual(MovieRanking.objects.get(movie=self.obscure).review_count, 2)
+
+    def test_edited_ratings_are_picked_up(self):
+        refresh_rankings(settle_seconds=0)
+        self.assertEqual(self.ids("/api/leaderboards/top-rated/")[-1], self.hyped.id)
+        # An edit keeps the rating's created_at, so no rollup sees it.
+        rating = Rating.objects.get(movie=self.hyped)
+        rating.stars = 5
+        rating.save()
+        refresh_rankings(settle_seconds=0)
+        # Every rating is now 5 stars, and so is the prior.
+        self.assertAlmostEqual(MovieRanking.objects.get(movie=self.hyped).bayesian_rating, 5.0)
+
+class AnalyticsTest(APITestCase):
+    def setUp(self):
+        self.users = [User.objects.create_user(username=f"viewer{i}", password="testpass123") for i in range(3)]
+        self.genre = Genre.objects.create(name="Noir")
+        self.movie = Movie.objects.create(title="Night Streets", release_year=1950)
+        self.movie.genres.add(self.genre)
+        self.today = timezone.localdate()
+        self.last_week = self.today - timedelta(days=7)
+
+    def series(self, path):
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return {date.fromisoformat(bucket["start"]): bucket for bucket in response.data["buckets"]}
+
+    def test_rollups_by_day_and_week(self):
+        Rating.objects.create(movie=self.movie, user=self.users[0], stars=2)
+        Review.objects.create(movie=self.movie, user=self.users[0], review_text="Terrible, boring film.")
+        Rating.objects.filter(user=self.users[0]).update(created_at=timezone.now() - timedelta(days=7))
+        Rating.objects.create(movie=self.movie, user=self.users[1], stars=5)
+        Review.objects.create(movie=self.movie, user=self.users[1], review_text="Great film!")
+        refresh_rankings(settle_seconds=0)
+
+        buckets = self.series(f"/api/analytics/movies/{self.movie.id}/?start={self.last_week}&end={self.today}")
+        self.assertEqual(len(buckets), 8)
+        self.assertEqual(buckets[self.last_week]["rating_histogram"][2], 1)
+        self.assertEqual(buckets[self.today]["rating_count"], 1)
+        self.assertEqual(buckets[self.today]["review_count"], 2)
+        self.assertEqual(buckets[self.today]["sentiment"]["Negative"], 1)
+        self.assertEqual(buckets[self.today - timedelta(days=1)]["rating_count"], 0)
+
+        weeks = self.series(f"/api/analytics/genres/{self.genre.id}/?start={self.last_week}&end={self.today}&granularity=week")
+        self.assertEqual(sum(week["rating_count"] for week in weeks.values()), 2)
+        self.assertEqual(sum(week["average_rating"] > 0 for week in weeks.values()), 2)
+        for start in weeks:
+            self.assertEqual(start.weekday(), 0)
+
+        response = self.client.get(f"/api/analytics/movies/{self.movie.id}/?start={self.today}&end={self.last_week}")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get("/api/analytics/users/1/").status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(SENTIMENT_ASYNC=True)
+    def test_scored_and_deleted_reviews(self):
+        Review.objects.create(movie=self.movie, user=self.users[0], review_text="Great film!")
+        refresh_rankings(settle_seconds=0)
+        path = f"/api/analytics/genres/{self.genre.id}/"
+        self.assertEqual(self.series(path)[self.today]["sentiment"]["Pending"], 1)
+
+        score_pending_reviews(batch_size=10)
+        sentiment = self.series(path)[self.today]["sentiment"]
+        self.assertEqual((sentiment["Pending"], sentiment["Positive"]), (0, 1))
+
+        # Deletes are only picked up by a backfill of the affected days.
+        Review.objects.all().delete()
+        call_command("backfill_rollups", start=self.today, stdout=StringIO())
+        self.assertEqual(self.series(path)[self.today]["review_count"], 0)
+
+class RatingsSnapshotTest(TestCase):
+    def test_snapshot_matches_ratings_table(self):
+        users = [User.objects.create_user(username=f"snap{i}", password="testpass123") for i in range(3)]
+        movies = [Movie.objects.create(title=f"Snap {i}", release_year=2000 + i) for i in range(3)]
+        for user, movie, stars in [(0, 0, 5), (1, 0, 3), (2, 0, 4), (0, 1, 5), (1, 1, 3), (2, 2, 1)]:
+            Rating.objects.create(user=users[user], movie=movies[movie], stars=stars)
+
+        with tempfile.TemporaryDirectory() as directory, self.settings(RATINGS_SNAPSHOT_DIR=f"{directory}/ratings"):
+            call_command("snapshot_ratings", stdout=StringIO())
+            snapshot = get_ratings_snapshot()
+            self.assertEqual(len(snapshot), 6)
+            user_positions, stars = snapshot.movie_ratings(movies[0].id)
+            self.assertTrue(np.shares_memory(stars, snapshot.by_movie_stars))
+            self.assertEqual(
+                sorted(zip(snapshot.user_ids[user_positions].tolist(), stars.tolist())),
+                sorted(Rating.objects.filter(movie=movies[0]).values_list("user_id", "stars")),
+            )
+            movie_positions, stars = snapshot.user_ratings(users[0].id)
+            self.assertEqual(snapshot.movie_ids[movie_positions].tolist(), [movies[0].id, movies[1].id])
+
+            stats = snapshot.movie_stats()
+            for movie in Movie.objects.all():
+                row = snapshot.movie_index(movie.id)
+                self.assertEqual(stats["count"][row], movie.rating_count)
+                self.assertAlmostEqual(stats["mean"][row], movie.average_rating)
+                self.assertEqual(stats["histogram"][row].tolist(), list(movie.rating_histogram.values()))
+
+            # Movies 0 and 1 share two raters who gave the same stars; 2 shares none with 1.
+            similarities = snapshot.similarities(movies[1].id, chunk_size=1)
+            self.assertAlmostEqual(similarities[snapshot.movie_index(movies[1].id)], 1.0)
+            self.assertAlmostEqual(similarities[snapshot.movie_index(movies[0].id)], 34 / (50 ** 0.5 * 34 ** 0.5))
+            self.assertEqual(similarities[snapshot.movie_index(movies[2].id)], 0.0)
+
+            # A new snapshot is picked up by the loader.
+            Rating.objects.create(user=users[2], movie=movies[1], stars=2)
+            call_command("snapshot_ratings", stdout=StringIO())
+            self.assertEqual(len(get_ratings_snapshot()), 7)
+
+class SimilarMoviesTest(APITestCase):
+    def setUp(self):
+        self.users = [User.objects.create_user(username=f"cinephile{i}", password="testpass123") for i in range(3)]
+        space, crime = Genre.objects.create(name="Space"), Genre.objects.create(name="Crime")
+        self.odyssey, self.voyage, self.heist, self.caper = [
+            Movie.objects.create(title=title, release_year=1990) for title in ("Odyssey", "Voyage", "Heist", "Caper")
+        ]
+        for movie, genre in [(self.odyssey, space), (self.voyage, space), (self.heist, crime), (self.caper, crime)]:
+            movie.genres.add(genre)
+        for user in self.users[:2]:
+            for movie in (self.odyssey, self.voyage, self.heist):
+                Rating.objects.create(user=user, movie=movie, stars=5 if movie != self.heist else 1)
+        Rating.objects.create(user=self.users[2], movie=self.caper, stars=4)
+
+    def similar(self, movie):
+        response = self.client.get(f"/api/movies/{movie.id}/similar/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [neighbour["id"] for neighbour in response.data["results"]]
+
+    def test_neighbours_combine_ratings_and_genres(self):
+        with tempfile.TemporaryDirectory() as directory, self.settings(RATINGS_SNAPSHOT_DIR=directory):
+            call_command("refresh_similar_movies", stdout=StringIO())
+            # Same genre and co-rated alike beats co-rated only; no shared rater or genre, no neighbour.
+            self.assertEqual(self.similar(self.odyssey), [self.voyage.id, self.heist.id])
+            self.assertEqual(self.similar(self.caper), [self.heist.id])
+            with self.assertNumQueries(1):
+                self.client.get(f"/api/movies/{self.voyage.id}/similar/?limit=1")
+            self.assertEqual(self.client.get("/api/movies/999999/similar/").status_code, status.HTTP_404_NOT_FOUND)
+
+            output = StringIO()
+            call_command("refresh_similar_movies", stdout=output)
+            self.assertIn("up to date", output.getvalue())
+
+            Rating.objects.create(user=self.users[2], movie=self.heist, stars=4)
+            output = StringIO()
+            call_command("refresh_similar_movies", stdout=output)
+            # Heist changed; Caper, now co-rated with it, and the movies listing it follow.
+            self.assertIn("for 4 movies", output.getvalue())
+            self.assertEqual(self.similar(self.heist)[0], self.caper.id)
+            self.assertEqual(self.similar(self.caper), [self.heist.id])
+            paths = [f"/api/movies/{movie.id}/similar/" for movie in (self.odyssey, self.voyage, self.heist, self.caper)]
+            incremental = [self.client.get(path).data["results"] for path in paths]
+            call_command("refresh_similar_movies", full=True, stdout=StringIO())
+            self.assertEqual([self.client.get(path).data["results"] for path in paths], incremental)
+
+@override_settings(DATABASE_REPLICAS=["replica"], DB_REPLICA_PIN_SECONDS=60)
+class ReplicaRoutingTest(TransactionTestCase):
+    # Not TestCase: reads inside a transaction always go to the primary.
+    def setUp(self):
+        cache.clear()
+        self.writer = User.objects.create_user(username="writer", password="testpass123")
+        self.reader = User.objects.create_user(username="reader", password="testpass123")
+        self.router = PrimaryReplicaRouter()
+
+    def route(self, method, user=None, status_code=200, atomic=False):
+        """The database a read would use while serving the request, through ReplicaRoutingMiddleware."""
+        used = []
+
+        def view(request):
+            if atomic:
+                with transaction.atomic():
+                    used.append(self.router.db_for_read(Movie))
+            else:
+                used.append(self.router.db_for_read(Movie))
+            return HttpResponse(status=status_code)
+
+        request = getattr(RequestFactory(), method)("/api/movies/")
+        if user:
+            request.user = user
+        ReplicaRoutingMiddleware(view)(request)
+        return used[0]
+
+    def test_reads_follow_writes(self):
+        self.assertEqual(self.route("get", self.writer), "replica")
+        self.assertEqual(self.route("get"), "replica")
+        self.assertEqual(self.route("post", self.writer), "default")
+        # Pinned after a successful write; other users keep reading from the replica.
+        self.assertEqual(self.route("get", self.writer), "default")
+        self.assertEqual(self.route("get", self.reader), "replica")
+        self.assertEqual(self.route("post", self.reader, status_code=400), "default")
+        self.assertEqual(self.route("get", self.reader), "replica")
+        with self.settings(DB_REPLICA_PIN_SECONDS=0.01):
+            self.route("delete", self.reader)
+        self.assertEqual(self.route("get", self.reader), "default")
+        time.sleep(0.02)
+        self.assertEqual(self.route("get", self.reader), "replica")
+        self.assertEqual(self.route("get", self.reader, atomic=True), "default")
+        self.assertEqual(self.router.db_for_read(Movie), "default")
+        self.assertEqual(self.router.db_for_write(Movie), "default")
+
+    def test_replica_reads_are_not_cached_right_after_a_write(self):
+        @cache_response(lambda view, data: [f"movie:{data['id']}"])
+        def get(view, request):
+            return Response({"id": 1})
+
+        request = RequestFactory().get("/api/movies/1/")
+        request._db_replica = "replica"
+        with self.settings(RESPONSE_CACHE={"ENABLED": True, "BACKEND": "api.cache.LRUCacheBackend"}):
+            get_response_cache().invalidate("movie:1")
+            # The replica may still answer with the movie from before the write.
+            self.assertEqual(get(None, request)["X-Cache"], "MISS")
+            self.assertEqual(get(None, request)["X-Cache"], "MISS")
+            del request._db_replica
+            self.assertEqual(get(None, request)["X-Cache"], "MISS")
+            self.assertEqual(get(None, request)["X-Cache"], "HIT")
+            with self.settings(DB_REPLICA_PIN_SECONDS=0):
+                request._db_replica = "replica"
+                get_response_cache().invalidate("movie:1")
+                get(None, request)
+                self.assertEqual(get(None, request)["X-Cache"], "HIT")
+
+class RatingUpsertTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="rerater", password="testpass123")
+        self.movie = Movie.objects.create(title="Rerated", release_year=2020)
+        self.url = f"/api/ratings/movie/{self.movie.id}/"
+        self.client.force_authenticate(self.user)
+
+    def test_put_creates_then_updates(self):
+        response = self.client.put(self.url, {"stars": 2}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        rating_id = response.data["id"]
+        response = self.client.put(self.url, {"stars": 5}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data["id"], response.data["stars"]), (rating_id, 5))
+        self.movie.refresh_from_db()
+        self.assertEqual((self.movie.rating_count, self.movie.rating_sum), (1, 5))
+        self.assertEqual(self.movie.rating_histogram, {1: 0, 2: 0, 3: 0, 4: 0, 5: 1})
+        self.assertEqual(self.client.put(self.url, {"stars": 6}, format="json").status_code, 400)
+        self.assertEqual(self.client.put("/api/ratings/movie/999999/", {"stars": 1}, format="json").status_code, 404)
+
+    def test_idempotency_key_replays_response(self):
+        headers = {"HTTP_IDEMPOTENCY_KEY": "retry-1"}
+        first = self.client.put(self.url, {"stars": 4}, format="json", **headers)
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.client.put(self.url, {"stars": 1}, format="json")
+        retry = self.client.put(self.url, {"stars": 4}, format="json", **headers)
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(retry.json(), first.json())
+        # The retry had no effect: the rating sent without a key stands.
+        self.assertEqual(Rating.objects.get(user=self.user).stars, 1)
+        reused = self.client.put(self.url, {"stars": 3}, format="json", **headers)
+        self.assertEqual(reused.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        with self.settings(IDEMPOTENCY_KEY_TTL_HOURS=0):
+            self.assertEqual(self.client.put(self.url, {"stars": 3}, format="json", **headers).status_code, 200)
+
+class RatingUpsertConcurrencyTest(TransactionTestCase):
+    # Hundreds of raters of one movie, a thread each, with and without an
+    # Idempotency-Key. SQLite's in-memory test database does not take
+    # concurrent writers, so this runs in a subprocess with a database file.
+    script = """
+import json, sys
+from concurrent.futures import ThreadPoolExecutor
+import django
+from django.conf import settings
+settings.DATABASES = {"default": {
+    "ENGINE": "django.db.backends.sqlite3", "NAME": sys.argv[1],
+    "OPTIONS": {"timeout": 60, "transaction_mode": "IMMEDIATE"},
+}}
+settings.ALLOWED_HOSTS = ["testserver"]
+django.setup()
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Count, Sum
+from rest_framework.test import APIClient
+from api.models import Movie, Rating
+call_command("migrate", verbosity=0)
+movie = Movie.objects.create(title="Hot", release_year=2020)
+users = User.objects.bulk_create([User(username=f"fan{i}") for i in range(int(sys.argv[2]))])
+
+def rate(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    try:
+        return [
+            client.put(f"/api/ratings/movie/{movie.id}/", {"stars": stars}, format="json", **headers).status_code
+            for stars, headers in ((1, {}), (5, {"HTTP_IDEMPOTENCY_KEY": f"{user.id}"}), (user.id % 5 + 1, {}))
+        ]
+    finally:
+        connection.close()
+
+with ThreadPoolExecutor(max_workers=32) as pool:
+    statuses = list(pool.map(rate, users))
+movie.refresh_from_db()
+ratings = Rating.objects.filter(movie=movie).aggregate(count=Count("id"), total=Sum("stars"))
+print(json.dumps({
+    "statuses": sorted(set(map(tuple, statuses))),
+    "movie": [movie.rating_count, movie.rating_sum],
+    "ratings": [ratings["count"], ratings["total"]],
+}))
+"""
+
+    def test_hundreds_of_parallel_raters(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        output = subprocess.run(
+            [sys.executable, "-c", self.script, f"{directory.name}/raters.sqlite3", "200"],
+            capture_output=True, text=True, check=True,
+        ).stdout
+        result = json.loads(output.splitlines()[-1])
+        self.assertEqual(result["statuses"], [[201, 200, 200]])
+        self.assertEqual(result["movie"], result["ratings"])
+        self.assertEqual(result["ratings"][0], 200)
+
+    @skipUnlessDBFeature("has_select_for_update")
+    def test_parallel_raters_on_one_movie(self):
+        movie = Movie.objects.create(title="Hot", release_year=2020)
+        users = [User.objects.create_user(username=f"fan{i}", password="testpass123") for i in range(16)]
+
+        def rate(user):
+            client = APIClient()
+            client.force_authenticate(user)
+            try:
+                statuses = [
+                    client.put(f"/api/ratings/movie/{movie.id}/", {"stars": stars}, format="json").status_code
+                    for stars in (1, 5, user.id % 5 + 1)
+                ]
+            finally:
+                connection.close()
+            return statuses
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(rate, users))
+        self.assertEqual(results, [[201, 200, 200]] * len(users))
+        movie.refresh_from_db()
+        expected = Rating.objects.filter(movie=movie).aggregate(count=Count("id"), total=Sum("stars"))
+        self.assertEqual((movie.rating_count, movie.rating_sum), (16, expected["total"]))
+        self.assertEqual(expected["count"], 16)
+
 class APITest(APITestCase):
     def setUp(self):
         self.client = APIClient()
@@ -92,7 +1314,7 @@ class APITest(APITestCase):
     def test_list_movies_unauthenticated(self):
         response = self.client.get("/api/movies/")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertGreaterEqual(len(response.data), 1)
+        self.assertGreaterEqual(len(response.data["results"]), 1)
 
     def test_create_movie_admin(self):
         self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.admin_token}")
@@ -135,8 +1357,8 @@ class APITest(APITestCase):
         Review.objects.create(movie=self.movie, user=self.user, review_text="Great film!")
         response = self.client.get("/api/reviews/?sentiment=Positive")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertGreaterEqual(len(response.data), 1)
-        for review in response.data:
+        self.assertGreaterEqual(len(response.data["results"]), 1)
+        for review in response.data["results"]:
             self.assertEqual(review.get("sentiment"), "Positive")
 
     def test_movie_average_rating(self):
@@ -145,11 +1367,47 @@ class APITest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(float(response.data["average_rating"]), 5.0)
 
+    def test_movie_average_rating_reads_denormalized_values(self):
+        Rating.objects.create(movie=self.movie, user=self.user, stars=3)
+        with self.assertNumQueries(1):
+            response = self.client.get(f"/api/movies/{self.movie.id}/average-rating/")
+        self.assertEqual(response.data["rating_count"], 1)
+        self.assertEqual(response.data["rating_histogram"][3], 1)
+
     def test_movie_ratings(self):
         Rating.objects.create(movie=self.movie, user=self.user, stars=4)
         response = self.client.get(f"/api/ratings/movie/{self.movie.id}/ratings/")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertGreaterEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]["stars"], 4)
+        self.assertGreaterEqual(len(response.data["results"]), 1)
+        self.assertEqual(response.data["results"][0]["stars"], 4)
+
+    def test_keyset_pagination_walks_all_pages(self):
+        for i in range(5):
+            Review.objects.create(movie=self.movie, user=self.user, review_text=f"Review {i}")
+        seen = []
+        url = "/api/reviews/?page_size=2"
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.data["results"]), 2)
+            seen.extend(review["id"] for review in response.data["results"])
+            url = response.data["next"]
+        self.assertEqual(seen, list(Review.objects.order_by("id").values_list("id", flat=True)))
+
+        response = self.client.get(f"/api/reviews/?page_size=2&cursor={response.wsgi_request.GET['cursor']}")
+        previous = self.client.get(response.data["previous"])
+        self.assertEqual([r["id"] for r in previous.data["results"]], seen[-3:-1])
+
+    def test_keyset_pagination_rejects_bad_cursor(self):
+        response = self.client.get("/api/reviews/?cursor=not-a-cursor")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_page_size_is_capped(self):
+        with self.settings(API_MAX_PAGE_SIZE=1):
+            Rating.objects.create(movie=self.movie, user=self.user, stars=4)
+            Rating.objects.create(movie=self.movie, user=self.admin, stars=2)
+            response = self.client.get(f"/api/ratings/movie/{self.movie.id}/ratings/?page_size=100")
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertIsNotNone(response.data["next"])
 
         
\ No newline at end of file
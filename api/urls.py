@@ -1,13 +1,34 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import MovieViewSet, ReviewViewSet, RatingViewSet
+from . import async_views
+from .views import (
+    AnalyticsView, ExportView, GenreViewSet, LeaderboardView, MovieViewSet, ReviewViewSet, RatingViewSet, SearchView,
+    cache_stats_view,
+)
 
 router = DefaultRouter()
 router.register(r'movies', MovieViewSet, basename='movie')
+router.register(r'genres', GenreViewSet, basename='genre')
 router.register(r'reviews', ReviewViewSet, basename='review')
 router.register(r'ratings', RatingViewSet, basename='rating')
 
-urlpatterns = [
+# Native async GET handlers for the hot read paths; the other methods on these
+# URLs are passed through to the viewsets.
+async_urlpatterns = [
+    path('movies/', async_views.MovieListView.as_view()),
+    path('movies/<int:pk>/', async_views.MovieDetailView.as_view()),
+    path('movies/<int:pk>/average-rating/', async_views.MovieAverageRatingView.as_view()),
+    path('reviews/', async_views.ReviewListView.as_view()),
+    path('ratings/movie/<int:movie_id>/ratings/', async_views.MovieRatingsView.as_view()),
+] if settings.API_ASYNC_READS else []
+
+urlpatterns = async_urlpatterns + [
     path('', include(router.urls)),
+    path('cache/stats/', cache_stats_view, name='cache-stats'),
+    path('export/<str:resource>/', ExportView.as_view(), name='export'),
+    path('search/', SearchView.as_view(), name='search'),
+    path('leaderboards/<str:kind>/', LeaderboardView.as_view(), name='leaderboard'),
+    path('analytics/<str:resource>/<int:pk>/', AnalyticsView.as_view(), name='analytics'),
     path('ratings/movie/<int:movie_id>/ratings/', RatingViewSet.as_view({'get': 'movie_ratings'}), name='rating-movie-ratings'),
 ]
\ No newline at end of file
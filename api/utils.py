@@ -0,0 +1,33 @@
+import asyncio
+from itertools import islice
+from asgiref.sync import sync_to_async
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def in_event_loop():
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+async def aiterate(iterable):
+    """
+    Iterate a sync iterable from async code, each item pulled on a worker
+    thread. Under ASGI, a StreamingHttpResponse reads a sync iterator into
+    memory whole before sending the first byte.
+    """
+    iterator = iter(iterable)
+    done = object()
+    try:
+        while (item := await sync_to_async(next)(iterator, done)) is not done:
+            yield item
+    finally:
+        if hasattr(iterator, 'close'):
+            await sync_to_async(iterator.close)()
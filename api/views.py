@@ -1,18 +1,64 @@
 from django.shortcuts import render
-from django.http import JsonResponse  # Added for welcome_view
+from django.conf import settings
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse  # JsonResponse for welcome_view
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Prefetch
+from django.utils.crypto import constant_time_compare
 from rest_framework import viewsets, permissions, generics, status, serializers
-from rest_framework.decorators import action, api_view
+from collections import Counter
+from collections.abc import Iterator
+from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.parsers import JSONParser
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework.views import APIView
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
 from django_filters.rest_framework import DjangoFilterBackend
 from django.contrib.auth.models import User
-from django.db.models import Avg
-from .models import Movie, Genre, Review, Rating
-from .serializers import MovieSerializer, GenreSerializer, ReviewSerializer, RatingSerializer
+from .models import Movie, MovieSimilarity, Genre, Review, Rating
+from .serializers import (
+    MovieSerializer, GenreSerializer, ReviewSerializer, RatingSerializer,
+    MovieSearchResultSerializer, ReviewSearchResultSerializer, SearchQuerySerializer,
+    LeaderboardEntrySerializer, LeaderboardQuerySerializer, AnalyticsBucketSerializer, AnalyticsQuerySerializer,
+    SimilarMovieSerializer, SimilarMoviesQuerySerializer, RatingUpsertSerializer, MovieBatchQuerySerializer,
+    MovieBatchSerializer, MovieReviewsQuerySerializer, fieldset_queryset,
+)
+from .auth import ClaimsRefreshToken, revoke_token
+from .cache import (
+    analytics_tags, average_rating_tags, cache_response, genre_tags, get_response_cache, leaderboard_tags,
+    movie_batch_tags, movie_tags, similar_movie_tags,
+)
+from .exports import EXPORT_FIELDS, export_queryset, export_rows, stream_csv, stream_ndjson
+from .idempotency import idempotent_response
+from .ingest import ingest_ratings, ingest_reviews, upsert_rating
+from .metrics import render_metrics
+from .pagination import RankedPagination
+from .parsers import NDJSONParser
+from .rankings import LEADERBOARDS, leaderboard
+from .renderers import CSVRenderer, NDJSONRenderer
+from .rollups import ROLLUPS, refreshed_through, rollup_series
+from .search import get_search_backend, search_filters
+from .utils import aiterate
+
+def bulk_ingest_response(request, ingest):
+    rows = request.data
+    # A JSON array, or the lazy row iterator of the NDJSON parser.
+    if not isinstance(rows, (list, Iterator)):
+        return Response(
+            {'detail': 'Expected a JSON array or NDJSON stream of rows.'},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    results = ingest(request.user, rows)
+    summary = Counter(result['status'] for result in results)
+    return Response(
+        {'summary': summary, 'results': results},
+        status=status.HTTP_207_MULTI_STATUS if summary['error'] else status.HTTP_201_CREATED,
+    )
 
 class IsOwnerOrAdmin(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
-        return obj.user == request.user or request.user.is_staff
+        # Compare ids: the user from the token's claims is never loaded, and neither is obj.user.
+        return obj.user_id == request.user.id or request.user.is_staff
 
 class MovieViewSet(viewsets.ModelViewSet):
     queryset = Movie.objects.all().order_by('id')
@@ -24,15 +70,113 @@ class MovieViewSet(viewsets.ModelViewSet):
             return [permissions.IsAdminUser()]
         return super().get_permissions()
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        # Average rating and review counts are denormalized onto Movie, so genres
+        # are the only relation the serializer needs resolved up front, if it
+        # returns them.
+        if self.action not in ('average_rating', 'reviews'):
+            queryset = fieldset_queryset(queryset, self.get_serializer_class(), self.request)
+        return queryset
+
+    @cache_response(movie_tags)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @cache_response(movie_tags)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
     @action(detail=True, methods=['get'], url_path='average-rating')
+    @cache_response(average_rating_tags)
     def average_rating(self, request, pk=None):
         movie = self.get_object()
-        ratings = Rating.objects.filter(movie=movie)
-        avg_rating = ratings.aggregate(Avg('stars'))['stars__avg'] or 0.0
-        return Response({'average_rating': avg_rating}, status=status.HTTP_200_OK)
+        return Response({
+            'average_rating': movie.average_rating,
+            'rating_count': movie.rating_count,
+            'rating_histogram': movie.rating_histogram,
+        }, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'])
+    def batch(self, request):
+        """
+        Movies by ?ids= (comma-separated, at most 200) in the order given,
+        with rating stats and, with ?reviews=N, the N latest reviews of
+        each; ids without a movie are listed under "missing".
+        """
+        params = MovieBatchQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        if params.validated_data['reviews']:
+            # Review writes do not invalidate cached movie responses.
+            return self.batch_response(request, **params.validated_data)
+        return self.cached_batch_response(request, **params.validated_data)
+
+    @cache_response(movie_batch_tags)
+    def cached_batch_response(self, request, **params):
+        return self.batch_response(request, **params)
+
+    def batch_response(self, request, ids, reviews):
+        queryset = fieldset_queryset(Movie.objects.all(), MovieBatchSerializer, request)
+        if reviews:
+            # A sliced prefetch: one query for the latest reviews of every movie.
+            queryset = queryset.prefetch_related(
+                Prefetch(
+                    'reviews', queryset=Review.objects.select_related('user').order_by('-id')[:reviews],
+                    to_attr='latest_reviews',
+                )
+            )
+        found = queryset.in_bulk(ids)
+        movies = [found[movie_id] for movie_id in ids if movie_id in found]
+        results = MovieBatchSerializer(movies, many=True, context={'request': request}).data
+        if reviews:
+            latest = ReviewSerializer([review for movie in movies for review in movie.latest_reviews], many=True).data
+            start = 0
+            for movie, result in zip(movies, results):
+                result['latest_reviews'] = latest[start:start + len(movie.latest_reviews)]
+                start += len(movie.latest_reviews)
+        return Response({'results': results, 'missing': [movie_id for movie_id in ids if movie_id not in found]})
+
+    @action(detail=True, methods=['get'])
+    def reviews(self, request, pk=None):
+        """
+        The movie's reviews, oldest first, a keyset page at a time and
+        optionally filtered by ?sentiment=, headed by its review counts per
+        sentiment.
+        """
+        params = MovieReviewsQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        movie = self.get_object()
+        reviews = fieldset_queryset(Review.objects.filter(movie_id=movie.pk), ReviewSerializer, request)
+        if 'sentiment' in params.validated_data:
+            reviews = reviews.filter(sentiment=params.validated_data['sentiment'])
+        page = self.paginate_queryset(reviews)
+        return Response({
+            'movie': movie.pk,
+            'sentiment_counts': movie.sentiment_counts,
+            **self.paginator.get_paginated_data(
+                ReviewSerializer(page, many=True, context=self.get_serializer_context()).data
+            ),
+        })
+
+    @action(detail=True, methods=['get'])
+    @cache_response(similar_movie_tags)
+    def similar(self, request, pk=None):
+        """The movie's nearest neighbours, precomputed by `manage.py refresh_similar_movies`; ?limit= (default 10)."""
+        if not pk.isdigit():
+            raise Http404
+        params = SimilarMoviesQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        neighbours = list(
+            MovieSimilarity.objects.filter(movie_id=pk).select_related('similar')
+            .order_by('-score', 'similar_id')[:params.validated_data['limit']]
+        )
+        if not neighbours:
+            # Tell unknown movies apart from ones without neighbours.
+            self.get_object()
+        return Response({'results': SimilarMovieSerializer(neighbours, many=True, context={'request': request}).data})
 
 class GenreViewSet(viewsets.ModelViewSet):
-    queryset = Genre.objects.all()
+    queryset = Genre.objects.all().order_by('id')
     serializer_class = GenreSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
@@ -41,6 +185,14 @@ class GenreViewSet(viewsets.ModelViewSet):
             return [permissions.IsAdminUser()]
         return super().get_permissions()
 
+    @cache_response(genre_tags)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @cache_response(genre_tags)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
 class ReviewViewSet(viewsets.ModelViewSet):
     queryset = Review.objects.all().order_by('id')
     serializer_class = ReviewSerializer
@@ -48,6 +200,9 @@ class ReviewViewSet(viewsets.ModelViewSet):
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['sentiment']
 
+    def get_queryset(self):
+        return fieldset_queryset(super().get_queryset(), self.get_serializer_class(), self.request)
+
     def get_permissions(self):
         if self.action == 'destroy':
             return [IsOwnerOrAdmin()]
@@ -56,19 +211,166 @@ class ReviewViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    @action(detail=False, methods=['post'], url_path='bulk', parser_classes=[JSONParser, NDJSONParser])
+    def bulk(self, request):
+        return bulk_ingest_response(request, ingest_reviews)
+
 class RatingViewSet(viewsets.ModelViewSet):
     queryset = Rating.objects.all().order_by('id')
     serializer_class = RatingSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
+    def get_queryset(self):
+        return fieldset_queryset(super().get_queryset(), self.get_serializer_class(), self.request)
+
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    @action(detail=False, methods=['post'], url_path='bulk', parser_classes=[JSONParser, NDJSONParser])
+    def bulk(self, request):
+        return bulk_ingest_response(request, ingest_ratings)
+
+    @action(detail=False, methods=['put'], url_path=r'movie/(?P<movie_id>\d+)')
+    def upsert(self, request, movie_id=None):
+        """Set the user's rating of a movie, creating it if needed; honours Idempotency-Key."""
+        params = RatingUpsertSerializer(data=request.data)
+        params.is_valid(raise_exception=True)
+        if not Movie.objects.filter(pk=movie_id).exists():
+            raise Http404('No Movie matches the given query.')
+
+        changes = []
+
+        def handler():
+            rating, created = upsert_rating(request.user, int(movie_id), params.validated_data['stars'], changes)
+            return (
+                status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+                self.get_serializer(rating).data,
+            )
+        # Every rater of the movie updates its row: do it last, after the idempotency record.
+        return idempotent_response(request, handler, then=lambda: Movie.apply_rating_changes(changes))
+
     @action(detail=False, methods=['get'], url_path=r'movie/(?P<movie_id>\d+)/ratings')
     def movie_ratings(self, request, movie_id=None):
-        ratings = Rating.objects.filter(movie_id=movie_id)
-        serializer = self.get_serializer(ratings, many=True)
-        return Response(serializer.data)
+        ratings = self.get_queryset().filter(movie_id=movie_id)
+        page = self.paginate_queryset(ratings)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+class ExportView(APIView):
+    """
+    Stream movies, reviews or ratings as NDJSON (default) or CSV (?format=csv).
+
+    Supports ?sentiment=, ?movie=, ?genre=, ?created_after=, ?created_before=
+    and ?after_id=, the last id received, to resume an interrupted export.
+    """
+    permission_classes = [permissions.IsAdminUser]
+    renderer_classes = [NDJSONRenderer, CSVRenderer]
+
+    def get(self, request, resource):
+        if resource not in EXPORT_FIELDS:
+            return Response({'detail': f'Unknown export "{resource}".'}, status=status.HTTP_404_NOT_FOUND)
+        chunks = export_rows(resource, export_queryset(resource, request.query_params))
+        renderer = request.accepted_renderer
+        if renderer.format == 'csv':
+            content = stream_csv(resource, chunks)
+        else:
+            content = stream_ndjson(chunks)
+        if isinstance(request._request, ASGIRequest):
+            content = aiterate(content)
+        response = StreamingHttpResponse(content, content_type=f'{renderer.media_type}; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="{resource}.{renderer.format}"'
+        return response
+
+class SearchView(APIView):
+    """
+    Ranked full-text search: ?q=<words>&type=movies (default) or reviews.
+
+    Movies match on title and description, reviews on their text. Results
+    can be narrowed with ?genre= and ?year= (of the movie) and, for reviews,
+    ?sentiment= and ?movie=.
+    """
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = RankedPagination
+    results = {
+        'movies': (Movie.objects.all(), MovieSearchResultSerializer),
+        'reviews': (Review.objects.all(), ReviewSearchResultSerializer),
+    }
+
+    def get(self, request):
+        params = SearchQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        filters = dict(params.validated_data)
+        kind, text = filters.pop('type'), filters.pop('q')
+        matches = get_search_backend().search(kind, text, search_filters(kind, **filters))
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(matches, request, view=self)
+        queryset, serializer_class = self.results[kind]
+        objects = fieldset_queryset(queryset, serializer_class, request).in_bulk([pk for pk, _ in page])
+        hits = []
+        for pk, rank in page:
+            if pk in objects:
+                objects[pk].rank = rank
+                hits.append(objects[pk])
+        return paginator.get_paginated_response(
+            serializer_class(hits, many=True, context={'request': request}).data
+        )
+
+class LeaderboardView(APIView):
+    """
+    Top movies from the precomputed rankings: top-rated (Bayesian average),
+    most-reviewed or trending (recent rating velocity).
+
+    ?genre=<id> restricts the board to a genre and ?limit= sets its length
+    (default 10, at most 100). Rankings are as fresh as the last
+    `manage.py refresh_rankings` run, reported as refreshed_through.
+    """
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+
+    @cache_response(leaderboard_tags)
+    def get(self, request, kind):
+        if kind not in LEADERBOARDS:
+            raise Http404
+        params = LeaderboardQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        genre = params.validated_data.get('genre')
+        entries = leaderboard(kind, genre=genre, limit=params.validated_data['limit'])
+        return Response({
+            'kind': kind,
+            'genre': genre.id if genre else None,
+            'refreshed_through': refreshed_through(),
+            'results': LeaderboardEntrySerializer(entries, many=True, context={'request': request}).data,
+        })
+
+class AnalyticsView(APIView):
+    """
+    Daily or weekly rating distribution and sentiment mix of a movie or a
+    genre, read from the rollup tables: /api/analytics/<movies|genres>/<id>/.
+
+    ?start= and ?end= (dates, inclusive) default to the last 30 days and
+    ?granularity= is day (default) or week. Rows reach the rollups at the
+    next `manage.py refresh_rankings` run, reported as refreshed_through.
+    """
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+
+    @cache_response(analytics_tags)
+    def get(self, request, resource, pk):
+        if resource not in ROLLUPS:
+            raise Http404
+        model, rollup_model, key = ROLLUPS[resource]
+        if not model.objects.filter(pk=pk).exists():
+            raise Http404
+        params = AnalyticsQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        start, end, granularity = (params.validated_data[name] for name in ('start', 'end', 'granularity'))
+        buckets = rollup_series(rollup_model, start, end, granularity, **{key: pk})
+        return Response({
+            key: pk,
+            'granularity': granularity,
+            'start': start,
+            'end': end,
+            'refreshed_through': refreshed_through(),
+            'buckets': AnalyticsBucketSerializer(buckets, many=True, context={'request': request}).data,
+        })
 
 class RegisterSerializer(serializers.Serializer):
     username = serializers.CharField(max_length=150)
@@ -91,12 +393,50 @@ class RegisterView(generics.CreateAPIView):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         user = serializer.save()
-        refresh = RefreshToken.for_user(user)
+        refresh = ClaimsRefreshToken.for_user(user)
         return Response({
             'refresh': str(refresh),
             'access': str(refresh.access_token),
         }, status=status.HTTP_201_CREATED)
 
+class LogoutView(APIView):
+    """
+    Revoke the access token used for the request and, if sent, the refresh token.
+
+    Revoked tokens are rejected by every worker within JWT_REVOCATION_SYNC_SECONDS.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        refresh = None
+        if request.data.get('refresh'):
+            try:
+                refresh = ClaimsRefreshToken(request.data['refresh'])
+            except TokenError as exc:
+                return Response({'refresh': [str(exc)]}, status=status.HTTP_400_BAD_REQUEST)
+            if str(refresh[api_settings.USER_ID_CLAIM]) != str(request.user.id):
+                return Response({'refresh': ['Token belongs to another user.']}, status=status.HTTP_400_BAD_REQUEST)
+        if request.auth is not None:
+            revoke_token(request.auth)
+        if refresh is not None:
+            revoke_token(refresh)
+        return Response({'message': 'Logged out'}, status=status.HTTP_200_OK)
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def cache_stats_view(request):
+    return Response(get_response_cache().stats_dict())
+
+def metrics_view(request):
+    config = settings.API_METRICS
+    if not config['ENABLED']:
+        raise Http404
+    if config['TOKEN'] and not constant_time_compare(
+        request.headers.get('Authorization', ''), f'Bearer {config["TOKEN"]}'
+    ):
+        return HttpResponse(status=status.HTTP_401_UNAUTHORIZED)
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 @api_view(['GET'])
 def welcome_view(request):
     return JsonResponse({
@@ -0,0 +1,105 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.urls import get_resolver
+from rest_framework.settings import api_settings
+from .auth import get_revocation_cache
+from .utils import in_event_loop
+
+logger = logging.getLogger(__name__)
+
+# The DRF classes imported lazily on the first request through a view.
+DRF_SETTINGS = (
+    'DEFAULT_RENDERER_CLASSES', 'DEFAULT_PARSER_CLASSES', 'DEFAULT_AUTHENTICATION_CLASSES',
+    'DEFAULT_PERMISSION_CLASSES', 'DEFAULT_PAGINATION_CLASS', 'DEFAULT_FILTER_BACKENDS',
+)
+
+
+def load_urls():
+    # Imports every view, serializer and the modules they use.
+    get_resolver().url_patterns
+    for name in DRF_SETTINGS:
+        getattr(api_settings, name)
+
+
+def load_analyzer():
+    from .sentiment import get_analyzer
+    get_analyzer()
+
+
+def load_caches():
+    from .cache import get_response_cache
+    from .search import get_search_backend
+    from .snapshots import get_ratings_snapshot
+    get_response_cache()
+    get_search_backend()
+    get_ratings_snapshot()
+
+
+def connect_databases():
+    """
+    Connect to every database: this thread's connection stays open when
+    persistent (DB_CONN_MAX_AGE), and with DB_POOL the pool is opened and
+    the connection handed back to it. Tokens revoked by other workers are
+    loaded on the way. Database errors are logged rather than raised: an
+    unmigrated or unreachable database must not stop the server from
+    starting, and the first requests retry the work anyway.
+    """
+    try:
+        get_revocation_cache().sync()
+    except DatabaseError:
+        logger.warning('Warm-up could not load the revoked tokens', exc_info=True)
+    for alias in connections:
+        connection = connections[alias]
+        try:
+            connection.ensure_connection()
+        except DatabaseError:
+            logger.warning('Warm-up could not connect to database %r', alias, exc_info=True)
+        else:
+            connection.close_if_unusable_or_obsolete()
+
+
+def connect_databases_off_loop():
+    """
+    connect_databases() on a thread of its own: uvicorn imports the
+    application on its event loop, where the ORM is off limits. The
+    thread's connections are closed again, so this pays off with DB_POOL.
+    """
+    def connect():
+        connect_databases()
+        connections.close_all()
+
+    with ThreadPoolExecutor(1) as executor:
+        executor.submit(connect).result()
+
+
+def warm_up(connect=True):
+    """
+    Do the work a fresh server process would otherwise do during its first
+    requests. Returns the seconds each step took.
+    """
+    steps = [('urls', load_urls), ('caches', load_caches)]
+    if not settings.SENTIMENT_ASYNC:
+        # Reviews are scored in the request; otherwise only the queue workers need it.
+        steps.append(('analyzer', load_analyzer))
+    if connect:
+        steps.append(('databases', connect_databases_off_loop if in_event_loop() else connect_databases))
+    timings = {}
+    for name, step in steps:
+        started = time.perf_counter()
+        step()
+        timings[name] = time.perf_counter() - started
+    logger.info(
+        'Warmed up in %.0f ms (%s)', sum(timings.values()) * 1000,
+        ', '.join(f'{name} {seconds * 1000:.0f} ms' for name, seconds in timings.items()),
+    )
+    return timings
+
+
+def warm_up_from_settings():
+    """warm_up() as configured by API_WARMUP and API_WARMUP_CONNECT, for the server entry points."""
+    if settings.API_WARMUP:
+        return warm_up(connect=settings.API_WARMUP_CONNECT)
+    return {}
@@ -0,0 +1,251 @@
+import json
+import logging
+import multiprocessing
+import os
+import time
+from collections import Counter, defaultdict
+import django
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connection, connections, transaction
+from django.db.models import Max, Min
+from .models import Movie, Review, Sentiment
+from .rollups import apply_sentiment_changes
+from .sentiment import classify_many
+from .utils import chunked
+
+logger = logging.getLogger(__name__)
+
+
+def score_pending_reviews(batch_size=None):
+    """
+    Claim up to ``batch_size`` pending reviews, score them and write the
+    labels back in one bulk UPDATE. Returns the number of reviews scored.
+
+    The review table itself is the queue: rows with a 'Pending' sentiment are
+    waiting to be scored. On backends that support it, claimed rows are
+    locked with SKIP LOCKED so several workers can drain the queue at once.
+    """
+    batch_size = batch_size or settings.SENTIMENT_BATCH_SIZE
+    with transaction.atomic():
+        queryset = (
+            Review.objects.filter(sentiment=Sentiment.PENDING.value)
+            .order_by('id')
+            .only('id', 'movie_id', 'review_text', 'created_at')
+        )
+        if connection.features.has_select_for_update_skip_locked:
+            queryset = queryset.select_for_update(skip_locked=True)
+        reviews = list(queryset[:batch_size])
+        if not reviews:
+            return 0
+        labels = classify_many([review.review_text for review in reviews])
+        for review, label in zip(reviews, labels):
+            review.sentiment = label
+        Review.objects.bulk_update(reviews, ['sentiment'])
+        Movie.apply_review_changes([(review.movie_id, review.sentiment, 1) for review in reviews])
+        apply_sentiment_changes([
+            (review.movie_id, review.created_at, Sentiment.PENDING.value, review.sentiment) for review in reviews
+        ])
+    return len(reviews)
+
+
+def run_worker(batch_size=None, poll_interval=1.0, stop_event=None, drain=False):
+    """Score pending reviews until stopped, or until the queue is empty if ``drain``."""
+    stop_event = stop_event or multiprocessing.Event()
+    scored = 0
+    while not stop_event.is_set():
+        close_old_connections()
+        try:
+            processed = score_pending_reviews(batch_size)
+        except DatabaseError:
+            logger.exception('Failed to score a batch of pending reviews')
+            stop_event.wait(poll_interval)
+            continue
+        scored += processed
+        if not processed:
+            if drain:
+                break
+            stop_event.wait(poll_interval)
+    connection.close()
+    return scored
+
+
+def _worker_main(batch_size, poll_interval, stop_event, drain):
+    # No-op when the process was forked from an already configured parent.
+    django.setup()
+    run_worker(batch_size, poll_interval, stop_event, drain)
+
+
+class SentimentWorkerPool:
+    """A fixed pool of worker processes draining the pending-sentiment queue."""
+
+    def __init__(self, workers=2, batch_size=None, poll_interval=1.0, drain=False):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.drain = drain
+        self.stop_event = multiprocessing.Event()
+        self.processes = []
+
+    def start(self):
+        # Connections must not be shared with forked children.
+        connections.close_all()
+        for index in range(self.workers):
+            process = multiprocessing.Process(
+                target=_worker_main,
+                args=(self.batch_size, self.poll_interval, self.stop_event, self.drain),
+                name=f'sentiment-worker-{index}',
+                daemon=True,
+            )
+            process.start()
+            self.processes.append(process)
+
+    def join(self, timeout=None):
+        for process in self.processes:
+            process.join(timeout)
+
+    def stop(self, timeout=10):
+        self.stop_event.set()
+        self.join(timeout)
+        for process in self.processes:
+            if process.is_alive():
+                process.terminate()
+
+
+def rescore_chunk(start, end, dry_run=False, batch_size=1000, max_writes_per_second=None):
+    """
+    Re-score the scored reviews with ids in [start, end) with the current
+    analyzer and settings. Returns the chunk's bounds, the number of reviews
+    scanned and a Counter of (old label, new label) transitions.
+
+    Only reviews whose label changes are written: one UPDATE per new label
+    and ``batch_size`` reviews, each in a transaction that also moves the
+    reviews between the rollup counters. The batch is locked and read again
+    first; reviews deleted, edited or re-queued since they were scored are
+    skipped. ``max_writes_per_second`` paces those writes.
+    """
+    columns = ('id', 'movie_id', 'created_at', 'sentiment', 'review_text')
+    rows = list(
+        Review.objects.filter(id__gte=start, id__lt=end).exclude(sentiment=Sentiment.PENDING.value)
+        .order_by('id').values_list(*columns)
+    )
+    labels = classify_many([row[4] for row in rows])
+    transitions = Counter((row[3], label) for row, label in zip(rows, labels))
+    changed = [(row, label) for row, label in zip(rows, labels) if row[3] != label]
+    if not dry_run:
+        for batch in chunked(changed, batch_size):
+            started = time.monotonic()
+            with transaction.atomic():
+                current = set(
+                    Review.objects.select_for_update().filter(id__in=[row[0] for row, _ in batch])
+                    .order_by('id').values_list(*columns)
+                )
+                skipped = [(row, label) for row, label in batch if row not in current]
+                transitions.subtract((row[3], label) for row, label in skipped)
+                batch = [(row, label) for row, label in batch if row in current]
+                by_label = defaultdict(list)
+                for row, label in batch:
+                    by_label[label].append(row[0])
+                for label, ids in by_label.items():
+                    Review.objects.filter(id__in=ids).update(sentiment=label)
+                Movie.apply_review_changes(
+                    [(row[1], row[3], -1) for row, _ in batch] + [(row[1], label, 1) for row, label in batch]
+                )
+                apply_sentiment_changes([(row[1], row[2], row[3], label) for row, label in batch])
+            if max_writes_per_second:
+                time.sleep(max(0.0, len(batch) / max_writes_per_second - (time.monotonic() - started)))
+    return {'start': start, 'end': end, 'scanned': len(rows), 'transitions': +transitions}
+
+
+def _rescore_chunk_main(args):
+    close_old_connections()
+    return rescore_chunk(*args)
+
+
+def _read_checkpoint(path, signature):
+    try:
+        with open(path) as handle:
+            checkpoint = json.load(handle)
+    except FileNotFoundError:
+        return None
+    if checkpoint['signature'] != signature:
+        raise ValueError(
+            f'Checkpoint {path} was written with different sentiment settings; delete it to start over.'
+        )
+    return checkpoint
+
+
+def _write_checkpoint(path, checkpoint):
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as handle:
+        json.dump(checkpoint, handle)
+    os.replace(tmp_path, path)
+
+
+def rescore_reviews(
+    workers=1, chunk_size=10000, batch_size=1000, max_writes_per_second=None,
+    dry_run=False, start_id=None, checkpoint=None, log=None,
+):
+    """
+    Re-score every scored review, ``chunk_size`` ids per task, across a pool
+    of ``workers`` processes (in this process when 1). Pending reviews are
+    left to the sentiment queue. ``max_writes_per_second`` caps the reviews
+    updated per second across all workers.
+
+    With ``checkpoint``, a JSON file, the run records how far every chunk
+    before it has been re-scored and resumes from there when restarted with
+    the same analyzer and thresholds. Returns the totals: reviews scanned
+    and changed, and the (old label, new label) transition counts.
+    """
+    log = log or (lambda message: None)
+    signature = {
+        'analyzer': settings.SENTIMENT_ANALYZER,
+        'positive_threshold': settings.SENTIMENT_POSITIVE_THRESHOLD,
+        'negative_threshold': settings.SENTIMENT_NEGATIVE_THRESHOLD,
+    }
+    state = {'signature': signature, 'next_id': 0, 'scanned': 0, 'transitions': []}
+    if checkpoint and not dry_run:
+        state = _read_checkpoint(checkpoint, signature) or state
+        if state['next_id']:
+            log(f"Resuming from review id {state['next_id']}.")
+    bounds = Review.objects.exclude(sentiment=Sentiment.PENDING.value).aggregate(low=Min('id'), high=Max('id'))
+    transitions = Counter({tuple(pair): count for pair, count in state['transitions']})
+    scanned = state['scanned']
+    if bounds['low'] is None:
+        return {'scanned': scanned, 'changed': 0, 'transitions': transitions}
+    first = max(bounds['low'], start_id or 0, state['next_id'])
+    starts = list(range(first, bounds['high'] + 1, chunk_size))
+    per_worker_rate = max_writes_per_second / workers if max_writes_per_second else None
+    tasks = [(start, start + chunk_size, dry_run, batch_size, per_worker_rate) for start in starts]
+
+    pool = None
+    if workers > 1:
+        # Connections must not be shared with forked children.
+        connections.close_all()
+        pool = multiprocessing.Pool(workers, initializer=django.setup)
+        results = pool.imap_unordered(_rescore_chunk_main, tasks)
+    else:
+        results = (rescore_chunk(*task) for task in tasks)
+    # Chunks finish out of order. They are counted, and the checkpoint moves
+    # past them, once every chunk before them has finished too.
+    finished, frontier = {}, 0
+    try:
+        for done, result in enumerate(results, start=1):
+            finished[result['start']] = result
+            while frontier < len(starts) and starts[frontier] in finished:
+                counted = finished.pop(starts[frontier])
+                scanned += counted['scanned']
+                transitions.update(counted['transitions'])
+                frontier += 1
+            if checkpoint and not dry_run:
+                state.update(
+                    next_id=starts[frontier] if frontier < len(starts) else bounds['high'] + 1,
+                    scanned=scanned, transitions=[[list(pair), count] for pair, count in transitions.items()],
+                )
+                _write_checkpoint(checkpoint, state)
+            log(f'Chunks: {done}/{len(starts)}')
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+    changed = sum(count for (old, new), count in transitions.items() if old != new)
+    return {'scanned': scanned, 'changed': changed, 'transitions': transitions}
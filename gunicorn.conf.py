@@ -0,0 +1,21 @@
+# Read by gunicorn when started from the project root:
+#   gunicorn movie_api.wsgi:application
+import os
+
+# Each worker imports movie_api.wsgi itself, which warms it up (api.warmup),
+# database connections included, before it accepts connections. With
+# GUNICORN_PRELOAD=True the app is imported and warmed up once in the master
+# instead, so new workers fork ready to serve and share its memory; they only
+# open their own database connections.
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'False') == 'True'
+if preload_app:
+    # Connections opened in the master would be shared by every forked worker.
+    os.environ['API_WARMUP_CONNECT'] = 'False'
+
+
+def post_worker_init(worker):
+    if preload_app:
+        from django.conf import settings
+        from api.warmup import connect_databases
+        if settings.API_WARMUP:
+            connect_databases()
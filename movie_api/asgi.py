@@ -12,5 +12,15 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'movie_api.settings')
+# Serve the hot read endpoints from the native async views (api.async_views).
+os.environ.setdefault('API_ASYNC_READS', 'True')
+# Persistent connections are per thread, and the async views' ORM calls run on
+# executor threads; use DB_POOL to reuse connections instead.
+os.environ.setdefault('DB_CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
+
+# Loaded before the server hands this process its first request (API_WARMUP).
+from api.warmup import warm_up_from_settings  # noqa: E402
+
+warm_up_from_settings()
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'movie_api.settings')
 
 application = get_wsgi_application()
+
+# Loaded before the server hands this process its first request (API_WARMUP).
+from api.warmup import warm_up_from_settings  # noqa: E402
+
+warm_up_from_settings()